@@ -2,6 +2,7 @@
 from flask import Flask
 from flask_assets import Environment
 from werkzeug.middleware.proxy_fix import ProxyFix
+from whitenoise import WhiteNoise
 import os
 
 from app.config import config_by_name
@@ -16,16 +17,60 @@ def create_app(config_name='development'):
     # Support for proxies in production (helps with proper URL generation)
     app.wsgi_app = ProxyFix(app.wsgi_app, x_for=1, x_proto=1)
     
+    # Serve static files, and the .gz/.br variants written by tools/precompress_static.py, ahead of Flask
+    app.wsgi_app = WhiteNoise(
+        app.wsgi_app,
+        root=app.static_folder,
+        prefix='static/',
+        max_age=app.config.get('STATIC_MAX_AGE'),
+        immutable_file_test=app.config.get('STATIC_IMMUTABLE_PATTERN'),
+        autorefresh=app.debug
+    )
+    # Notebook images and attachments, also served by the notebook_static route as a fallback
+    if os.path.isdir(app.config['NOTEBOOKS_DIR']):
+        app.wsgi_app.add_files(app.config['NOTEBOOKS_DIR'], prefix='static/notebooks/')
+    
     # Initialize Flask extensions
     assets = Environment(app)
     
+    # Request latency, counters and Server-Timing headers
+    from app.services.metrics import init_metrics
+    init_metrics(app)
+    
+    # Bounded render queue and per-client render rate limits
+    from app.services.admission import init_admission
+    init_admission(app)
+    
     # Register blueprints
     from app.routes.main import main_bp
     app.register_blueprint(main_bp)
     
+    from app.routes.api import api_bp
+    app.register_blueprint(api_bp)
+    
     # Initialize services
     from app.services.notebook_service import init_notebook_service
     init_notebook_service(app)
+    
+    from app.services.notebook_catalog import init_notebook_catalog
+    init_notebook_catalog(app)
+    
+    from app.services.search_index import init_search_index
+    init_search_index(app)
+    
+    from app.services.compression import init_compression
+    init_compression(app)
+    
+    from app.services.sandbox import init_sandbox
+    init_sandbox(app)
+    
+    from app.routes.main import prerender_notebook_page
+    from app.services.notebook_watcher import init_notebook_watcher
+    init_notebook_watcher(app, prerender_notebook_page)
+    
+    # nbconvert is not imported until here (WARMUP=boot), a background thread or the first render
+    from app.services.warmup import init_warmup
+    init_warmup(app, prerender_notebook_page)
 
     # Register context processors
     from app.context_processors import register_context_processors
@@ -1,19 +1,155 @@
 # app/config.py
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file if it exists
 load_dotenv()
 
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+def optional_int(name, default):
+    """Read an integer setting from the environment; an empty value gives None, which turns it off."""
+    value = os.environ.get(name, str(default)).strip()
+    return int(value) if value else None
+
 class Config:
     """Base configuration."""
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-key-please-change-in-production')
     NOTEBOOKS_DIR = os.environ.get('NOTEBOOKS_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'notebooks'))
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # Max upload size of 16 MB
     
+    # Rendered notebook cache (set RENDER_CACHE_DIR to an empty string for memory only).
+    # RENDER_CACHE_BACKEND replaces the directory with another shared store, e.g.
+    # sqlite:///path/to/render.db or redis://localhost:6379/0
+    RENDER_CACHE_SIZE = int(os.environ.get('RENDER_CACHE_SIZE', 32))
+    RENDER_CACHE_DIR = os.environ.get('RENDER_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'render'))
+    RENDER_CACHE_BACKEND = os.environ.get('RENDER_CACHE_BACKEND', '')
+    # Limits on the shared tier (directory, SQLite or memory backend); the least recently used pages go first
+    RENDER_CACHE_SHARED_MAX_ENTRIES = int(os.environ.get('RENDER_CACHE_SHARED_MAX_ENTRIES', 1024))
+    RENDER_CACHE_SHARED_MAX_BYTES = int(os.environ.get('RENDER_CACHE_SHARED_MAX_BYTES', 512 * 1024 * 1024))
+    # Seconds a worker waits for another worker rendering the same notebook
+    RENDER_LOCK_TIMEOUT = float(os.environ.get('RENDER_LOCK_TIMEOUT', 60))
+    # Seconds a request waits for a render already in progress in its own worker
+    RENDER_WAIT_TIMEOUT = float(os.environ.get('RENDER_WAIT_TIMEOUT', 60))
+    
+    # Notebooks with at least this many source bytes are streamed cell by cell on a cold
+    # render (an empty value disables streaming); rendered cell fragments are cached individually
+    STREAM_NOTEBOOK_MIN_SIZE = optional_int('STREAM_NOTEBOOK_MIN_SIZE', 32 * 1024)
+    FRAGMENT_CACHE_SIZE = int(os.environ.get('FRAGMENT_CACHE_SIZE', 4096))
+    
+    # Notebooks with at least this many source bytes are split at their headings: the page
+    # carries the first section and the rest load as the reader scrolls (an empty value disables this)
+    SECTION_SPLIT_MIN_SIZE = optional_int('SECTION_SPLIT_MIN_SIZE', 256 * 1024)
+    
+    # Content-addressed files extracted from notebook outputs, shared by all workers
+    NOTEBOOK_OUTPUTS_DIR = os.environ.get('NOTEBOOK_OUTPUTS_DIR', os.path.join(BASE_DIR, 'cache', 'outputs'))
+    
+    # Notebook images are moved into the outputs directory; with Pillow installed they also get
+    # variants at these widths and formats (avif encodes about ten times slower than webp)
+    IMAGE_VARIANT_WIDTHS = [int(w) for w in os.environ.get('IMAGE_VARIANT_WIDTHS', '480,960').split(',') if w]
+    IMAGE_VARIANT_FORMATS = [f for f in os.environ.get('IMAGE_VARIANT_FORMATS', 'webp').split(',') if f]
+    IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY', 80))
+    
+    # Output of `tools/convert_notebook.py --build`, used when its manifest matches the sources
+    PRERENDERED_DIR = os.environ.get('PRERENDERED_DIR', os.path.join(BASE_DIR, 'build', 'notebooks'))
+    
+    # Number of pre-warmed HTML exporters, i.e. concurrent notebook conversions per worker
+    EXPORTER_POOL_SIZE = int(os.environ.get('EXPORTER_POOL_SIZE', 2))
+    
+    # When nbconvert is loaded and the exporters built: 'background' (a thread after startup),
+    # 'boot' (before the app is returned, e.g. for gunicorn --preload) or 'off' (first render)
+    WARMUP = os.environ.get('WARMUP', 'background')
+    # Notebooks the warmup also pre-renders: comma-separated ids, or 'all'
+    WARM_NOTEBOOKS = os.environ.get('WARM_NOTEBOOKS', '')
+    
+    # Execute notebooks on a pool of warm kernels before rendering them
+    EXECUTE_NOTEBOOKS = os.environ.get('EXECUTE_NOTEBOOKS', 'false').lower() in ('1', 'true', 'yes')
+    KERNEL_NAME = os.environ.get('KERNEL_NAME', 'python3')
+    KERNEL_POOL_SIZE = int(os.environ.get('KERNEL_POOL_SIZE', 2))
+    CELL_TIMEOUT = int(os.environ.get('CELL_TIMEOUT', 30))
+    EXECUTION_CACHE_DIR = os.environ.get('EXECUTION_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'executed'))
+    
+    # Pre-render notebooks in the background as soon as they change on disk
+    # (uses file events when watchdog is installed, polling otherwise)
+    WATCH_NOTEBOOKS = os.environ.get('WATCH_NOTEBOOKS', 'true').lower() in ('1', 'true', 'yes')
+    WATCH_POLL_INTERVAL = float(os.environ.get('WATCH_POLL_INTERVAL', 2.0))
+    WATCH_DEBOUNCE = float(os.environ.get('WATCH_DEBOUNCE', 0.5))
+    
+    # Notebook catalog persisted between restarts (empty string keeps it in memory only)
+    CATALOG_PATH = os.environ.get('CATALOG_PATH', os.path.join(BASE_DIR, 'cache', 'catalog.json'))
+    
+    # Full-text search index over notebook headings, markdown and code (empty string keeps it in memory only)
+    SEARCH_INDEX_PATH = os.environ.get('SEARCH_INDEX_PATH', os.path.join(BASE_DIR, 'cache', 'search_index.json'))
+    SEARCH_RESULTS_LIMIT = int(os.environ.get('SEARCH_RESULTS_LIMIT', 20))
+    
+    # Static files are served by WhiteNoise; names with a content hash, and the
+    # versioned Pyodide runtime, are cached forever
+    STATIC_MAX_AGE = int(os.environ.get('STATIC_MAX_AGE', 3600))
+    STATIC_IMMUTABLE_PATTERN = r'\.[0-9a-f]{12,}\.\w+$|/static/pyodide/v[^/]+/'
+    
+    # Rendered pages kept in memory with their gzip/brotli variants
+    PAGE_VARIANT_CACHE_SIZE = int(os.environ.get('PAGE_VARIANT_CACHE_SIZE', 64))
+    
+    # Rendered pages materialized as files and sent without reading them into Python
+    # (set PAGE_FILES_DIR to an empty string to keep pages in memory instead).
+    # SENDFILE_HEADER hands the file to the front proxy: 'X-Sendfile' (Apache, lighttpd)
+    # or 'X-Accel-Redirect' (nginx, with an internal location at SENDFILE_PREFIX
+    # aliased to PAGE_FILES_DIR); empty sends it from the app through wsgi.file_wrapper.
+    PAGE_FILES_DIR = os.environ.get('PAGE_FILES_DIR', os.path.join(BASE_DIR, 'cache', 'pages'))
+    PAGE_FILES_MAX_ENTRIES = int(os.environ.get('PAGE_FILES_MAX_ENTRIES', 1024))
+    SENDFILE_HEADER = os.environ.get('SENDFILE_HEADER', '')
+    SENDFILE_PREFIX = os.environ.get('SENDFILE_PREFIX', '/_pages/')
+    
+    # Admission control: cold renders a worker runs at once, and how many may wait for a
+    # slot and for how long before being answered with a stale page or a 503
+    RENDER_CONCURRENCY = int(os.environ.get('RENDER_CONCURRENCY', 2))
+    RENDER_QUEUE_SIZE = int(os.environ.get('RENDER_QUEUE_SIZE', 8))
+    RENDER_QUEUE_TIMEOUT = float(os.environ.get('RENDER_QUEUE_TIMEOUT', 10))
+    RENDER_RETRY_AFTER = int(os.environ.get('RENDER_RETRY_AFTER', 5))
+    
+    # Per-address limit on pages built from a notebook that is not rendered yet (Flask-Limiter
+    # notation), sized for a classroom behind one NAT address; use a shared
+    # RATELIMIT_STORAGE_URI such as redis:// to count across workers
+    RENDER_RATE_LIMIT = os.environ.get('RENDER_RATE_LIMIT', '120 per minute')
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'memory://')
+    RATELIMIT_HEADERS_ENABLED = True
+    
+    # Server-side execution of code cells on /api/run, for devices too slow for Pyodide.
+    # Each session runs in a process of its own, with CPU, memory and wall-clock limits, no
+    # network, and SANDBOX_FILE_MB for files in its working directory; SANDBOX_PROCESSES are
+    # started ahead of time and run at once. A session keeps its namespace until idle for
+    # SANDBOX_SESSION_IDLE; SANDBOX_USER runs the processes under that (unprivileged) account.
+    SANDBOX_ENABLED = os.environ.get('SANDBOX_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    SANDBOX_PROCESSES = int(os.environ.get('SANDBOX_PROCESSES', 2))
+    SANDBOX_CPU_SECONDS = int(os.environ.get('SANDBOX_CPU_SECONDS', 5))
+    SANDBOX_MEMORY_MB = int(os.environ.get('SANDBOX_MEMORY_MB', 256))
+    SANDBOX_TIMEOUT = float(os.environ.get('SANDBOX_TIMEOUT', 10))
+    SANDBOX_SESSION_IDLE = int(os.environ.get('SANDBOX_SESSION_IDLE', 600))
+    SANDBOX_MAX_SESSIONS = int(os.environ.get('SANDBOX_MAX_SESSIONS', 16))
+    SANDBOX_FILE_MB = int(os.environ.get('SANDBOX_FILE_MB', 0))
+    SANDBOX_USER = os.environ.get('SANDBOX_USER', '')
+    SANDBOX_MAX_OUTPUT = int(os.environ.get('SANDBOX_MAX_OUTPUT', 65536))
+    SANDBOX_MAX_CODE = int(os.environ.get('SANDBOX_MAX_CODE', 20000))
+    # Runs and resets per session (Flask-Limiter notation); requests that start a new session
+    # count against the client address instead, which a classroom behind NAT shares
+    SANDBOX_RATE_LIMIT = os.environ.get('SANDBOX_RATE_LIMIT', '60 per minute')
+    
+    # Prometheus metrics on /metrics, and a Server-Timing header with the render breakdown.
+    # With METRICS_TOKEN set, scrapers must send it as "Authorization: Bearer <token>"
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    SERVER_TIMING = True
+    
     # PyScript configuration
     PYSCRIPT_ENABLED = True
     
+    # In-browser Python runtime; served from app/static/pyodide/v<version>/ once
+    # tools/fetch_pyodide.py has downloaded it, from the CDN otherwise
+    PYODIDE_VERSION = os.environ.get('PYODIDE_VERSION', '0.24.1')
+    PYODIDE_CDN_URL = 'https://cdn.jsdelivr.net/pyodide/v{version}/full/'
+    
     # Security headers
     TEMPLATES_AUTO_RELOAD = True
     SESSION_COOKIE_SECURE = False
@@ -25,6 +161,7 @@ class DevelopmentConfig(Config):
     """Development configuration."""
     DEBUG = True
     ENV = 'development'
+    STATIC_MAX_AGE = 0
 
 class TestingConfig(Config):
     """Testing configuration."""
@@ -32,6 +169,21 @@ class TestingConfig(Config):
     ENV = 'testing'
     WTF_CSRF_ENABLED = False
     NOTEBOOKS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'tests/fixtures/notebooks')
+    RENDER_CACHE_DIR = None
+    RENDER_CACHE_BACKEND = None
+    CATALOG_PATH = None
+    SEARCH_INDEX_PATH = None
+    EXPORTER_POOL_SIZE = 1
+    WARMUP = 'off'
+    PRERENDERED_DIR = None
+    EXECUTE_NOTEBOOKS = False
+    EXECUTION_CACHE_DIR = None
+    STREAM_NOTEBOOK_MIN_SIZE = None
+    SECTION_SPLIT_MIN_SIZE = None
+    PAGE_FILES_DIR = None
+    RATELIMIT_ENABLED = False
+    WATCH_NOTEBOOKS = False
+    NOTEBOOK_OUTPUTS_DIR = os.path.join(tempfile.gettempdir(), 'python_notes_test_outputs')
 
 class ProductionConfig(Config):
     """Production configuration."""
@@ -39,6 +191,10 @@ class ProductionConfig(Config):
     DEBUG = False
     SESSION_COOKIE_SECURE = True
     REMEMBER_COOKIE_SECURE = True
+    SERVER_TIMING = False
+    
+    # /metrics is only served in production when asked for
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes')
     
     # Override these in .env for production
     SECRET_KEY = os.environ.get('SECRET_KEY')
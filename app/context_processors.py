@@ -1,10 +1,28 @@
 # app/context_processors.py
+import os
 from datetime import datetime
+from flask import current_app, url_for
 
 def inject_now():
     """Add the current datetime to the template context."""
     return {'now': datetime.utcnow()}
 
+def inject_pyodide():
+    """Add the base URL of the Pyodide runtime, preferring a locally served copy."""
+    version = current_app.config.get('PYODIDE_VERSION', '0.24.1')
+    local_path = f'pyodide/v{version}/'
+    if os.path.exists(os.path.join(current_app.static_folder, local_path, 'pyodide.js')):
+        return {'pyodide_index_url': url_for('static', filename=local_path)}
+    return {'pyodide_index_url': current_app.config['PYODIDE_CDN_URL'].format(version=version)}
+
+def inject_run_endpoint():
+    """Add the URL of server-side execution, or None when cells run in the browser."""
+    if current_app.config.get('SANDBOX_ENABLED'):
+        return {'run_endpoint': url_for('api.run_code')}
+    return {'run_endpoint': None}
+
 def register_context_processors(app):
     """Register all context processors with the Flask app."""
-    app.context_processor(inject_now)
\ No newline at end of file
+    app.context_processor(inject_now)
+    app.context_processor(inject_pyodide)
+    app.context_processor(inject_run_endpoint)
\ No newline at end of file
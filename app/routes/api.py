@@ -0,0 +1,99 @@
+# app/routes/api.py
+import re
+import secrets
+from flask import Blueprint, current_app, request, jsonify
+from flask_limiter.util import get_remote_address
+from app.services.admission import limiter
+from app.services.sandbox import get_sandbox_pool, SandboxBusy
+
+# Create blueprint
+api_bp = Blueprint('api', __name__, url_prefix='/api')
+
+SESSION_RE = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+
+def sandbox_rate_limit():
+    """The per-client limit on cells run and sessions reset in the sandbox, in Flask-Limiter notation."""
+    return current_app.config.get('SANDBOX_RATE_LIMIT', '')
+
+def sandbox_rate_unlimited():
+    return not current_app.config.get('SANDBOX_RATE_LIMIT')
+
+def sandbox_rate_key():
+    """Count runs in an existing session against that session, and the rest against the client address.
+
+    A classroom shares one NAT address, so each student's session gets its own
+    budget; requests that start a process (new or unknown sessions) still count
+    against the address, so made-up session ids do not get around the limit.
+    """
+    payload = request.get_json(silent=True)
+    session = payload.get('session') if isinstance(payload, dict) else None
+    pool = get_sandbox_pool()
+    if isinstance(session, str) and SESSION_RE.match(session) and pool is not None and pool.has_session(session):
+        return f'session:{session}'
+    return get_remote_address()
+
+# Runs and resets share one budget: a reset followed by a run starts a new process
+sandbox_limit = limiter.shared_limit(sandbox_rate_limit, scope='sandbox', key_func=sandbox_rate_key,
+                                     exempt_when=sandbox_rate_unlimited)
+
+def api_error(message, status, retry_after=None):
+    response = jsonify({'error': message})
+    response.status_code = status
+    if retry_after is not None:
+        response.headers['Retry-After'] = str(retry_after)
+    response.cache_control.no_store = True
+    return response
+
+def read_run_request():
+    """Return (payload, None) for a valid sandbox request, or (None, error response)."""
+    if get_sandbox_pool() is None:
+        return None, api_error('Server-side execution is not enabled', 404)
+    # Requiring JSON means browsers preflight cross-site requests, so other sites cannot post cells
+    if not request.is_json:
+        return None, api_error('Expected a JSON body', 415)
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return None, api_error('Expected a JSON object', 400)
+    session = payload.get('session')
+    if session is not None and not (isinstance(session, str) and SESSION_RE.match(session)):
+        return None, api_error('Invalid session', 400)
+    return payload, None
+
+@api_bp.route('/run', methods=['POST'])
+@sandbox_limit
+def run_code():
+    """Run a code cell in the sandbox, in the namespace of the given (or a new) session."""
+    payload, error = read_run_request()
+    if error is not None:
+        return error
+
+    code = payload.get('code')
+    if not isinstance(code, str):
+        return api_error('Missing code', 400)
+    if len(code) > current_app.config.get('SANDBOX_MAX_CODE', 20000):
+        return api_error('Code is too long', 413)
+
+    session = payload.get('session') or secrets.token_urlsafe(16)
+    try:
+        reply = get_sandbox_pool().run(session, code)
+    except SandboxBusy:
+        return api_error('All Python processes are busy, please retry shortly', 503,
+                         retry_after=current_app.config.get('RENDER_RETRY_AFTER', 5))
+
+    reply['session'] = session
+    response = jsonify(reply)
+    response.cache_control.no_store = True
+    return response
+
+@api_bp.route('/run/reset', methods=['POST'])
+@sandbox_limit
+def reset_session():
+    """Forget the namespace of a session."""
+    payload, error = read_run_request()
+    if error is not None:
+        return error
+    if payload.get('session'):
+        get_sandbox_pool().reset(payload['session'])
+    response = jsonify({'reset': True})
+    response.cache_control.no_store = True
+    return response
@@ -1,39 +1,106 @@
 # app/routes/main.py
-from flask import Blueprint, render_template, current_app, abort, send_from_directory, request, redirect, url_for
+from flask import Blueprint, render_template, current_app, abort, send_from_directory, request, url_for, make_response, stream_with_context, send_file
+from werkzeug.http import is_resource_modified
+from datetime import datetime, timezone
 import os
-import glob
-from app.services.notebook_service import get_notebook_html, get_notebook_metadata
-import nbformat
+import time
+import hashlib
+import hmac
+from app.services.notebook_service import get_notebook_html, get_notebook_digest, get_cache_fingerprint, iter_notebook_html, has_rendered_notebook, coalesce_render, claim_render, split_sections, OUTPUTS_URL
+from app.services.single_flight import SingleFlightTimeout
+from app.services.admission import (
+    charge_render, get_render_queue, RenderRejected, RenderRateLimited, SHED_RESPONSES
+)
+from app.services.notebook_catalog import get_notebook_catalog
+from app.services.compression import choose_encoding, get_page_variants, PageFileCache
+from app.services.search_index import get_search_index
+from app.context_processors import inject_pyodide, inject_run_endpoint
+from app.services.metrics import timed, registry, CONTENT_TYPE
 
 main_bp = Blueprint('main', __name__)
 
+# Content-addressed files can be cached for a year
+OUTPUT_MAX_AGE = 365 * 24 * 60 * 60
+
+# Templates whose content is part of a rendered notebook page
+PAGE_TEMPLATES = ('base.html', 'notes/view.html')
+
+def template_version():
+    """Return a digest of the page templates and their newest mtime."""
+    env = current_app.jinja_env
+    digest = hashlib.sha256()
+    newest = 0
+    for name in PAGE_TEMPLATES:
+        source, filename, _ = env.loader.get_source(env, name)
+        digest.update(source.encode('utf-8'))
+        if filename:
+            newest = max(newest, os.path.getmtime(filename))
+    return digest.hexdigest(), newest
+
+def notebook_validators(entry):
+    """Build the strong ETag and Last-Modified time for a notebook page.
+    
+    Both are derived from file metadata and hashes only, so they can be checked
+    before any rendering happens.
+    """
+    templates_digest, templates_mtime = template_version()
+    # The page links to itself by id, names where code runs, and the footer
+    # shows the current year, so all of these are part of the page version too
+    parts = [
+        entry['id'],
+        get_notebook_digest(entry['path']),
+        get_cache_fingerprint(),
+        templates_digest,
+        inject_pyodide()['pyodide_index_url'],
+        inject_run_endpoint()['run_endpoint'] or '',
+        str(datetime.now(timezone.utc).year),
+    ]
+    etag = hashlib.sha256(':'.join(parts).encode('utf-8')).hexdigest()[:32]
+    last_modified = datetime.fromtimestamp(max(entry['mtime'], templates_mtime), timezone.utc)
+    return etag, last_modified.replace(microsecond=0)
+
+def conditional_response(response, etag, last_modified, encoding=None):
+    """Attach validators and make the browser revalidate on every visit."""
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    return response
+
 @main_bp.route('/')
 def index():
     """Home page route that displays available notebooks."""
     notebooks_dir = current_app.config['NOTEBOOKS_DIR']
-    notebook_files = glob.glob(os.path.join(notebooks_dir, '*.ipynb'))
     
-    notebooks = []
-    for notebook_path in notebook_files:
-        filename = os.path.basename(notebook_path)
-        notebook_id = os.path.splitext(filename)[0]
-        
-        # Get metadata for display
-        metadata = get_notebook_metadata(notebook_path)
-        title = metadata.get('title', notebook_id)
-        
-        notebooks.append({
-            'id': notebook_id,
-            'title': title,
-            'path': notebook_path,
-            'filename': filename
-        })
-    
-    # Sort notebooks by title
-    notebooks.sort(key=lambda x: x['title'])
+    # Served from the in-memory catalog; only changed notebooks are re-parsed
+    notebooks = get_notebook_catalog().list_notebooks(notebooks_dir)
     
     return render_template('index.html', notebooks=notebooks)
 
+@main_bp.route('/search')
+def search():
+    """Full-text search across all notebooks."""
+    query = request.args.get('q', '').strip()
+    results = []
+    elapsed_ms = None
+    
+    if query:
+        notebooks_dir = current_app.config['NOTEBOOKS_DIR']
+        # Only notebooks that changed since the last query are indexed again
+        search_index = get_search_index()
+        search_index.update(get_notebook_catalog().list_notebooks(notebooks_dir))
+        
+        started = time.perf_counter()
+        results = search_index.search(query, limit=current_app.config.get('SEARCH_RESULTS_LIMIT', 20))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    
+    return render_template('search.html', title='Search', query=query, results=results, elapsed_ms=elapsed_ms)
+
+# The last page version built for each (notebook, split), served stale when renders are shed
+latest_page_versions = {}
+
 @main_bp.route('/notes/<notebook_id>')
 def view_notebook(notebook_id):
     """Display a specific notebook."""
@@ -41,24 +108,310 @@ def view_notebook(notebook_id):
     notebook_id = notebook_id.replace('.ipynb', '')
     
     notebooks_dir = current_app.config['NOTEBOOKS_DIR']
-    notebook_path = os.path.join(notebooks_dir, f"{notebook_id}.ipynb")
+    entry = get_notebook_catalog().get(notebooks_dir, notebook_id)
     
-    if not os.path.isfile(notebook_path):
+    if entry is None:
         abort(404)
     
-    # Get metadata first for the title
-    metadata = get_notebook_metadata(notebook_path)
-    title = metadata['title']
+    # Each encoding is a different representation, so it gets its own strong ETag
+    encoding = choose_encoding(request)
+    page_version, last_modified = notebook_validators(entry)
+    split = is_section_split(entry) and not request.args.get('full')
+    if split:
+        page_version = f'{page_version}.split'
+    etag = f'{page_version}-{encoding}' if encoding else page_version
+    
+    # Answer revalidation requests before doing any conversion work
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return conditional_response(make_response('', 304), etag, last_modified)
+    
+    # Reuse the rendered page, compressing it at most once per encoding
+    response = cached_page_response(page_version, encoding)
+    
+    # Long notebooks are streamed on a cold render so the browser gets the page shell at once;
+    # a render already in the render cache or the bundle only needs the page template.
+    # Only the first request streams: the others wait for its page like any page build below
+    stream_min_size = current_app.config.get('STREAM_NOTEBOOK_MIN_SIZE')
+    if response is None and not split and stream_min_size is not None and entry['size'] >= stream_min_size \
+            and not has_rendered_notebook(entry['path']):
+        finish = claim_render(('page', page_version))
+        if finish is not None:
+            streamed = None
+            try:
+                charge_render()
+                streamed = stream_notebook_page(entry, notebook_id, page_version, last_modified, finish)
+                return streamed
+            except RenderRateLimited as e:
+                return rate_limited(e.retry_after)
+            except RenderRejected:
+                return shed_page(notebook_id, split, encoding)
+            finally:
+                if streamed is None:
+                    finish()
+    
+    if response is None:
+        def build():
+            # The page may have been built, or streamed, since this request looked
+            if get_page_variants().has(page_version):
+                return
+            charge_cold_render(entry)
+            build_notebook_page(entry, notebook_id, page_version, split)
+        
+        # Requests arriving while the page is being built wait for it instead of building it again
+        try:
+            coalesce_render(('page', page_version), build)
+            # A stream whose client went away before the end leaves no page behind
+            if not get_page_variants().has(page_version):
+                coalesce_render(('page', page_version), build)
+        except RenderRateLimited as e:
+            return rate_limited(e.retry_after)
+        except (SingleFlightTimeout, RenderRejected):
+            return shed_page(notebook_id, split, encoding)
+        response = cached_page_response(page_version, encoding)
+        if response is None:
+            abort(503)
+    
+    return conditional_response(response, etag, last_modified, encoding)
+
+def shed_page(notebook_id, split, encoding):
+    """Answer a page view that could not be rendered now.
+    
+    The last version built for the notebook is served if it is still cached,
+    with its own ETag so the browser fetches the current page next time;
+    otherwise the client is told to retry shortly.
+    """
+    stale_version = latest_page_versions.get((notebook_id, split))
+    response = cached_page_response(stale_version, encoding) if stale_version else None
+    if response is None:
+        return service_unavailable()
+    SHED_RESPONSES.inc(kind='stale')
+    response.set_etag(f'{stale_version}-{encoding}' if encoding else stale_version)
+    response.cache_control.no_cache = True
+    response.vary.add('Accept-Encoding')
+    if encoding:
+        response.content_encoding = encoding
+    return response
+
+def service_unavailable():
+    """A fast 503 asking the client to come back after RENDER_RETRY_AFTER seconds."""
+    SHED_RESPONSES.inc(kind='unavailable')
+    response = make_response('The server is busy rendering notebooks, please retry shortly.\n', 503)
+    response.mimetype = 'text/plain'
+    response.headers['Retry-After'] = str(current_app.config.get('RENDER_RETRY_AFTER', 5))
+    response.cache_control.no_store = True
+    return response
+
+def rate_limited(retry_after):
+    """A 429 for a client that has used up its RENDER_RATE_LIMIT; cached pages are still served to it."""
+    SHED_RESPONSES.inc(kind='rate_limited')
+    response = make_response('Too many notebooks rendered, please retry shortly.\n', 429)
+    response.mimetype = 'text/plain'
+    response.headers['Retry-After'] = str(retry_after)
+    response.cache_control.no_store = True
+    return response
+
+def charge_cold_render(entry):
+    """Count a page build against the client's render limit, unless its notebook HTML is already cached."""
+    if not has_rendered_notebook(entry['path']):
+        charge_render()
+
+def cached_page_response(version, encoding):
+    """Return a response for a cached page or section, or None if it is not cached.
+    
+    Pages materialized as files are sent from disk without reading them.
+    """
+    page_variants = get_page_variants()
+    if isinstance(page_variants, PageFileCache):
+        path = page_variants.path(version, encoding)
+        return send_page_file(path) if path else None
+    body = page_variants.get(version, encoding)
+    if body is None:
+        return None
+    response = make_response(body)
+    response.mimetype = 'text/html'
+    return response
+
+def send_page_file(path):
+    """Send a materialized page, or leave it to the front proxy when SENDFILE_HEADER is set."""
+    header = current_app.config.get('SENDFILE_HEADER')
+    if header == 'X-Accel-Redirect':
+        response = current_app.response_class(mimetype='text/html')
+        response.headers[header] = current_app.config['SENDFILE_PREFIX'] + os.path.basename(path)
+        return response
+    if header == 'X-Sendfile':
+        response = current_app.response_class(mimetype='text/html')
+        response.headers[header] = os.path.abspath(path)
+        return response
+    try:
+        # Validators are the page's own, set by conditional_response
+        return send_file(path, mimetype='text/html', conditional=False, etag=False)
+    except FileNotFoundError:
+        # Pruned by another worker since it was looked up
+        return None
+
+def is_section_split(entry):
+    """Whether a notebook is long enough to be served a section at a time."""
+    min_size = current_app.config.get('SECTION_SPLIT_MIN_SIZE')
+    return min_size is not None and entry['size'] >= min_size
+
+def build_notebook_page(entry, notebook_id, page_version, split=False):
+    """Render the page for a notebook and store it in the variant cache.
     
+    A split page carries the first section inline and an empty placeholder
+    for each of the others, which the page script fills in from
+    notebook_section as the reader scrolls.
+    """
     # Convert notebook to HTML
-    html_content, resources = get_notebook_html(notebook_path)
+    html_content, resources = get_notebook_html(entry['path'])
+    
+    if split:
+        head, sections, tail = split_sections(html_content)
+        placeholders = ''.join(
+            f'<div class="notebook-section" data-src="'
+            f'{url_for("main.notebook_section", notebook_id=notebook_id, section=n)}"></div>\n'
+            for n in range(1, len(sections))
+        )
+        html_content = head + sections[0] + placeholders + tail
+    
+    with timed('template'):
+        page = render_template(
+            'notes/view.html',
+            notebook_id=notebook_id,
+            title=entry['title'],
+            html_content=html_content,
+            split=split
+        )
+    get_page_variants().put(page_version, page.encode('utf-8'))
+    latest_page_versions[(notebook_id, split)] = page_version
+
+def prerender_notebook_page(notebook_id):
+    """Render a notebook page ahead of any visitor. Returns False if it does not exist.
+    
+    Needs a request context because the page template builds URLs.
+    """
+    entry = get_notebook_catalog().get(current_app.config['NOTEBOOKS_DIR'], notebook_id)
+    if entry is None:
+        return False
+    page_version, _ = notebook_validators(entry)
+    split = is_section_split(entry)
+    if split:
+        page_version = f'{page_version}.split'
+    if not get_page_variants().has(page_version):
+        build_notebook_page(entry, notebook_id, page_version, split)
+    return True
+
+@main_bp.route('/notes/<notebook_id>/section/<int:section>')
+def notebook_section(notebook_id, section):
+    """Serve one section of a split notebook page as an HTML fragment."""
+    entry = get_notebook_catalog().get(current_app.config['NOTEBOOKS_DIR'], notebook_id)
+    if entry is None:
+        abort(404)
+    
+    # Sections are versioned with the page, so they are revalidated the same way
+    encoding = choose_encoding(request)
+    page_version, last_modified = notebook_validators(entry)
+    version = f'{page_version}.section{section}'
+    etag = f'{version}-{encoding}' if encoding else version
+    
+    if not is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return conditional_response(make_response('', 304), etag, last_modified)
     
-    return render_template(
-        'notes/view.html',
-        notebook_id=notebook_id,
-        title=title,
-        html_content=html_content
+    # Each section is cached on its own, so a reader only pays for what they scroll to
+    response = cached_page_response(version, encoding)
+    if response is None:
+        def build():
+            charge_cold_render(entry)
+            return build_notebook_sections(entry)
+        
+        try:
+            sections = coalesce_render(('sections', page_version), build)
+        except RenderRateLimited as e:
+            return rate_limited(e.retry_after)
+        except (SingleFlightTimeout, RenderRejected):
+            return service_unavailable()
+        if section >= len(sections):
+            abort(404)
+        get_page_variants().put(version, sections[section])
+        response = cached_page_response(version, encoding)
+        if response is None:
+            abort(503)
+    
+    return conditional_response(response, etag, last_modified, encoding)
+
+def build_notebook_sections(entry):
+    """Return the HTML of each section of a notebook, encoded."""
+    html_content, resources = get_notebook_html(entry['path'])
+    _, sections, _ = split_sections(html_content)
+    return [section.encode('utf-8') for section in sections]
+
+# Stands in for the notebook HTML when splitting the page template around it
+STREAM_MARKER = '<!--notebook-stream-->'
+
+def stream_notebook_page(entry, notebook_id, page_version, last_modified, finish):
+    """Stream a notebook page: the shell first, then each cell as it is converted.
+    
+    The finished page is added to the variant cache, and the notebook HTML to
+    the render cache, so later requests are served whole (and compressed)
+    without converting anything. finish() is called once the page is stored,
+    or the response closed, to release the requests waiting for the page.
+    """
+    with timed('template'):
+        shell = render_template(
+            'notes/view.html',
+            notebook_id=notebook_id,
+            title=entry['title'],
+            html_content=STREAM_MARKER
+        )
+    shell_head, shell_tail = shell.split(STREAM_MARKER, 1)
+    page_variants = get_page_variants()
+    
+    # The stream holds one render slot until the response is closed, shared by all its cells
+    render_queue = get_render_queue()
+    if render_queue is not None:
+        render_queue.acquire()
+    
+    def generate():
+        chunks = [shell_head]
+        yield shell_head
+        for fragment in iter_notebook_html(entry['path']):
+            chunks.append(fragment)
+            yield fragment
+        chunks.append(shell_tail)
+        yield shell_tail
+        page_variants.put(page_version, ''.join(chunks).encode('utf-8'))
+        latest_page_versions[(notebook_id, False)] = page_version
+        finish()
+    
+    response = current_app.response_class(stream_with_context(generate()), mimetype='text/html')
+    if render_queue is not None:
+        response.call_on_close(render_queue.release)
+    response.call_on_close(finish)
+    return conditional_response(response, page_version, last_modified)
+
+@main_bp.route(f'{OUTPUTS_URL}<filename>')
+def notebook_output(filename):
+    """Serve a content-addressed output file; its name never changes meaning."""
+    response = send_from_directory(
+        current_app.config['NOTEBOOK_OUTPUTS_DIR'],
+        filename,
+        max_age=OUTPUT_MAX_AGE
     )
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+@main_bp.route('/metrics')
+def metrics():
+    """Prometheus metrics for this worker process."""
+    if not current_app.config.get('METRICS_ENABLED'):
+        abort(404)
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    response = make_response(registry.render())
+    response.headers['Content-Type'] = CONTENT_TYPE
+    response.cache_control.no_store = True
+    return response
 
 @main_bp.route('/static/notebooks/<path:filename>')
 def notebook_static(filename):
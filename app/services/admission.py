@@ -0,0 +1,165 @@
+# app/services/admission.py
+import math
+import time
+import threading
+from contextlib import contextmanager, nullcontext
+from flask import current_app
+from flask_limiter import Limiter
+from flask_limiter.util import get_remote_address
+from limits import parse_many
+from app.services.metrics import registry, register_collector
+
+# Per-client rate limits, set up by init_admission; renders are charged by charge_render
+limiter = Limiter(get_remote_address)
+
+# Global render queue
+render_queue = None
+
+SHED_RESPONSES = registry.counter(
+    'python_notes_shed_responses_total', 'Requests answered without rendering, by kind (stale, unavailable or rate_limited).')
+
+class RenderRejected(Exception):
+    """Raised when a cold render is turned away because the worker is saturated."""
+
+    def __init__(self, reason):
+        super().__init__(f'Render queue {reason}')
+        self.reason = reason
+
+class RenderRateLimited(Exception):
+    """Raised when a client has used up its RENDER_RATE_LIMIT; retry_after is in seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__('Render rate limit exceeded')
+        self.retry_after = retry_after
+
+class RenderQueue:
+    """Bounds the cold renders a worker runs at once, and how many may wait.
+
+    A render takes one of ``concurrency`` slots. When none is free it waits
+    behind at most ``max_waiting`` others, for up to ``timeout`` seconds, and
+    is otherwise rejected with RenderRejected, so the request can be answered
+    at once instead of tying up a thread. Cache hits never enter the queue
+    and are served while renders wait. Slots are held per thread and are
+    reentrant: a streamed page holds one slot while its cells are rendered.
+    """
+
+    def __init__(self, concurrency=2, max_waiting=8, timeout=10):
+        self.concurrency = max(1, concurrency)
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.running = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = {'full': 0, 'timeout': 0}
+
+    def acquire(self):
+        """Take a render slot, queueing for one if needed. Raises RenderRejected."""
+        depth = getattr(self._local, 'depth', 0)
+        if depth:
+            self._local.depth = depth + 1
+            return
+
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                if self.waiting >= self.max_waiting:
+                    self.rejected['full'] += 1
+                    raise RenderRejected('full')
+                self.waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.timeout)
+            finally:
+                with self._lock:
+                    self.waiting -= 1
+            if not acquired:
+                with self._lock:
+                    self.rejected['timeout'] += 1
+                raise RenderRejected('timeout')
+
+        with self._lock:
+            self.running += 1
+            self.admitted += 1
+        self._local.depth = 1
+
+    def release(self):
+        """Give back the slot taken by this thread."""
+        self._local.depth -= 1
+        if self._local.depth:
+            return
+        with self._lock:
+            self.running -= 1
+        self._slots.release()
+
+    @contextmanager
+    def slot(self):
+        """Hold a render slot for the duration of the block."""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self):
+        """Return queue depth and admission counters."""
+        with self._lock:
+            return {
+                'running': self.running,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'rejected': dict(self.rejected),
+            }
+
+def init_admission(app):
+    """Set up the render queue and the per-client rate limits."""
+    global render_queue
+    render_queue = RenderQueue(
+        concurrency=app.config.get('RENDER_CONCURRENCY', 2),
+        max_waiting=app.config.get('RENDER_QUEUE_SIZE', 8),
+        timeout=app.config.get('RENDER_QUEUE_TIMEOUT', 10)
+    )
+    limiter.init_app(app)
+
+def get_render_queue():
+    """Return the application's render queue, or None outside the app (tools)."""
+    return render_queue
+
+def render_slot():
+    """Context manager holding a render slot, if there is a render queue."""
+    return render_queue.slot() if render_queue is not None else nullcontext()
+
+def charge_render():
+    """Count a render against the client's RENDER_RATE_LIMIT, raising RenderRateLimited once it is used up.
+
+    Called only where a page is about to be built, so cache hits and
+    requests waiting for another request's render are never limited.
+    """
+    limit = current_app.config.get('RENDER_RATE_LIMIT')
+    if not limit or not limiter.enabled:
+        return
+    key = get_remote_address()
+    items = parse_many(limit)
+    for item in items:
+        if not limiter.limiter.test(item, 'render', key):
+            reset_at, _ = limiter.limiter.get_window_stats(item, 'render', key)
+            raise RenderRateLimited(max(1, math.ceil(reset_at - time.time())))
+    for item in items:
+        limiter.limiter.hit(item, 'render', key)
+
+def collect_metrics():
+    """Report the render queue to the metrics endpoint."""
+    if render_queue is None:
+        return
+    stats = render_queue.stats()
+    yield ('python_notes_render_queue_running', 'gauge',
+           'Cold renders holding a slot.', {}, stats['running'])
+    yield ('python_notes_render_queue_waiting', 'gauge',
+           'Cold renders waiting for a slot.', {}, stats['waiting'])
+    yield ('python_notes_render_queue_admitted_total', 'counter',
+           'Cold renders given a slot.', {}, stats['admitted'])
+    for reason, count in stats['rejected'].items():
+        yield ('python_notes_render_rejections_total', 'counter',
+               'Cold renders turned away by the render queue, by reason.', {'reason': reason}, count)
+
+register_collector(collect_metrics)
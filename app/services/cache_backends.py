@@ -0,0 +1,343 @@
+# app/services/cache_backends.py
+import os
+import time
+import uuid
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+
+def create_cache_backend(url, max_entries=None, max_bytes=None):
+    """Build a cache backend from a URL.
+
+    Supported forms are ``memory://``, ``file:///path/to/dir``,
+    ``sqlite:///path/to/cache.db`` and ``redis://host:port/db`` (the last one
+    needs the optional redis package). An empty URL means no shared backend.
+    The file and SQLite backends drop their least recently used entries
+    beyond max_entries or max_bytes; Redis evicts by its own maxmemory policy.
+    """
+    if not url:
+        return None
+    scheme, _, rest = url.partition('://')
+    if scheme == 'memory':
+        return MemoryBackend(max_entries)
+    if scheme == 'file':
+        return FileBackend(rest, max_entries, max_bytes)
+    if scheme == 'sqlite':
+        return SqliteBackend(rest, max_entries=max_entries, max_bytes=max_bytes)
+    if scheme in ('redis', 'rediss', 'unix'):
+        import redis
+        return RedisBackend(redis.Redis.from_url(url))
+    raise ValueError(f'Unsupported cache backend: {url}')
+
+def over_limits(count, total, max_entries, max_bytes):
+    """Whether count entries of total bytes exceed either limit (None or 0 means no limit)."""
+    return bool(max_entries and count > max_entries) or bool(max_bytes and total > max_bytes)
+
+class MemoryBackend:
+    """In-process LRU backend; locks only coordinate threads of one worker."""
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while self.max_entries and len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def acquire_lock(self, key, ttl):
+        """Take the lock for key unless someone else holds it. Returns a token or None."""
+        now = time.monotonic()
+        with self._lock:
+            held = self._locks.get(key)
+            if held is not None and held[1] > now:
+                return None
+            token = uuid.uuid4().hex
+            self._locks[key] = (token, now + ttl)
+            return token
+
+    def release_lock(self, key, token):
+        with self._lock:
+            held = self._locks.get(key)
+            if held is not None and held[0] == token:
+                del self._locks[key]
+
+class FileBackend:
+    """One file per key in a shared directory.
+
+    Entries are written to a temp file and renamed into place, so readers
+    never see a partial entry. Locks are files created with O_EXCL, which is
+    atomic across processes, holding the owner's token and expiry time; an
+    expired lock was abandoned by a crashed worker and is broken.
+
+    A hit touches the file's mtime, and each write removes the entries used
+    longest ago beyond max_entries files or max_bytes in total.
+    """
+
+    def __init__(self, directory, max_entries=None, max_bytes=None):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = f.read()
+        except OSError:
+            return None
+        if self.max_entries or self.max_bytes:
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+        return value
+
+    def set(self, key, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(value)
+            os.replace(tmp_path, self._path(key))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.prune()
+
+    def prune(self):
+        """Remove the least recently used entries beyond max_entries and max_bytes."""
+        if not (self.max_entries or self.max_bytes):
+            return
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for dir_entry in it:
+                    if not dir_entry.name.endswith('.json'):
+                        continue
+                    try:
+                        st = dir_entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, dir_entry.path))
+        except FileNotFoundError:
+            return
+
+        count = len(entries)
+        total = sum(size for _, size, _ in entries)
+        entries.sort()
+        for _, size, path in entries:
+            if not over_limits(count, total, self.max_entries, self.max_bytes):
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            count -= 1
+            total -= size
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def acquire_lock(self, key, ttl):
+        lock_path = self._path(key, '.lock')
+        token = uuid.uuid4().hex
+        for _ in range(2):
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                held = self._read_lock(lock_path)
+                if held is None:
+                    continue
+                if held[1] > time.time():
+                    return None
+                self._remove_lock(lock_path)
+                continue
+            with os.fdopen(fd, 'w') as f:
+                f.write(f'{token} {time.time() + ttl}')
+            return token
+        return None
+
+    def release_lock(self, key, token):
+        lock_path = self._path(key, '.lock')
+        held = self._read_lock(lock_path)
+        if held is not None and held[0] == token:
+            self._remove_lock(lock_path)
+
+    def _read_lock(self, lock_path):
+        """Return the ``(token, expires)`` of a lock file, or None if it is gone."""
+        try:
+            with open(lock_path, 'r') as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        token, _, expires = content.partition(' ')
+        try:
+            return token, float(expires)
+        except ValueError:
+            # Still being written by its owner, or left half-written by a crash
+            try:
+                return token, os.path.getmtime(lock_path) + 60
+            except FileNotFoundError:
+                return None
+
+    def _remove_lock(self, lock_path):
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+    def _path(self, key, suffix='.json'):
+        return os.path.join(self.directory, f'{key}{suffix}')
+
+class SqliteBackend:
+    """Shared on-disk store in a single SQLite database.
+
+    Every worker process opens its own connection; WAL mode lets readers
+    proceed while another worker writes. Locks are rows whose insertion is
+    atomic thanks to the primary key.
+
+    Rows record their size and when they were last read, at most once per
+    TOUCH_INTERVAL seconds so hits rarely write, and each write deletes the
+    least recently used rows beyond max_entries or max_bytes.
+    """
+
+    TOUCH_INTERVAL = 60
+
+    def __init__(self, path, timeout=30, max_entries=None, max_bytes=None):
+        self.path = path
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                         'size INTEGER NOT NULL DEFAULT 0, accessed REAL NOT NULL DEFAULT 0)')
+            conn.execute('CREATE TABLE IF NOT EXISTS locks (key TEXT PRIMARY KEY, token TEXT NOT NULL, expires REAL NOT NULL)')
+            # Databases created before entries had a size and access time
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(entries)')}
+            if 'accessed' not in columns:
+                conn.execute('ALTER TABLE entries ADD COLUMN size INTEGER NOT NULL DEFAULT 0')
+                conn.execute('ALTER TABLE entries ADD COLUMN accessed REAL NOT NULL DEFAULT 0')
+                conn.execute('UPDATE entries SET size = length(value)')
+            conn.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+
+    def get(self, key):
+        conn = self._connection()
+        row = conn.execute('SELECT value, accessed FROM entries WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if row[1] < now - self.TOUCH_INTERVAL:
+            with conn:
+                conn.execute('UPDATE entries SET accessed = ? WHERE key = ?', (now, key))
+        return bytes(row[0])
+
+    def set(self, key, value):
+        with self._connection() as conn:
+            conn.execute('INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)',
+                         (key, value, len(value), time.time()))
+        self.prune()
+
+    def prune(self):
+        """Delete the least recently used rows beyond max_entries and max_bytes."""
+        if not (self.max_entries or self.max_bytes):
+            return
+        with self._connection() as conn:
+            count, total = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+            if not over_limits(count, total, self.max_entries, self.max_bytes):
+                return
+            removed = []
+            for key, size in conn.execute('SELECT key, size FROM entries ORDER BY accessed'):
+                if not over_limits(count, total, self.max_entries, self.max_bytes):
+                    break
+                removed.append((key,))
+                count -= 1
+                total -= size
+            conn.executemany('DELETE FROM entries WHERE key = ?', removed)
+
+    def delete(self, key):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def acquire_lock(self, key, ttl):
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute('DELETE FROM locks WHERE key = ? AND expires <= ?', (key, now))
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO locks (key, token, expires) VALUES (?, ?, ?)',
+                (key, token, now + ttl)
+            )
+        return token if cursor.rowcount == 1 else None
+
+    def release_lock(self, key, token):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM locks WHERE key = ? AND token = ?', (key, token))
+
+    def _connection(self):
+        # Connections must not be shared across threads or inherited over fork
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+class RedisBackend:
+    """Backend for Redis or any server speaking its protocol.
+
+    Only GET, SET (with NX/PX) and DELETE are used, so a client for a
+    compatible server or a simple stand-in works as well.
+    """
+
+    def __init__(self, client, prefix='python_notes:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def acquire_lock(self, key, ttl):
+        token = uuid.uuid4().hex
+        if self.client.set(f'{self.prefix}lock:{key}', token, nx=True, px=int(ttl * 1000)):
+            return token
+        return None
+
+    def release_lock(self, key, token):
+        # Only delete the lock if it is still ours; it may have expired and been retaken
+        lock_key = f'{self.prefix}lock:{key}'
+        held = self.client.get(lock_key)
+        if isinstance(held, bytes):
+            held = held.decode('utf-8')
+        if held == token:
+            self.client.delete(lock_key)
@@ -0,0 +1,264 @@
+# app/services/compression.py
+import os
+import gzip
+import json
+import tempfile
+import threading
+from collections import OrderedDict
+from whitenoise.compress import Compressor
+from app.services.metrics import timed
+
+try:
+    import brotli
+except ImportError:  # Brotli is optional; gzip is always available
+    brotli = None
+
+# Quality used when compressing in the request path; build-time compression uses the maximum
+BROTLI_QUALITY = 9
+GZIP_LEVEL = 9
+
+# Global cache of encoded page bodies
+page_variants = None
+
+def init_compression(app):
+    """Initialize the cache of compressed page variants.
+
+    With PAGE_FILES_DIR set, pages are materialized as files and served
+    from disk; otherwise they are kept in memory.
+    """
+    global page_variants
+    pages_dir = app.config.get('PAGE_FILES_DIR')
+    if pages_dir:
+        page_variants = PageFileCache(pages_dir, app.config.get('PAGE_FILES_MAX_ENTRIES', 1024))
+    else:
+        page_variants = VariantCache(app.config.get('PAGE_VARIANT_CACHE_SIZE', 64))
+
+def get_page_variants():
+    """Return the application's page variant cache."""
+    return page_variants
+
+def supported_encodings():
+    """Content encodings this server can produce, most preferred first."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def choose_encoding(request):
+    """Pick the best encoding the client accepts, or None for identity."""
+    return request.accept_encodings.best_match(supported_encodings())
+
+def compress(data, encoding):
+    """Compress bytes with the given content encoding."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    if encoding == 'gzip':
+        # mtime=0 keeps the output a pure function of the input
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    raise ValueError(f'Unsupported encoding: {encoding}')
+
+# Already compressed (archives, wheels) or, like Pyodide's large .wasm files, too
+# slow to compress at build quality for what they save; on top of WhiteNoise's list
+SKIP_COMPRESS_EXTENSIONS = Compressor.SKIP_COMPRESS_EXTENSIONS + ('whl', 'wasm', 'tar', 'zst')
+
+# Files precompress_files has handled, with their mtime and size, so neither the
+# compressed nor the incompressible ones are compressed again
+PRECOMPRESS_RECORD = '.precompressed.json'
+
+class AtomicCompressor(Compressor):
+    """WhiteNoise's compressor, writing each variant to a temp file and renaming it.
+
+    A server picking up .gz/.br files never sees a partly written one.
+    """
+
+    def write_data(self, path, data, suffix, stat_result):
+        filename = path + suffix
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.utime(tmp_path, (stat_result.st_atime, stat_result.st_mtime))
+            os.replace(tmp_path, filename)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return filename
+
+def precompress_files(directory, log=None):
+    """Write .gz (and .br) siblings for compressible files that changed since the last run.
+
+    WhiteNoise and most static servers pick these up instead of compressing
+    per response. Run at build time (tools/precompress_static.py); files are
+    recorded in PRECOMPRESS_RECORD so a later run only reads what changed,
+    including files that did not compress well enough to get variants.
+    Returns the number of files compressed.
+    """
+    compressor = AtomicCompressor(extensions=SKIP_COMPRESS_EXTENSIONS, use_brotli=brotli is not None,
+                                  quiet=log is None, log=log or print)
+    record_path = os.path.join(directory, PRECOMPRESS_RECORD)
+    try:
+        with open(record_path, 'r', encoding='utf-8') as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        record = {}
+
+    seen = {}
+    compressed = 0
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.join(root, name)
+            if name == PRECOMPRESS_RECORD or name.startswith('.tmp-') or not compressor.should_compress(name):
+                continue
+            st = os.stat(path)
+            key = os.path.relpath(path, directory)
+            seen[key] = [st.st_mtime_ns, st.st_size]
+            if record.get(key) == seen[key]:
+                continue
+            compressor.compress(path)
+            compressed += 1
+
+    if seen != record:
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(seen, f, sort_keys=True)
+        os.replace(tmp_path, record_path)
+    return compressed
+
+class VariantCache:
+    """LRU of rendered page bodies and their compressed variants.
+
+    Entries are keyed by a content version (the page ETag). The identity body
+    is stored when a page is rendered, and each compressed variant is produced
+    the first time a client asks for it, then reused for every later response.
+    """
+
+    def __init__(self, max_entries=64):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, version, body):
+        """Store the uncompressed body for a content version."""
+        with self._lock:
+            self._entries[version] = {None: body}
+            self._entries.move_to_end(version)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def has(self, version):
+        """Whether a content version is cached."""
+        with self._lock:
+            return version in self._entries
+
+    def get(self, version, encoding=None):
+        """Return the body for version in the given encoding, or None if not cached."""
+        with self._lock:
+            variants = self._entries.get(version)
+            if variants is None:
+                return None
+            self._entries.move_to_end(version)
+            body = variants.get(encoding)
+            identity = variants[None]
+        if body is not None:
+            return body
+
+        # Compress outside the lock; a duplicate compression under a race is harmless
+        with timed('compress'):
+            body = compress(identity, encoding)
+        with self._lock:
+            if version in self._entries:
+                self._entries[version][encoding] = body
+        return body
+
+class PageFileCache:
+    """Rendered page bodies and their compressed variants, as files on disk.
+
+    Same interface as VariantCache, plus path(): a hit is a file the server
+    can send with wsgi.file_wrapper (sendfile under gunicorn), or hand to
+    the front proxy through X-Sendfile / X-Accel-Redirect, so page bytes
+    never pass through Python and memory per request does not grow with the
+    notebook. Files are named after the content version, written atomically
+    and shared by all workers; the oldest versions beyond max_entries are
+    removed when a new one is written.
+    """
+
+    SUFFIXES = {None: '.html', 'gzip': '.html.gz', 'br': '.html.br'}
+
+    def __init__(self, directory, max_entries=1024):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def _file(self, version, encoding=None):
+        return os.path.join(self.directory, version + self.SUFFIXES[encoding])
+
+    def _write(self, path, body):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def put(self, version, body):
+        """Write the uncompressed body for a content version."""
+        self._write(self._file(version), body)
+        self.prune()
+
+    def has(self, version):
+        """Whether a content version has been materialized."""
+        return os.path.exists(self._file(version))
+
+    def path(self, version, encoding=None):
+        """Return the file holding version in the given encoding, or None if not cached.
+
+        A compressed variant is written the first time it is asked for.
+        """
+        path = self._file(version, encoding)
+        if os.path.exists(path):
+            return path
+        if encoding is None:
+            return None
+        try:
+            with open(self._file(version), 'rb') as f:
+                identity = f.read()
+        except FileNotFoundError:
+            return None
+        with timed('compress'):
+            body = compress(identity, encoding)
+        self._write(path, body)
+        return path
+
+    def get(self, version, encoding=None):
+        """Return the body for version in the given encoding, or None if not cached."""
+        path = self.path(version, encoding)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def prune(self):
+        """Delete the oldest versions beyond max_entries."""
+        try:
+            names = [name for name in os.listdir(self.directory) if name.endswith('.html')]
+        except FileNotFoundError:
+            return
+        if len(names) <= self.max_entries:
+            return
+
+        def written(name):
+            try:
+                return os.path.getmtime(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                return 0
+
+        names.sort(key=written)
+        for name in names[:len(names) - self.max_entries]:
+            version = name[:-len('.html')]
+            for encoding in self.SUFFIXES:
+                try:
+                    os.unlink(self._file(version, encoding))
+                except FileNotFoundError:
+                    pass
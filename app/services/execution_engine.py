@@ -0,0 +1,171 @@
+# app/services/execution_engine.py
+import os
+import queue
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+import nbformat
+from jupyter_client.manager import KernelManager
+from nbclient import NotebookClient
+from nbclient.exceptions import CellExecutionError
+
+# Run before every notebook so it starts from an empty namespace in its own directory
+RESET_SOURCE = """get_ipython().run_line_magic('reset', '-f')
+__import__('os').chdir({cwd!r})"""
+
+class KernelPool:
+    """Pool of pre-started Jupyter kernels that are reused between notebooks."""
+
+    def __init__(self, size=2, kernel_name='python3', startup_timeout=60):
+        self.size = max(1, size)
+        self.kernel_name = kernel_name
+        self.startup_timeout = startup_timeout
+        self._kernels = []
+        self._idle = queue.Queue()
+        for _ in range(self.size):
+            kernel = self._start_kernel()
+            self._kernels.append(kernel)
+            self._idle.put(kernel)
+
+    def _start_kernel(self):
+        km = KernelManager(kernel_name=self.kernel_name)
+        km.start_kernel()
+        kc = km.client()
+        kc.start_channels()
+        kc.wait_for_ready(timeout=self.startup_timeout)
+        return km, kc
+
+    def _restart_kernel(self, kernel):
+        """Replace a kernel that timed out or died with a fresh one."""
+        km, kc = kernel
+        kc.stop_channels()
+        km.shutdown_kernel(now=True)
+        fresh = self._start_kernel()
+        self._kernels[self._kernels.index(kernel)] = fresh
+        return fresh
+
+    @contextmanager
+    def kernel(self, timeout=None):
+        """Borrow a ``(kernel_manager, kernel_client)`` pair.
+
+        If the body raises anything other than a cell error, the kernel may be
+        stuck mid-execution, so it is restarted before going back to the pool.
+        """
+        kernel = self._idle.get(timeout=timeout)
+        try:
+            if not kernel[0].is_alive():
+                kernel = self._restart_kernel(kernel)
+            yield kernel
+        except CellExecutionError:
+            raise
+        except Exception:
+            kernel = self._restart_kernel(kernel)
+            raise
+        finally:
+            self._idle.put(kernel)
+
+    def shutdown(self):
+        """Stop every kernel in the pool."""
+        for km, kc in self._kernels:
+            kc.stop_channels()
+            km.shutdown_kernel(now=True)
+        self._kernels = []
+
+class ExecutionEngine:
+    """Executes notebooks on a warm kernel pool and caches the executed result.
+
+    Results are keyed by the SHA-256 of the notebook source and the kernel
+    name, so an unchanged notebook is never executed twice. With a cache_dir
+    the executed notebooks are also kept on disk across restarts.
+    """
+
+    def __init__(self, pool_size=2, kernel_name='python3', cell_timeout=30, cache_dir=None):
+        self.kernel_name = kernel_name
+        self.cell_timeout = cell_timeout
+        self.cache_dir = cache_dir
+        self.pool = KernelPool(pool_size, kernel_name)
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.cache_hits = 0
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def execute(self, notebook, source_digest, cwd=None):
+        """Return an executed copy of notebook, from the cache when possible."""
+        key = hashlib.sha256(f'{source_digest}:{self.kernel_name}'.encode('utf-8')).hexdigest()
+
+        cached = self._cache_get(key)
+        if cached is not None:
+            with self._lock:
+                self.cache_hits += 1
+            return cached
+
+        executed = nbformat.from_dict(notebook)
+        reset = nbformat.v4.new_notebook(cells=[
+            nbformat.v4.new_code_cell(RESET_SOURCE.format(cwd=cwd or os.getcwd()))
+        ])
+        with self.pool.kernel() as (km, kc):
+            self._client(reset, km, kc).execute()
+            # Cell errors are kept as outputs, like a student would see them
+            self._client(executed, km, kc, allow_errors=True).execute()
+
+        with self._lock:
+            self.executions += 1
+        self._cache_set(key, executed)
+        return nbformat.from_dict(executed)
+
+    def execute_many(self, jobs):
+        """Execute ``(notebook, source_digest, cwd)`` jobs concurrently across the pool."""
+        with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            futures = [executor.submit(self.execute, *job) for job in jobs]
+            return [future.result() for future in futures]
+
+    def stats(self):
+        """Return execution and cache counters."""
+        with self._lock:
+            return {'executions': self.executions, 'cache_hits': self.cache_hits}
+
+    def shutdown(self):
+        """Stop the kernel pool."""
+        self.pool.shutdown()
+
+    def _client(self, notebook, km, kc, **kwargs):
+        """Build a NotebookClient that runs on an already started kernel."""
+        client = NotebookClient(notebook, km=km, timeout=self.cell_timeout, **kwargs)
+        # Not a constructor argument; without it nbclient opens a new client per notebook
+        client.kc = kc
+        return client
+
+    def _cache_get(self, key):
+        with self._lock:
+            if key in self._cache:
+                return nbformat.reads(self._cache[key], as_version=4)
+        if not self.cache_dir:
+            return None
+        try:
+            with open(os.path.join(self.cache_dir, f'{key}.ipynb'), 'r', encoding='utf-8') as f:
+                data = f.read()
+        except OSError:
+            return None
+        with self._lock:
+            self._cache[key] = data
+        return nbformat.reads(data, as_version=4)
+
+    def _cache_set(self, key, notebook):
+        data = nbformat.writes(notebook)
+        with self._lock:
+            self._cache[key] = data
+        if not self.cache_dir:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(self.cache_dir, f'{key}.ipynb'))
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,36 @@
+# app/services/exporter_pool.py
+import queue
+from contextlib import contextmanager
+
+def warm_exporter(exporter):
+    """Compile the exporter's template by running one throwaway conversion."""
+    import nbformat
+    exporter.from_notebook_node(nbformat.v4.new_notebook())
+    return exporter
+
+class ExporterPool:
+    """Fixed-size pool of pre-warmed nbconvert exporters.
+
+    ``HTMLExporter.from_notebook_node`` registers filters on the exporter it
+    runs on, so a single instance must not be shared between threads. Each
+    conversion borrows an exporter for its duration and returns it afterwards.
+    """
+
+    def __init__(self, factory, size=2):
+        self.size = max(1, size)
+        self._pool = queue.LifoQueue()
+        for _ in range(self.size):
+            self._pool.put(warm_exporter(factory()))
+
+    @contextmanager
+    def exporter(self, timeout=None):
+        """Borrow an exporter, blocking until one is free."""
+        exporter = self._pool.get(timeout=timeout)
+        try:
+            yield exporter
+        finally:
+            self._pool.put(exporter)
+
+    def available(self):
+        """Number of exporters not currently in use."""
+        return self._pool.qsize()
@@ -0,0 +1,268 @@
+# app/services/image_pipeline.py
+import io
+import os
+import re
+import json
+import base64
+import struct
+from urllib.parse import unquote
+
+# Pillow is optional and imported on first use; without it images keep their original size and format
+_pillow = None
+
+# Formats offered through <source srcset>, most preferred first
+VARIANT_MIME_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+PILLOW_FORMATS = {'avif': 'AVIF', 'webp': 'WEBP'}
+
+# Extensions of local files referenced by markdown images that are worth processing
+RASTER_EXTENSIONS = {'.png': '.png', '.jpg': '.jpg', '.jpeg': '.jpg', '.gif': '.gif', '.webp': '.webp'}
+DATA_URI_RE = re.compile(r'data:image/(png|jpeg|gif|webp);base64,(.*)', re.DOTALL)
+
+IMG_TAG_RE = re.compile(r'<img\b[^>]*>', re.IGNORECASE)
+ATTR_RE = re.compile(r'''([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s"'=<>`]+)))?''')
+SCHEME_RE = re.compile(r'^[a-zA-Z][a-zA-Z0-9+.-]*:')
+
+def image_size(data):
+    """Return (width, height) from a PNG, GIF or JPEG header, or None."""
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return struct.unpack('<HH', data[6:10])
+    if data[:2] == b'\xff\xd8':
+        # Walk the JPEG segments up to the first start-of-frame marker
+        i = 2
+        while i + 9 < len(data):
+            if data[i] != 0xff:
+                return None
+            marker = data[i + 1]
+            if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+                height, width = struct.unpack('>HH', data[i + 5:i + 9])
+                return width, height
+            i += 2 + struct.unpack('>H', data[i + 2:i + 4])[0]
+    return None
+
+def parse_attributes(tag):
+    """Return the attributes of an <img> tag as an ordered dict (valueless ones map to '')."""
+    attributes = {}
+    for match in ATTR_RE.finditer(tag, 4, len(tag) - 1):
+        name, *values = match.groups()
+        value = next((v for v in values if v is not None), '')
+        attributes.setdefault(name.lower(), value)
+    return attributes
+
+def format_tag(name, attributes):
+    parts = [name]
+    for key, value in attributes.items():
+        # Values keep their entities; only quotes from single-quoted values need escaping
+        value = value.replace('"', '&quot;')
+        parts.append(f'{key}="{value}"')
+    return '<' + ' '.join(parts) + '>'
+
+def load_pillow():
+    """Return the PIL.Image module, or None when Pillow is not installed."""
+    global _pillow
+    if _pillow is None:
+        try:
+            from PIL import Image
+        except ImportError:
+            Image = False
+        _pillow = Image
+    return _pillow or None
+
+def supported_formats(formats):
+    """The requested variant formats this Pillow build can encode."""
+    if load_pillow() is None:
+        return ()
+    from PIL import features
+    return tuple(f for f in formats if f in PILLOW_FORMATS and features.check(f))
+
+class ImagePipeline:
+    """Turn the images of a rendered notebook into cacheable files.
+
+    Inline base64 images and local files referenced by markdown are moved
+    into the content-addressed outputs, every image gets its width, height,
+    loading="lazy" and decoding="async", and, when Pillow is installed,
+    narrower copies in modern formats are offered through <picture> and
+    srcset. Variant names are derived from the source content and the
+    encoding settings, and a variant already in the output store is reused,
+    so each image is encoded once per content version across all workers.
+    """
+
+    def __init__(self, output_store, url_prefix, widths=(480, 960), formats=('webp',), quality=80):
+        self.output_store = output_store
+        self.url_prefix = url_prefix
+        self.widths = tuple(sorted(set(widths)))
+        self.requested_formats = tuple(formats)
+        self.quality = quality
+        self.encoded = 0
+        self.reused = 0
+        self._formats = None
+
+    @property
+    def formats(self):
+        """The variant formats that will be produced, resolved (importing Pillow) on first use."""
+        if self._formats is None:
+            self._formats = supported_formats(self.requested_formats)
+        return self._formats
+
+    def fingerprint(self):
+        """Describe the settings that affect the rewritten HTML."""
+        return json.dumps({
+            'widths': self.widths,
+            'formats': self.formats,
+            'quality': self.quality,
+        }, sort_keys=True)
+
+    def process(self, html_content, outputs, base_dir=None):
+        """Rewrite every <img> in html_content. Returns the HTML and the outputs, including new files."""
+        outputs = dict(outputs)
+
+        def replace(match):
+            tag = match.group(0)
+            attributes = parse_attributes(tag)
+            image = self._resolve(attributes.get('src', ''), outputs, base_dir)
+            attributes.setdefault('loading', 'lazy')
+            attributes.setdefault('decoding', 'async')
+            if image is None:
+                return format_tag('img', attributes)
+
+            name, data = image
+            attributes['src'] = self.url_prefix + name
+            size = image_size(data) or self._pillow_size(data)
+            if size is None:
+                return format_tag('img', attributes)
+
+            width, height = self._display_size(attributes, size)
+            attributes['width'] = str(width)
+            attributes['height'] = str(height)
+            sources = self._sources(name, data, size, outputs, width)
+            return ''.join(['<picture>'] + sources + [format_tag('img', attributes), '</picture>'])
+
+        return IMG_TAG_RE.sub(replace, html_content), outputs
+
+    def _resolve(self, src, outputs, base_dir):
+        """Return (content name, bytes) for an image this pipeline can serve, adding it to outputs."""
+        src = src.strip()
+        if src.startswith(self.url_prefix):
+            name = src[len(self.url_prefix):]
+            data = outputs.get(name)
+            return (name, data) if data is not None else None
+
+        match = DATA_URI_RE.match(src)
+        if match:
+            try:
+                data = base64.b64decode(match.group(2))
+            except ValueError:
+                return None
+            extension = '.jpg' if match.group(1) == 'jpeg' else f'.{match.group(1)}'
+            return self._add(f'image{extension}', data, outputs)
+
+        # Relative references are resolved against the notebook, and must stay inside its directory
+        if base_dir is None or not src or SCHEME_RE.match(src) or src.startswith(('/', '#')):
+            return None
+        path = os.path.realpath(os.path.join(base_dir, unquote(src.split('?', 1)[0].split('#', 1)[0])))
+        root = os.path.realpath(base_dir)
+        extension = RASTER_EXTENSIONS.get(os.path.splitext(path)[1].lower())
+        if extension is None or not path.startswith(root + os.sep) or not os.path.isfile(path):
+            return None
+        with open(path, 'rb') as f:
+            data = f.read()
+        return self._add(f'image{extension}', data, outputs)
+
+    def _add(self, filename, data, outputs):
+        name = self.output_store.content_name(filename, data)
+        outputs[name] = data
+        return name, data
+
+    @staticmethod
+    def _display_size(attributes, size):
+        """Keep a width or height given by the notebook, filling in the other from the aspect ratio."""
+        width, height = size
+        try:
+            shown_width = int(float(attributes['width'])) if attributes.get('width') else None
+            shown_height = int(float(attributes['height'])) if attributes.get('height') else None
+        except ValueError:
+            shown_width = shown_height = None
+        if shown_width and shown_height:
+            return shown_width, shown_height
+        if shown_width:
+            return shown_width, max(1, round(height * shown_width / width))
+        if shown_height:
+            return max(1, round(width * shown_height / height)), shown_height
+        return width, height
+
+    def _sources(self, name, data, size, outputs, display_width):
+        """Return <source> elements for the variants of an image, encoding any that do not exist yet."""
+        if not self.formats:
+            return []
+
+        width, height = size
+        stem = os.path.splitext(name)[0]
+        targets = [w for w in self.widths if w < width] + [width]
+        sources = []
+        image = None
+        for variant_format in self.formats:
+            candidates = []
+            for target in targets:
+                variant_name = f'{stem}-{target}w-q{self.quality}.{variant_format}'
+                variant = self._stored(variant_name)
+                if variant is None:
+                    if image is None:
+                        image = self._open(data)
+                        if image is None:
+                            return []
+                    variant = self._encode(image, target, max(1, round(height * target / width)), variant_format)
+                    self.encoded += 1
+                else:
+                    self.reused += 1
+                # A full-size copy no smaller than the original is not worth offering
+                if target == width and len(variant) >= len(data):
+                    continue
+                outputs[variant_name] = variant
+                candidates.append(f'{self.url_prefix}{variant_name} {target}w')
+            if candidates:
+                sources.append(
+                    f'<source type="{VARIANT_MIME_TYPES[variant_format]}" srcset="{", ".join(candidates)}" '
+                    f'sizes="(max-width: {display_width}px) 100vw, {display_width}px">'
+                )
+        return sources
+
+    def _stored(self, name):
+        path = os.path.join(self.output_store.directory, name)
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    @staticmethod
+    def _open(data):
+        """Decode an image for resizing; animations are left alone."""
+        Image = load_pillow()
+        try:
+            image = Image.open(io.BytesIO(data))
+            if getattr(image, 'is_animated', False):
+                return None
+            image.load()
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return None
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        return image
+
+    def _encode(self, image, width, height, variant_format):
+        if (width, height) != image.size:
+            image = image.resize((width, height), load_pillow().LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, format=PILLOW_FORMATS[variant_format], quality=self.quality)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _pillow_size(data):
+        Image = load_pillow()
+        if Image is None:
+            return None
+        try:
+            return Image.open(io.BytesIO(data)).size
+        except (OSError, ValueError):
+            return None
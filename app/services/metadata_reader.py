@@ -0,0 +1,92 @@
+# app/services/metadata_reader.py
+import os
+import re
+import json
+
+# Bytes read from each end of the file at first; doubled up to the maximum when a value is longer
+CHUNK_SIZE = 16 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+
+_decoder = json.JSONDecoder()
+
+CELLS_START_RE = re.compile(r'\s*\{\s*"cells"\s*:\s*\[\s*')
+COLON_RE = re.compile(r'\s*:\s*')
+# What follows the top-level metadata in a file written by nbformat
+FILE_END_RE = re.compile(r'\s*,\s*"nbformat"\s*:\s*(\d+)\s*,\s*"nbformat_minor"\s*:\s*\d+\s*\}\s*$')
+
+def read_notebook_head(notebook_path):
+    """Read the first cell and the top-level metadata of a notebook.
+
+    nbformat writes notebooks with sorted keys, so the file starts with the
+    cells and ends with the metadata. Only those two ends are read and
+    decoded, which costs the same for any notebook size. Nothing is
+    validated; a file laid out differently raises ValueError, and the caller
+    should fall back to nbformat.read.
+
+    Returns a NotebookNode with ``cells`` (the first cell only) and ``metadata``.
+    """
+    with open(notebook_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        first_cell = _read_first_cell(f, size)
+        metadata = _read_metadata(f, size)
+
+    cells = []
+    if first_cell is not None:
+        if not isinstance(first_cell, dict) or 'cell_type' not in first_cell:
+            raise ValueError('First cell is not a cell')
+        source = first_cell.get('source', '')
+        first_cell['source'] = ''.join(source) if isinstance(source, list) else source
+        cells.append(first_cell)
+
+    from nbformat import from_dict
+    return from_dict({'cells': cells, 'metadata': metadata})
+
+def _read_chunk(f, size, length, from_end=False):
+    f.seek(size - length if from_end else 0)
+    # A chunk may cut a multi-byte character in half at its edge; that part is never decoded
+    return f.read(length).decode('utf-8', errors='ignore')
+
+def _read_first_cell(f, size):
+    length = min(size, CHUNK_SIZE)
+    while True:
+        text = _read_chunk(f, size, length)
+        match = CELLS_START_RE.match(text)
+        if not match:
+            raise ValueError('Notebook does not start with its cells')
+        if text.startswith(']', match.end()):
+            return None
+        try:
+            cell, _ = _decoder.raw_decode(text, match.end())
+            return cell
+        except ValueError:
+            if length >= size or length >= MAX_CHUNK_SIZE:
+                raise ValueError('First cell could not be decoded')
+            length = min(size, length * 2)
+
+def _read_metadata(f, size):
+    length = min(size, CHUNK_SIZE)
+    while True:
+        text = _read_chunk(f, size, length, from_end=True)
+        end = len(text)
+        # Try "metadata" keys from the last one back; the right one is followed by the file end
+        while True:
+            position = text.rfind('"metadata"', 0, end)
+            if position < 0:
+                break
+            end = position
+            colon = COLON_RE.match(text, position + len('"metadata"'))
+            if not colon:
+                continue
+            try:
+                metadata, after = _decoder.raw_decode(text, colon.end())
+            except ValueError:
+                continue
+            file_end = FILE_END_RE.match(text, after)
+            if file_end and isinstance(metadata, dict):
+                if int(file_end.group(1)) != 4:
+                    raise ValueError('Only nbformat 4 notebooks are read directly')
+                return metadata
+
+        if length >= size or length >= MAX_CHUNK_SIZE:
+            raise ValueError('Notebook does not end with its metadata')
+        length = min(size, length * 2)
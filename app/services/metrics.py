@@ -0,0 +1,195 @@
+# app/services/metrics.py
+import time
+import threading
+from contextlib import contextmanager
+from flask import g, request, has_request_context
+
+# Latency buckets in seconds, from a cache hit to a slow cold render
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    type = 'counter'
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        with self._lock:
+            return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, labels, value) for labels, value in self._values.items()]
+
+class Histogram:
+    """Observations counted into cumulative buckets per label set."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # One count per bucket, then +Inf, sum and count
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[len(self.buckets)] += 1
+            counts[-2] += value
+            counts[-1] += 1
+
+    def count(self, **labels):
+        with self._lock:
+            counts = self._values.get(tuple(sorted(labels.items())))
+            return counts[-1] if counts else 0
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            for labels, counts in self._values.items():
+                for bound, count in zip(self.buckets + (float('inf'),), counts):
+                    samples.append((f'{self.name}_bucket', labels + (('le', _format_value(float(bound))),), count))
+                samples.append((f'{self.name}_sum', labels, counts[-2]))
+                samples.append((f'{self.name}_count', labels, counts[-1]))
+        return samples
+
+class MetricsRegistry:
+    """Process-wide metrics rendered in the Prometheus text format.
+
+    Each gunicorn worker keeps its own registry, so a scrape sees one
+    worker's numbers; add a worker label in the scraper or scrape each worker.
+    Collectors are called at scrape time for values that already live
+    elsewhere, such as cache statistics.
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, help_text):
+        metric = Counter(name, help_text)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, help_text, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        """Register collector() -> iterable of ``(name, type, help, labels, value)``."""
+        self._collectors.append(collector)
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+
+        described = set()
+        for collector in self._collectors:
+            for name, metric_type, help_text, labels, value in collector():
+                if name not in described:
+                    described.add(name)
+                    lines.append(f'# HELP {name} {help_text}')
+                    lines.append(f'# TYPE {name} {metric_type}')
+                lines.append(f'{name}{_format_labels(sorted(labels.items()))} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+# Global registry and the metrics recorded on the hot path
+registry = MetricsRegistry()
+
+REQUEST_SECONDS = registry.histogram(
+    'python_notes_request_seconds', 'Time until the response headers are ready, by endpoint.')
+REQUESTS = registry.counter(
+    'python_notes_requests_total', 'Requests handled by Flask, by endpoint and status.')
+RESPONSE_BYTES = registry.counter(
+    'python_notes_response_bytes_total', 'Body bytes of non-streamed responses, by endpoint.')
+STAGE_SECONDS = registry.histogram(
+    'python_notes_stage_seconds', 'Time spent in each notebook rendering stage.')
+RENDERS = registry.counter(
+    'python_notes_renders_total', 'nbconvert conversions, of whole notebooks or single cells.')
+
+def register_collector(collector):
+    """Add a scrape-time collector to the global registry."""
+    registry.add_collector(collector)
+
+@contextmanager
+def timed(stage):
+    """Time a rendering stage into STAGE_SECONDS and the request's Server-Timing."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if has_request_context():
+            timings = g.setdefault('stage_timings', {})
+            timings[stage] = timings.get(stage, 0.0) + elapsed
+
+def init_metrics(app):
+    """Record request metrics and, if enabled, add Server-Timing headers."""
+    server_timing = app.config.get('SERVER_TIMING', False)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        endpoint = request.endpoint or 'none'
+        started = g.get('request_started')
+        elapsed = time.perf_counter() - started if started is not None else None
+        if elapsed is not None:
+            REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+        REQUESTS.inc(endpoint=endpoint, status=response.status_code)
+        # Files sent with send_file count too; generated streams have no length
+        if response.content_length:
+            RESPONSE_BYTES.inc(response.content_length, endpoint=endpoint)
+
+        if server_timing:
+            entries = [f'{stage};dur={seconds * 1000:.2f}'
+                       for stage, seconds in g.get('stage_timings', {}).items()]
+            if elapsed is not None:
+                entries.append(f'total;dur={elapsed * 1000:.2f}')
+            if entries:
+                response.headers['Server-Timing'] = ', '.join(entries)
+        return response
@@ -0,0 +1,210 @@
+# app/services/notebook_catalog.py
+import os
+import json
+import tempfile
+import threading
+from app.services.metadata_reader import read_notebook_head
+
+# Global catalog object
+notebook_catalog = None
+
+def init_notebook_catalog(app):
+    """Initialize the notebook catalog and build it for the configured directory."""
+    global notebook_catalog
+
+    notebook_catalog = NotebookCatalog(app.config.get('CATALOG_PATH'))
+    notebook_catalog.refresh(app.config['NOTEBOOKS_DIR'])
+
+    app.logger.info(f'Notebook catalog loaded with {len(notebook_catalog.entries)} notebooks')
+
+def get_notebook_catalog():
+    """Return the application's notebook catalog."""
+    return notebook_catalog
+
+def notebook_title(notebook, notebook_path):
+    """Get the display title of a notebook from its first markdown line."""
+    title = None
+    if notebook['cells'] and notebook['cells'][0]['cell_type'] == 'markdown':
+        first_line = notebook['cells'][0]['source'].split('\n')[0]
+        # Remove markdown heading symbols and whitespace
+        title = first_line.lstrip('#').strip()
+
+    if not title:
+        # Fallback to filename
+        title = os.path.splitext(os.path.basename(notebook_path))[0]
+
+    return title
+
+def notebook_headings(notebook):
+    """List the markdown headings of a notebook, skipping fenced code blocks."""
+    headings = []
+    for index, cell in enumerate(notebook['cells']):
+        if cell['cell_type'] != 'markdown':
+            continue
+        in_fence = False
+        for line in cell['source'].split('\n'):
+            stripped = line.strip()
+            if stripped.startswith('```'):
+                in_fence = not in_fence
+                continue
+            if in_fence or not stripped.startswith('#'):
+                continue
+            level = len(stripped) - len(stripped.lstrip('#'))
+            text = stripped.lstrip('#').strip()
+            if text and level <= 6:
+                headings.append({'level': level, 'text': text, 'cell': index})
+    return headings
+
+def read_notebook_cells(notebook_path):
+    """Load the cells of a v4 notebook as plain dicts, without nbformat's conversion or validation.
+
+    Sources are joined into strings. Anything else raises ValueError.
+    """
+    with open(notebook_path, 'r', encoding='utf-8') as f:
+        notebook = json.load(f)
+    if not isinstance(notebook, dict) or notebook.get('nbformat') != 4 or not isinstance(notebook.get('cells'), list):
+        raise ValueError('Not an nbformat 4 notebook')
+    cells = []
+    for cell in notebook['cells']:
+        if not isinstance(cell, dict) or 'cell_type' not in cell:
+            raise ValueError('Cell without a type')
+        source = cell.get('source', '')
+        cells.append({'cell_type': cell['cell_type'],
+                      'source': ''.join(source) if isinstance(source, list) else source})
+    return {'cells': cells}
+
+def describe_notebook(notebook_path, st=None):
+    """Build the catalog entry for a single notebook file."""
+    if st is None:
+        st = os.stat(notebook_path)
+
+    # The title comes from the first cell alone, and the counts and headings only
+    # need cell types and sources; malformed files go through nbformat as before
+    try:
+        head = read_notebook_head(notebook_path)
+        notebook = read_notebook_cells(notebook_path)
+    except ValueError:
+        import nbformat
+        with open(notebook_path, 'r', encoding='utf-8') as f:
+            head = notebook = nbformat.read(f, as_version=4)
+
+    cell_counts = {'markdown': 0, 'code': 0, 'raw': 0}
+    for cell in notebook['cells']:
+        cell_counts[cell['cell_type']] = cell_counts.get(cell['cell_type'], 0) + 1
+
+    filename = os.path.basename(notebook_path)
+    return {
+        'id': os.path.splitext(filename)[0],
+        'title': notebook_title(head, notebook_path),
+        'filename': filename,
+        'path': notebook_path,
+        'size': st.st_size,
+        'mtime': st.st_mtime,
+        'mtime_ns': st.st_mtime_ns,
+        'cells': cell_counts,
+        'headings': notebook_headings(notebook),
+    }
+
+class NotebookCatalog:
+    """In-memory index of the notebooks directory, persisted as JSON.
+
+    Refreshing only stats the directory; notebooks are parsed again only when
+    their size or mtime differs from the recorded entry.
+    """
+
+    def __init__(self, catalog_path=None):
+        self.catalog_path = catalog_path
+        self.notebooks_dir = None
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def refresh(self, notebooks_dir):
+        """Bring the catalog in line with the directory. Returns the changed notebook ids."""
+        notebooks_dir = os.path.abspath(notebooks_dir)
+        with self._lock:
+            if notebooks_dir != self.notebooks_dir:
+                self.notebooks_dir = notebooks_dir
+                self.entries = {}
+
+            seen = set()
+            changed = []
+            try:
+                dir_entries = list(os.scandir(notebooks_dir))
+            except FileNotFoundError:
+                dir_entries = []
+
+            for dir_entry in dir_entries:
+                if not dir_entry.name.endswith('.ipynb') or not dir_entry.is_file():
+                    continue
+                notebook_id = os.path.splitext(dir_entry.name)[0]
+                seen.add(notebook_id)
+
+                st = dir_entry.stat()
+                known = self.entries.get(notebook_id)
+                if known and known['mtime_ns'] == st.st_mtime_ns and known['size'] == st.st_size:
+                    continue
+
+                try:
+                    self.entries[notebook_id] = describe_notebook(dir_entry.path, st)
+                except (OSError, ValueError):
+                    # Unreadable or half-written notebook; try again on the next refresh
+                    self.entries.pop(notebook_id, None)
+                    continue
+                changed.append(notebook_id)
+
+            removed = [notebook_id for notebook_id in self.entries if notebook_id not in seen]
+            for notebook_id in removed:
+                del self.entries[notebook_id]
+
+            if changed or removed:
+                self._save()
+
+            return changed + removed
+
+    def list_notebooks(self, notebooks_dir):
+        """Return catalog entries for the directory, sorted by title."""
+        self.refresh(notebooks_dir)
+        with self._lock:
+            notebooks = list(self.entries.values())
+        notebooks.sort(key=lambda x: x['title'])
+        return notebooks
+
+    def get(self, notebooks_dir, notebook_id):
+        """Return the catalog entry for one notebook, or None."""
+        self.refresh(notebooks_dir)
+        with self._lock:
+            return self.entries.get(notebook_id)
+
+    def versions(self):
+        """Map each notebook id to its ``(mtime_ns, size)`` as of the last refresh."""
+        with self._lock:
+            return {notebook_id: (entry['mtime_ns'], entry['size'])
+                    for notebook_id, entry in self.entries.items()}
+
+    def _load(self):
+        if not self.catalog_path or not os.path.exists(self.catalog_path):
+            return
+        try:
+            with open(self.catalog_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.notebooks_dir = data.get('notebooks_dir')
+        self.entries = data.get('entries', {})
+
+    def _save(self):
+        if not self.catalog_path:
+            return
+        catalog_dir = os.path.dirname(self.catalog_path)
+        os.makedirs(catalog_dir, exist_ok=True)
+
+        # Write to a temp file and rename so other workers never read a partial catalog
+        fd, tmp_path = tempfile.mkstemp(dir=catalog_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'notebooks_dir': self.notebooks_dir, 'entries': self.entries}, f)
+            os.replace(tmp_path, self.catalog_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
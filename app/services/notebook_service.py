@@ -1,102 +1,536 @@
 # app/services/notebook_service.py
 import os
+import re
 import json
-import nbformat
-from nbconvert import HTMLExporter
-from nbconvert.preprocessors import ExecutePreprocessor, Preprocessor
-from flask import current_app
-from traitlets.config import Config
-import shutil
+from importlib import metadata
+import atexit
+import hashlib
+import threading
 
-# Global exporter object
-html_exporter = None
-execute_preprocessor = None
+# nbconvert, nbformat and the execution engine are imported where they are first
+# used, so creating the app does not pay for them; see warm_up_notebook_service
+from app.services.exporter_pool import ExporterPool
+from app.services.notebook_catalog import notebook_title
+from app.services.metadata_reader import read_notebook_head
+from app.services.output_store import OutputStore
+from app.services.image_pipeline import ImagePipeline
+from app.services.prerendered import PrerenderedBundle
+from app.services.render_cache import RenderCache
+from app.services.cache_backends import create_cache_backend, FileBackend
+from app.services.single_flight import SingleFlight
+from app.services.admission import render_slot
+from app.services.metrics import timed, register_collector, RENDERS
+
+# Bump when the post-processing in get_notebook_html changes, to invalidate cached renders
+RENDER_VERSION = 5
+
+# URL prefix that extracted output files are served from
+OUTPUTS_URL = '/notes/outputs/'
+
+# HTMLExporter options shared by every exporter in the pool
+EXPORTER_SETTINGS = {
+    'exclude_input_prompt': True,
+    'exclude_output_prompt': True,
+    'template_name': 'notes',
+}
+
+# The notes template wraps each cell of the classic template in a marker element
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'nbconvert_templates')
+
+# Cell metadata key read by the notes template
+CELL_MARKER_KEY = 'python_notes'
+
+# Cells the browser cannot run as plain Python: cell magics name their own language
+CELL_MAGIC_RE = re.compile(r'\A\s*%%(\w+)')
+LINE_MAGIC_RE = re.compile(r'^\s*[%!]', re.MULTILINE)
+
+# Cell manifest element embedded at the end of the notebook HTML
+MANIFEST_ID = 'cell-manifest'
+
+# Markdown cells opening with a level 1 or 2 heading start a new page section
+SECTION_HEADING_RE = re.compile(r'\A\s*#{1,2}\s')
+SECTION_START_RE = re.compile(r'<div class="notes-cell"[^>]*\sdata-section="\d+"')
+
+# Streamed pages are built from the classic template's cell markup
+CELL_TEMPLATE_FILE = 'base.html.j2'
+FRAME_CONTAINER = '<div class="container" id="notebook-container">\n'
+
+# Global exporter pools, created on first use
+exporter_pool = None
+exporter_pool_size = 2
+cell_exporter_pool = None
+exporter_lock = threading.Lock()
+nbconvert_version = None
+fragment_cache = None
+notebook_frame = None
+execution_engine = None
+render_cache = None
+prerendered_bundle = None
+output_store = None
+image_pipeline = None
+render_flights = SingleFlight()
+render_wait_timeout = None
+
+def build_html_exporter():
+    """Create an HTMLExporter configured with EXPORTER_SETTINGS."""
+    from nbconvert import HTMLExporter
+    from traitlets.config import Config
+    
+    c = Config()
+    for name, value in EXPORTER_SETTINGS.items():
+        c.HTMLExporter[name] = value
+    c.HTMLExporter.extra_template_basedirs = [TEMPLATES_DIR]
+    return HTMLExporter(config=c)
+
+def build_cell_exporter():
+    """Create an exporter that renders cells only, without the document frame."""
+    html_exporter = build_html_exporter()
+    html_exporter.template_file = CELL_TEMPLATE_FILE
+    return html_exporter
 
 def init_notebook_service(app):
     """Initialize the notebook service with app context."""
-    global html_exporter, execute_preprocessor
+    global exporter_pool, execution_engine, render_cache, prerendered_bundle, output_store, image_pipeline
+    global cell_exporter_pool, fragment_cache, notebook_frame, render_flights, render_wait_timeout
+    global exporter_pool_size
     
-    # Configure the HTML exporter
-    c = Config()
-    c.HTMLExporter.exclude_input_prompt = True
-    c.HTMLExporter.exclude_output_prompt = True
-    c.HTMLExporter.template_name = 'classic'
+    # One pre-warmed exporter per concurrent render, built on first use or by the warmup
+    exporter_pool = None
+    exporter_pool_size = app.config.get('EXPORTER_POOL_SIZE', 2)
+    
+    # Streaming renders cell by cell with a body-only template
+    notebook_frame = None
+    cell_exporter_pool = None
+    fragment_cache = RenderCache(max_entries=app.config.get('FRAGMENT_CACHE_SIZE', 4096))
     
-    html_exporter = HTMLExporter(config=c)
+    # Keep warm kernels around only when notebooks are executed before rendering
+    if app.config.get('EXECUTE_NOTEBOOKS'):
+        from app.services.execution_engine import ExecutionEngine
+        execution_engine = ExecutionEngine(
+            pool_size=app.config.get('KERNEL_POOL_SIZE', 2),
+            kernel_name=app.config.get('KERNEL_NAME', 'python3'),
+            cell_timeout=app.config.get('CELL_TIMEOUT', 30),
+            cache_dir=app.config.get('EXECUTION_CACHE_DIR')
+        )
+        atexit.register(execution_engine.shutdown)
     
-    # Configure the execute preprocessor for potential future use
-    execute_preprocessor = ExecutePreprocessor(timeout=600, kernel_name='python3')
+    # Cache rendered HTML in memory and in a backend shared by all workers, if configured
+    shared_max_entries = app.config.get('RENDER_CACHE_SHARED_MAX_ENTRIES')
+    shared_max_bytes = app.config.get('RENDER_CACHE_SHARED_MAX_BYTES')
+    backend = create_cache_backend(app.config.get('RENDER_CACHE_BACKEND'), shared_max_entries, shared_max_bytes)
+    if backend is None and app.config.get('RENDER_CACHE_DIR'):
+        backend = FileBackend(app.config['RENDER_CACHE_DIR'], shared_max_entries, shared_max_bytes)
+    render_cache = RenderCache(
+        max_entries=app.config.get('RENDER_CACHE_SIZE', 32),
+        backend=backend,
+        lock_timeout=app.config.get('RENDER_LOCK_TIMEOUT', 60)
+    )
+    
+    # Serve pages from a bundle built by tools/convert_notebook.py --build, if present
+    prerendered_dir = app.config.get('PRERENDERED_DIR')
+    prerendered_bundle = PrerenderedBundle(prerendered_dir) if prerendered_dir else None
+    
+    # Concurrent requests for the same render share one conversion
+    render_flights = SingleFlight()
+    render_wait_timeout = app.config.get('RENDER_WAIT_TIMEOUT', 60)
+    
+    # Content-addressed store for images and other files extracted from outputs
+    output_store = OutputStore(app.config['NOTEBOOK_OUTPUTS_DIR'])
+    
+    # Images are moved out of the HTML, sized, lazy-loaded and, with Pillow, given smaller variants
+    image_pipeline = ImagePipeline(
+        output_store,
+        OUTPUTS_URL,
+        widths=app.config.get('IMAGE_VARIANT_WIDTHS', ()),
+        formats=app.config.get('IMAGE_VARIANT_FORMATS', ()),
+        quality=app.config.get('IMAGE_QUALITY', 80)
+    )
     
     app.logger.info('Notebook service initialized')
 
 def get_notebook_metadata(notebook_path):
     """Get metadata from notebook file."""
-    with open(notebook_path, 'r', encoding='utf-8') as f:
-        notebook = nbformat.read(f, as_version=4)
-        
-        # Get title from first cell if it's markdown
-        title = None
-        if notebook.cells and notebook.cells[0].cell_type == 'markdown':
-            first_line = notebook.cells[0].source.split('\n')[0]
-            # Remove markdown heading symbols and whitespace
-            title = first_line.lstrip('#').strip()
-        
-        if not title:
-            # Fallback to filename
-            title = os.path.splitext(os.path.basename(notebook_path))[0]
-            
-        return {
-            'title': title,
-            'metadata': notebook.metadata
+    try:
+        # Reads only the first cell and the metadata, whatever the notebook size
+        notebook = read_notebook_head(notebook_path)
+    except ValueError:
+        import nbformat
+        with open(notebook_path, 'r', encoding='utf-8') as f:
+            notebook = nbformat.read(f, as_version=4)
+    
+    return {
+        'title': notebook_title(notebook, notebook_path),
+        'metadata': notebook.metadata
+    }
+
+def notebook_language(notebook):
+    """Name of the language a notebook's code cells are written in."""
+    language_info = notebook.metadata.get('language_info') or {}
+    kernelspec = notebook.metadata.get('kernelspec') or {}
+    return (language_info.get('name') or kernelspec.get('language') or 'python').lower()
+
+def cell_language(source, default):
+    """Language of one code cell: a cell magic's name, ipython for magics and shell escapes."""
+    match = CELL_MAGIC_RE.match(source)
+    if match:
+        return match.group(1).lower()
+    if default == 'python' and LINE_MAGIC_RE.search(source):
+        return 'ipython'
+    return default
+
+def mark_cells(notebook, first_index=0):
+    """Record each cell's index in the source file, its language and section starts, for the notes template."""
+    language = notebook_language(notebook)
+    section = 0
+    for index, cell in enumerate(notebook.cells, first_index):
+        marker = {'index': index}
+        if cell.cell_type == 'code':
+            marker['language'] = cell_language(cell.source, language)
+        elif cell.cell_type == 'markdown' and SECTION_HEADING_RE.match(cell.source) and index > first_index:
+            section += 1
+            marker['section'] = section
+        cell.metadata[CELL_MARKER_KEY] = marker
+
+def build_cell_manifest(notebook):
+    """Return the code cells of a marked notebook as ``{index, language, source}`` dicts."""
+    return [
+        {
+            'index': cell.metadata[CELL_MARKER_KEY]['index'],
+            'language': cell.metadata[CELL_MARKER_KEY]['language'],
+            'source': cell.source,
         }
+        for cell in notebook.cells
+        if cell.cell_type == 'code' and CELL_MARKER_KEY in cell.metadata
+    ]
+
+def cell_manifest_html(notebook):
+    """Embed the cell manifest as JSON the page script reads instead of scanning the DOM."""
+    manifest = json.dumps(build_cell_manifest(notebook), separators=(',', ':'), ensure_ascii=False)
+    # Keep the JSON from closing the script element early
+    manifest = manifest.replace('<', '\\u003c').replace('>', '\\u003e').replace('&', '\\u0026')
+    return f'<script type="application/json" id="{MANIFEST_ID}">{manifest}</script>\n'
+
+def get_render_fingerprint(executed=None):
+    """Describe the exporter settings that affect rendered output."""
+    if executed is None:
+        executed = execution_engine is not None
+    settings = {
+        'nbconvert': get_nbconvert_version(),
+        'exporter': EXPORTER_SETTINGS,
+        'executed': executed,
+        'render_version': RENDER_VERSION,
+    }
+    return json.dumps(settings, sort_keys=True)
+
+def get_nbconvert_version():
+    """The installed nbconvert version, read from package metadata without importing nbconvert."""
+    global nbconvert_version
+    if nbconvert_version is None:
+        nbconvert_version = metadata.version('nbconvert')
+    return nbconvert_version
 
-class CodeCellPreprocessor(Preprocessor):
-    """Custom preprocessor to mark code cells as executable."""
+def get_cache_fingerprint():
+    """The render fingerprint plus the serving-side image settings, for cache keys and ETags.
     
-    def preprocess_cell(self, cell, resources, cell_index):
-        """Preprocess cell to add executable markers."""
-        if cell['cell_type'] == 'code':
-            cell['source'] = f'<div class="code-cell">{cell["source"]}</div>'
-        return cell, resources
+    Prerendered bundles are matched on the render fingerprint alone, because
+    images are processed when a bundle is served.
+    """
+    if image_pipeline is None:
+        return get_render_fingerprint()
+    return f'{get_render_fingerprint()}:{image_pipeline.fingerprint()}'
+
+def get_notebook_digest(notebook_path):
+    """SHA-256 of the notebook source, re-hashed only when the file changes."""
+    if render_cache is not None:
+        return render_cache.source_digest(notebook_path)
+    with open(notebook_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def get_render_cache_stats():
+    """Return hit/miss counters for the rendered notebook cache."""
+    if render_cache is None:
+        return {}
+    return render_cache.stats()
+
+def get_render_flight_stats():
+    """Return counters for coalesced renders."""
+    return render_flights.stats()
+
+def coalesce_render(key, func):
+    """Run func once for all concurrent callers with the same key."""
+    return render_flights.do(key, func, timeout=render_wait_timeout)
+
+def claim_render(key):
+    """Lead the render for key from a streamed response; see SingleFlight.claim."""
+    return render_flights.claim(key)
 
 def get_notebook_html(notebook_path):
-    """Convert notebook to HTML with interactive features."""
-    with open(notebook_path, 'r', encoding='utf-8') as f:
-        notebook = nbformat.read(f, as_version=4)
+    """Convert notebook to HTML with interactive features, using the render cache."""
+    if render_cache is None:
+        html_content, resources = render_notebook_html(notebook_path)
+    else:
+        html_content, resources = get_cached_notebook_html(notebook_path)
+    
+    # Output files are content-addressed, so steady state this only stats them
+    if output_store is not None:
+        with timed('write_outputs'):
+            output_store.publish(resources.get('outputs') or {})
+    
+    return html_content, resources
+
+def get_cached_notebook_html(notebook_path):
+    """Look a notebook up in the render cache and bundle, rendering it on a miss."""
+    fingerprint = get_render_fingerprint()
+    key = render_cache.make_key(notebook_path, get_cache_fingerprint())
+    
+    def create():
+        # Fall back to the build-time bundle before paying for a conversion
+        return lookup_prerendered(notebook_path, fingerprint) or render_notebook_html(notebook_path)
+    
+    # Only one thread per worker, and one worker per host, renders a given notebook
+    return coalesce_render(
+        ('notebook', notebook_path, key),
+        lambda: render_cache.get_or_create(key, create)
+    )
+
+def lookup_prerendered(notebook_path, fingerprint=None):
+    """Return the addressed ``(html, resources)`` of a notebook from the prerendered bundle, or None."""
+    if prerendered_bundle is None:
+        return None
+    notebook_id = os.path.splitext(os.path.basename(notebook_path))[0]
+    prerendered = prerendered_bundle.lookup(
+        notebook_id, get_notebook_digest(notebook_path), fingerprint or get_render_fingerprint()
+    )
+    if prerendered is None:
+        return None
+    return address_outputs(*prerendered, base_dir=os.path.dirname(notebook_path))
+
+def has_rendered_notebook(notebook_path):
+    """Whether the notebook is in the render cache or the bundle, so it can be served without converting.
+    
+    A bundle hit is moved into the render cache on the way.
+    """
+    if render_cache is None:
+        return False
+    key = render_cache.make_key(notebook_path, get_cache_fingerprint())
+    if render_cache.get(key) is not None:
+        return True
+    prerendered = lookup_prerendered(notebook_path)
+    if prerendered is None:
+        return False
+    render_cache.set(key, *prerendered)
+    return True
+
+def address_outputs(html_content, resources, base_dir=None):
+    """Give output files content-derived names and rewrite the HTML to match.
+    
+    Images are handled by the image pipeline, which also picks up inline
+    images and local files referenced relative to base_dir.
+    """
+    outputs = resources.get('outputs') or {}
+    if output_store is None:
+        return html_content, resources
     
-    # Configure the HTML exporter
-    html_exporter = HTMLExporter()
-    html_exporter.template_name = 'classic'
+    if outputs:
+        html_content, outputs = output_store.content_address(
+            html_content, outputs, lambda name: f'{OUTPUTS_URL}{name}'
+        )
+    if image_pipeline is not None:
+        with timed('images'):
+            html_content, outputs = image_pipeline.process(html_content, outputs, base_dir)
+    return html_content, {'outputs': outputs}
+
+def load_notebook(notebook_path, engine=None):
+    """Read a notebook, optionally execute it, and drop the title cell shown in the page header."""
+    import nbformat
+    
+    with timed('read'):
+        with open(notebook_path, 'rb') as f:
+            source = f.read()
+        notebook = nbformat.reads(source.decode('utf-8'), as_version=4)
+    
+    # Fill in outputs on a warm kernel; unchanged sources come from the execution cache
+    if engine is not None:
+        with timed('execute'):
+            notebook = engine.execute(
+                notebook,
+                hashlib.sha256(source).hexdigest(),
+                cwd=os.path.dirname(os.path.abspath(notebook_path))
+            )
     
     # Remove the first cell if it's the same as the title
+    first_index = 0
     if notebook.cells and notebook.cells[0].cell_type == 'markdown':
         first_cell_text = notebook.cells[0].source.strip()
         if first_cell_text.startswith('# '):
             notebook.cells.pop(0)
+            first_index = 1
     
-    # Convert notebook to HTML
-    html_content, resources = html_exporter.from_notebook_node(notebook)
+    # Cells keep their index in the file, so page anchors match search results
+    mark_cells(notebook, first_index)
+    return notebook
+
+def export_notebook(notebook_path, html_exporter, engine=None):
+    """Read a notebook, optionally execute it, and convert it to HTML.
     
-    # Save resources (images, etc.) if needed
-    if resources.get('outputs'):
-        static_dir = os.path.join(current_app.static_folder, 'notebooks')
-        os.makedirs(static_dir, exist_ok=True)
-        
-        for filename, data in resources['outputs'].items():
-            with open(os.path.join(static_dir, filename), 'wb') as f:
-                f.write(data)
+    This does not touch the Flask app, so the build tool can share it.
+    """
+    notebook = load_notebook(notebook_path, engine)
+    with timed('convert'):
+        html_content, resources = html_exporter.from_notebook_node(notebook)
     
+    # The manifest goes after the last cell, inside the document body
+    end = html_content.rfind('</body>')
+    if end < 0:
+        end = len(html_content)
+    html_content = html_content[:end] + cell_manifest_html(notebook) + html_content[end:]
     return html_content, resources
 
-def add_interactive_elements(html_content):
-    """Enhance HTML with PyScript for interactive execution."""
-    # Add data-executable attribute to code cells
-    html_content = html_content.replace('<div class="input_area">', 
-                                         '<div class="input_area" data-executable="true">')
+def split_sections(html_content):
+    """Split an exported notebook at its section markers.
     
-    # Add run button to each code cell
-    html_content = html_content.replace('<div class="input_area" data-executable="true">',
-                                         '<div class="input_area" data-executable="true">'
-                                         '<button class="run-code-btn">Run</button>')
+    Returns ``(head, sections, tail)``: the document up to the first cell,
+    the HTML of each section, and the cell manifest with the rest of the
+    document. Joined back together they give html_content again.
+    """
+    start = html_content.index(FRAME_CONTAINER) + len(FRAME_CONTAINER)
+    end = html_content.rfind(f'<script type="application/json" id="{MANIFEST_ID}">')
+    if end < start:
+        end = len(html_content)
     
-    return html_content
\ No newline at end of file
+    body = html_content[start:end]
+    cuts = [0] + [match.start() for match in SECTION_START_RE.finditer(body)] + [len(body)]
+    sections = [body[a:b] for a, b in zip(cuts, cuts[1:])]
+    return html_content[:start], sections, html_content[end:]
+
+def get_notebook_frame():
+    """Return the (head, tail) of an exported document with no cells.
+    
+    Streamed pages wrap their cell fragments in this frame, which carries the
+    exporter's stylesheet, so it only needs to be produced once.
+    """
+    global notebook_frame
+    if notebook_frame is None:
+        import nbformat
+        with get_exporter_pool().exporter() as html_exporter:
+            document, _ = html_exporter.from_notebook_node(nbformat.v4.new_notebook())
+        split_at = document.index(FRAME_CONTAINER) + len(FRAME_CONTAINER)
+        notebook_frame = (document[:split_at], document[split_at:])
+    return notebook_frame
+
+def iter_notebook_html(notebook_path):
+    """Yield the notebook HTML piece by piece: frame head, one fragment per cell, cell manifest, frame tail.
+    
+    Once the last piece is out, the whole document goes into the render cache,
+    so the next request for the notebook is served without converting.
+    """
+    key = render_cache.make_key(notebook_path, get_cache_fingerprint()) if render_cache is not None else None
+    notebook = load_notebook(notebook_path, execution_engine)
+    head, tail = get_notebook_frame()
+    parts = [head]
+    outputs = {}
+    yield head
+    base_dir = os.path.dirname(notebook_path)
+    for cell in notebook.cells:
+        fragment, resources = render_cell_html(cell, notebook, base_dir)
+        outputs.update(resources['outputs'])
+        parts.append(fragment)
+        yield fragment
+    manifest = cell_manifest_html(notebook)
+    parts += [manifest, tail]
+    yield manifest
+    yield tail
+    if key is not None:
+        render_cache.set(key, ''.join(parts), {'outputs': outputs})
+
+def render_cell_html(cell, notebook, base_dir=None):
+    """Convert a single cell of notebook to ``(html, resources)``, caching the fragment by cell content."""
+    # The lexer used for highlighting comes from the notebook's language_info
+    key_source = json.dumps(
+        [cell, notebook.metadata.get('language_info', {}), get_cache_fingerprint(), base_dir],
+        sort_keys=True
+    )
+    key = hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+    
+    def create():
+        import nbformat
+        single = nbformat.v4.new_notebook(
+            cells=[cell],
+            metadata=notebook.metadata,
+            nbformat_minor=notebook.nbformat_minor
+        )
+        with render_slot(), get_cell_exporter_pool().exporter() as cell_exporter, timed('convert'):
+            html_content, resources = cell_exporter.from_notebook_node(single)
+        RENDERS.inc(kind='cell')
+        return fragment_cache.set(key, *address_outputs(html_content, resources, base_dir))
+    
+    # Concurrent streams of the same cold notebook convert each cell once
+    cached = fragment_cache.get(key)
+    if cached is None:
+        cached = coalesce_render(('cell', key), create)
+    
+    html_content, resources = cached
+    if output_store is not None:
+        with timed('write_outputs'):
+            output_store.publish(resources['outputs'])
+    return html_content, resources
+
+def get_exporter_pool():
+    """Return the pool of page exporters, creating it (and importing nbconvert) on first use."""
+    global exporter_pool
+    with exporter_lock:
+        if exporter_pool is None:
+            exporter_pool = ExporterPool(build_html_exporter, size=exporter_pool_size)
+    return exporter_pool
+
+def get_cell_exporter_pool():
+    """Return the pool of cell exporters, creating it on first use."""
+    global cell_exporter_pool
+    with exporter_lock:
+        if cell_exporter_pool is None:
+            cell_exporter_pool = ExporterPool(build_cell_exporter, size=exporter_pool_size)
+    return cell_exporter_pool
+
+def warm_up_notebook_service(app):
+    """Import nbconvert and build the exporters ahead of the first render."""
+    get_exporter_pool()
+    if app.config.get('STREAM_NOTEBOOK_MIN_SIZE') is not None:
+        get_cell_exporter_pool()
+
+def render_notebook_html(notebook_path):
+    """Convert notebook to HTML, bypassing the cache."""
+    # Convert notebook to HTML, once the render queue admits it
+    with render_slot(), get_exporter_pool().exporter() as html_exporter:
+        html_content, resources = export_notebook(notebook_path, html_exporter, execution_engine)
+    RENDERS.inc(kind='notebook')
+    
+    # Resources are written by get_notebook_html, and only when missing
+    return address_outputs(html_content, resources, os.path.dirname(notebook_path))
+
+def collect_metrics():
+    """Report cache and coalescing counters to the metrics endpoint."""
+    if render_cache is not None:
+        stats = render_cache.stats()
+        for result in ('hits', 'shared_hits', 'misses'):
+            yield ('python_notes_render_cache_lookups_total', 'counter',
+                   'Rendered notebook cache lookups by result.', {'result': result}, stats[result])
+        yield ('python_notes_render_cache_entries', 'gauge',
+               'Rendered notebooks held in memory.', {}, stats['entries'])
+        yield ('python_notes_render_lock_waits_total', 'counter',
+               'Renders this worker waited on another worker for.', {}, stats['lock_waits'])
+    if fragment_cache is not None:
+        stats = fragment_cache.stats()
+        for result in ('hits', 'misses'):
+            yield ('python_notes_fragment_cache_lookups_total', 'counter',
+                   'Rendered cell fragment cache lookups by result.', {'result': result}, stats[result])
+    if image_pipeline is not None:
+        for result, count in (('encoded', image_pipeline.encoded), ('reused', image_pipeline.reused)):
+            yield ('python_notes_image_variants_total', 'counter',
+                   'Image variants encoded, or reused from the output store.', {'result': result}, count)
+    stats = render_flights.stats()
+    yield ('python_notes_coalesced_renders_total', 'counter',
+           'Renders saved by waiting for an identical render in progress.', {}, stats['coalesced'])
+    yield ('python_notes_renders_in_flight', 'gauge',
+           'Renders currently in progress.', {}, stats['in_flight'])
+
+register_collector(collect_metrics)
@@ -0,0 +1,162 @@
+# app/services/notebook_watcher.py
+import os
+import threading
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # watchdog is optional; the directory is polled instead
+    Observer = None
+    FileSystemEventHandler = object
+
+from app.services.admission import RenderRejected
+from app.services.notebook_catalog import get_notebook_catalog
+from app.services.search_index import get_search_index
+
+# Global watcher object
+notebook_watcher = None
+
+def init_notebook_watcher(app, prerender):
+    """Start watching the notebooks directory if enabled in the config.
+
+    prerender(notebook_id) is called inside a request context for every added
+    or modified notebook.
+    """
+    global notebook_watcher
+
+    if not app.config.get('WATCH_NOTEBOOKS'):
+        return None
+
+    notebook_watcher = NotebookWatcher(
+        app,
+        prerender,
+        poll_interval=app.config.get('WATCH_POLL_INTERVAL', 2.0),
+        debounce=app.config.get('WATCH_DEBOUNCE', 0.5)
+    )
+    notebook_watcher.start()
+    return notebook_watcher
+
+def get_notebook_watcher():
+    """Return the application's notebook watcher, or None if it is not running."""
+    return notebook_watcher
+
+class _NotebookEventHandler(FileSystemEventHandler):
+    """Wakes the watcher whenever a notebook file is touched."""
+
+    def __init__(self, wake):
+        self.wake = wake
+
+    def on_any_event(self, event):
+        paths = [event.src_path, getattr(event, 'dest_path', '')]
+        if any(str(path).endswith('.ipynb') for path in paths):
+            self.wake.set()
+
+class NotebookWatcher:
+    """Re-renders changed notebooks on a background thread.
+
+    File events come from inotify (or the platform equivalent) through
+    watchdog when it is installed; otherwise the directory is polled. Either
+    way a change only wakes the thread, which refreshes the catalog and diffs
+    it against its own snapshot, so changes are picked up even when a request
+    refreshed the catalog first. Rendered pages land in the caches under new
+    content keys, so visitors switch from the old page to the new one in a
+    single step and never wait for a conversion.
+    """
+
+    def __init__(self, app, prerender, poll_interval=2.0, debounce=0.5):
+        self.app = app
+        self.prerender = prerender
+        self.notebooks_dir = app.config['NOTEBOOKS_DIR']
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.rendered = 0
+        self.errors = 0
+        self._known = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._observer = None
+
+    @property
+    def mode(self):
+        return 'events' if self._observer is not None else 'polling'
+
+    def start(self):
+        """Render the current notebooks and start watching for changes."""
+        if Observer is not None and os.path.isdir(self.notebooks_dir):
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_NotebookEventHandler(self._wake), self.notebooks_dir)
+                self._observer.daemon = True
+                self._observer.start()
+            except OSError as e:
+                # e.g. the inotify watch limit is reached
+                self.app.logger.warning(f'Notebook events unavailable, polling instead: {e}')
+                self._observer = None
+
+        self._thread = threading.Thread(target=self._run, name='notebook-watcher', daemon=True)
+        self._thread.start()
+        self.app.logger.info(f'Watching {self.notebooks_dir} for notebook changes ({self.mode})')
+
+    def stop(self):
+        """Stop watching; a render in progress is allowed to finish."""
+        self._stop.set()
+        self._wake.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        if self._thread is not None:
+            self._thread.join()
+
+    def scan(self):
+        """Update the catalog and search index and pre-render what changed. Returns the changed ids."""
+        with self.app.app_context():
+            catalog = get_notebook_catalog()
+            entries = catalog.list_notebooks(self.notebooks_dir)
+            current = catalog.versions()
+            search_index = get_search_index()
+            if search_index is not None:
+                search_index.update(entries)
+
+        changed = [notebook_id for notebook_id, version in current.items()
+                   if self._known.get(notebook_id) != version]
+        removed = [notebook_id for notebook_id in self._known if notebook_id not in current]
+
+        # A version is recorded once it has been tried, so a notebook that fails to render
+        # is tried again only when it changes; a skipped render (a busy render queue, a
+        # stop) is not recorded and is retried on the next scan
+        known = {notebook_id: version for notebook_id, version in self._known.items()
+                 if notebook_id in current}
+        for notebook_id in changed:
+            if self._stop.is_set():
+                break
+            try:
+                with self.app.test_request_context(f'/notes/{notebook_id}'):
+                    self.prerender(notebook_id)
+                self.rendered += 1
+            except RenderRejected as e:
+                self.app.logger.info(f'Pre-rendering notebook {notebook_id} postponed: {e}')
+                continue
+            except Exception:
+                # Leave it to the next visitor; a broken notebook must not stop the watcher
+                self.errors += 1
+                self.app.logger.exception(f'Pre-rendering notebook {notebook_id} failed')
+            known[notebook_id] = current[notebook_id]
+
+        for notebook_id in removed:
+            self.app.logger.info(f'Notebook {notebook_id} was removed')
+
+        self._known = known
+        return changed + removed
+
+    def _run(self):
+        # With file events the timeout is only a safety net for missed events
+        interval = self.poll_interval if self._observer is None else self.poll_interval * 30
+        while not self._stop.is_set():
+            self.scan()
+            self._wake.wait(interval)
+            if self._stop.is_set():
+                break
+            # Editors write files in several steps; let them finish first
+            self._stop.wait(self.debounce)
+            self._wake.clear()
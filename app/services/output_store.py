@@ -0,0 +1,57 @@
+# app/services/output_store.py
+import os
+import hashlib
+import tempfile
+
+class OutputStore:
+    """Content-addressed directory for files extracted from notebook outputs.
+
+    Every file is named after the digest of its bytes, so a name always maps
+    to the same content: files are written once, never rewritten, can be
+    cached by browsers forever, and concurrent workers writing the same file
+    cannot produce a different result.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.writes = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def content_name(filename, data):
+        """Name a file after the SHA-256 of its bytes, keeping the extension."""
+        ext = os.path.splitext(filename)[1]
+        return f'{hashlib.sha256(data).hexdigest()[:32]}{ext}'
+
+    @classmethod
+    def content_address(cls, html_content, outputs, url_for_name):
+        """Rename outputs to content names and point the HTML at their URLs.
+
+        Returns the rewritten HTML and the outputs keyed by their new names.
+        """
+        addressed = {}
+        for filename, data in outputs.items():
+            name = cls.content_name(filename, data)
+            addressed[name] = data
+            url = url_for_name(name)
+            html_content = html_content.replace(f'"{filename}"', f'"{url}"')
+            html_content = html_content.replace(f"'{filename}'", f"'{url}'")
+        return html_content, addressed
+
+    def publish(self, outputs):
+        """Write any content-named outputs that are not on disk yet."""
+        for name, data in outputs.items():
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                continue
+            # Write to a temp file and rename so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self.writes += 1
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
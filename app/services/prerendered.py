@@ -0,0 +1,61 @@
+# app/services/prerendered.py
+import os
+import json
+import threading
+
+MANIFEST_NAME = 'manifest.json'
+RESOURCES_DIR = 'resources'
+
+class PrerenderedBundle:
+    """Read-only view of a bundle written by ``tools/convert_notebook.py --build``.
+
+    The manifest is re-read whenever it changes on disk, so deploying a new
+    build does not require restarting the app. A page is only served from the
+    bundle when both the source hash and the exporter fingerprint match.
+    """
+
+    def __init__(self, bundle_dir):
+        self.bundle_dir = bundle_dir
+        self._manifest = {}
+        self._manifest_mtime = None
+        self._lock = threading.Lock()
+
+    def manifest(self):
+        """Return the current manifest, reloading it if the file changed."""
+        manifest_path = os.path.join(self.bundle_dir, MANIFEST_NAME)
+        try:
+            mtime = os.stat(manifest_path).st_mtime_ns
+        except OSError:
+            return {}
+
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                try:
+                    with open(manifest_path, 'r', encoding='utf-8') as f:
+                        self._manifest = json.load(f)
+                except (OSError, ValueError):
+                    self._manifest = {}
+                self._manifest_mtime = mtime
+            return self._manifest
+
+    def lookup(self, notebook_id, source_digest, fingerprint):
+        """Return ``(html, resources)`` for an up-to-date notebook, or None."""
+        manifest = self.manifest()
+        if manifest.get('fingerprint') != fingerprint:
+            return None
+
+        entry = manifest.get('notebooks', {}).get(notebook_id)
+        if not entry or entry.get('source_sha256') != source_digest:
+            return None
+
+        try:
+            with open(os.path.join(self.bundle_dir, entry['html']), 'r', encoding='utf-8') as f:
+                html_content = f.read()
+            outputs = {}
+            for filename in entry.get('resources', []):
+                with open(os.path.join(self.bundle_dir, RESOURCES_DIR, filename), 'rb') as f:
+                    outputs[filename] = f.read()
+        except OSError:
+            return None
+
+        return html_content, {'outputs': outputs}
@@ -0,0 +1,175 @@
+# app/services/render_cache.py
+import os
+import json
+import time
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+from app.services.cache_backends import FileBackend
+
+
+class RenderCache:
+    """Content-addressed cache for rendered notebook HTML.
+
+    Entries are keyed by the SHA-256 of the notebook source plus a
+    fingerprint of the exporter settings, so a changed notebook or a changed
+    exporter configuration can never be served a stale render. Lookups go
+    through an in-process LRU first and an optional shared backend second
+    (see cache_backends); the shared tier is visible to every worker and
+    survives restarts. cache_dir is shorthand for a FileBackend.
+    """
+
+    def __init__(self, max_entries=32, cache_dir=None, backend=None, lock_timeout=60, lock_ttl=300):
+        self.max_entries = max_entries
+        self.backend = backend
+        if self.backend is None and cache_dir:
+            self.backend = FileBackend(cache_dir)
+        # How long to wait for another worker's render, and when its lock counts as abandoned
+        self.lock_timeout = lock_timeout
+        self.lock_ttl = lock_ttl
+        self._entries = OrderedDict()
+        # path -> (mtime_ns, size, digest), so unchanged files are not re-hashed
+        self._digests = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.lock_waits = 0
+
+    def source_digest(self, notebook_path):
+        """Return the SHA-256 of a notebook, re-hashing only when it changed on disk."""
+        st = os.stat(notebook_path)
+        with self._lock:
+            known = self._digests.get(notebook_path)
+        if known and known[0] == st.st_mtime_ns and known[1] == st.st_size:
+            return known[2]
+
+        with open(notebook_path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+
+        with self._lock:
+            self._digests[notebook_path] = (st.st_mtime_ns, st.st_size, digest)
+        return digest
+
+    def make_key(self, notebook_path, fingerprint):
+        """Build the cache key for a notebook rendered with the given exporter fingerprint."""
+        digest = self.source_digest(notebook_path)
+        return hashlib.sha256(f'{digest}:{fingerprint}'.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return the cached ``(html, resources)`` pair for key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+
+        entry = self._read_shared(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+            self._remember(key, entry)
+        return entry
+
+    def set(self, key, html_content, resources):
+        """Store a rendered notebook in both cache tiers."""
+        entry = (html_content, {'outputs': dict(resources.get('outputs') or {})})
+        with self._lock:
+            self._remember(key, entry)
+        if self.backend is not None:
+            self.backend.set(key, self._encode(entry))
+        return entry
+
+    def get_or_create(self, key, create, poll_interval=0.05):
+        """Return the entry for key, calling create() for ``(html, resources)`` on a miss.
+
+        With a shared backend only one worker runs create() for a key; the
+        others wait for its result instead of rendering the same notebook
+        again. A worker that waits longer than lock_timeout renders itself.
+        """
+        entry = self.get(key)
+        if entry is not None:
+            return entry
+        if self.backend is None:
+            return self.set(key, *create())
+
+        token = self.backend.acquire_lock(key, self.lock_ttl)
+        if token is None:
+            with self._lock:
+                self.lock_waits += 1
+            deadline = time.monotonic() + self.lock_timeout
+            while token is None and time.monotonic() < deadline:
+                time.sleep(poll_interval)
+                entry = self._read_shared(key)
+                if entry is not None:
+                    with self._lock:
+                        self.shared_hits += 1
+                        self._remember(key, entry)
+                    return entry
+                # The holder may have failed or died; take over its lock
+                token = self.backend.acquire_lock(key, self.lock_ttl)
+
+        try:
+            # The previous holder may have stored the entry just before we got the lock
+            entry = self._read_shared(key) if token is not None else None
+            if entry is None:
+                entry = self.set(key, *create())
+            return entry
+        finally:
+            if token is not None:
+                self.backend.release_lock(key, token)
+
+    def clear(self):
+        """Drop every in-memory entry (shared entries are left for other workers)."""
+        with self._lock:
+            self._entries.clear()
+            self._digests.clear()
+
+    def stats(self):
+        """Return hit/miss counters for the cache."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'lock_waits': self.lock_waits,
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+            }
+
+    def _remember(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _read_shared(self, key):
+        if self.backend is None:
+            return None
+        data = self.backend.get(key)
+        if data is None:
+            return None
+        try:
+            return self._decode(data)
+        except (ValueError, KeyError):
+            return None
+
+    @staticmethod
+    def _encode(entry):
+        html_content, resources = entry
+        data = {
+            'html': html_content,
+            'outputs': {name: base64.b64encode(blob).decode('ascii')
+                        for name, blob in resources['outputs'].items()},
+        }
+        return json.dumps(data).encode('utf-8')
+
+    @staticmethod
+    def _decode(data):
+        data = json.loads(data)
+        outputs = {name: base64.b64decode(blob) for name, blob in data.get('outputs', {}).items()}
+        return data['html'], {'outputs': outputs}
@@ -0,0 +1,358 @@
+# app/services/sandbox.py
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from collections import OrderedDict
+from app.services.metrics import register_collector
+
+# Global pool of sandbox processes, started on first use or by the warmup
+sandbox_pool = None
+sandbox_lock = threading.Lock()
+sandbox_settings = None
+
+WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sandbox_worker.py')
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+SCRATCH_ROOT = os.path.join(tempfile.gettempdir(), 'python-notes-sandbox')
+
+class SandboxBusy(RuntimeError):
+    """Raised when no sandbox process became free in time."""
+
+class SandboxProcess:
+    """One sandbox process (app/services/sandbox_worker.py), its pipe and its working directory.
+
+    The process is a fresh interpreter, started with only PATH, HOME and the
+    locale in its environment, in a working directory of its own under
+    SCRATCH_ROOT; with user set, it runs under that account.
+    """
+
+    def __init__(self, settings, user=None):
+        os.makedirs(SCRATCH_ROOT, mode=0o711, exist_ok=True)
+        self.scratch = tempfile.mkdtemp(dir=SCRATCH_ROOT)
+        options = {}
+        if user:
+            import pwd
+            account = pwd.getpwnam(user)
+            os.chown(self.scratch, account.pw_uid, account.pw_gid)
+            options = {'user': account.pw_uid, 'group': account.pw_gid, 'extra_groups': []}
+        env = {
+            'PATH': os.environ.get('PATH', '/usr/bin:/bin'),
+            'HOME': self.scratch,
+            'TMPDIR': self.scratch,
+            'MPLCONFIGDIR': self.scratch,
+            'LANG': 'C.UTF-8',
+        }
+
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = None
+        try:
+            self.process = subprocess.Popen(
+                [sys.executable, '-I', '-B', WORKER_PATH, str(child_conn.fileno()), json.dumps(settings)],
+                pass_fds=[child_conn.fileno()], cwd=self.scratch, env=env, stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True, **options,
+            )
+        except OSError as e:
+            self.stop()
+            raise SandboxBusy(f'Could not start a sandbox process: {e}') from e
+        finally:
+            child_conn.close()
+        self.lock = threading.Lock()
+        self.users = 0
+        self.used = time.monotonic()
+
+        # A process that dies while setting up closes the pipe, or says something other than hello
+        try:
+            hello = json.loads(self.conn.recv_bytes(4096)) if self.conn.poll(30) else None
+        except Exception:
+            hello = None
+        if not isinstance(hello, dict) or not hello.get('ready'):
+            self.stop()
+            raise SandboxBusy('A sandbox process failed to start')
+        self.network_isolated = hello.get('network_isolated', False)
+
+    def stop(self):
+        self.conn.close()
+        if self.process is None:
+            shutil.rmtree(self.scratch, ignore_errors=True)
+            return
+        if self.process.poll() is None:
+            self.process.kill()
+        try:
+            self.process.wait(5)
+        except subprocess.TimeoutExpired:
+            pass
+        shutil.rmtree(self.scratch, ignore_errors=True)
+
+class SandboxPool:
+    """Sandbox processes that run student code for /api/run, one per session.
+
+    Each session gets a process of its own, so sessions share no memory, and
+    its namespace lives as long as the process. size processes are started
+    ahead of time and topped up in the background, so a new session costs a
+    message round trip rather than an interpreter start; at most size cells
+    run at once. Each cell runs under a CPU time limit, a memory cap and a
+    wall-clock timeout, with no network, no child processes, and files
+    written only in its working directory (see sandbox_worker.py). Sessions
+    idle for idle_seconds are stopped, and beyond max_sessions the least
+    recently used idle one is. A process that overruns the timeout or dies is
+    stopped, and its session starts over with an empty namespace.
+    """
+
+    def __init__(self, size=2, cpu_seconds=5, memory_mb=256, file_mb=0, timeout=10,
+                 idle_seconds=600, max_sessions=16, max_output=65536, user=None, denied_paths=()):
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max(1, max_sessions)
+        self.user = user
+        self.settings = {
+            'cpu_seconds': cpu_seconds,
+            'memory_mb': memory_mb,
+            'file_mb': file_mb,
+            'max_output': max_output,
+            'denied_paths': sorted({PROJECT_ROOT, SCRATCH_ROOT, *denied_paths}),
+        }
+        # Output, error and result are each cut to max_output characters, which JSON may escape to six bytes
+        self.max_reply = 6 * 5 * max_output + 4096
+        self._lock = threading.Lock()
+        self._running = threading.BoundedSemaphore(self.size)
+        self._sessions = OrderedDict()
+        self._filling = False
+        self._closed = False
+        self.runs = 0
+        self.restarts = 0
+        self.rejected = 0
+        self.pid = os.getpid()
+        self._spares = []
+        for _ in range(self.size):
+            try:
+                self._spares.append(SandboxProcess(self.settings, user))
+            except SandboxBusy:
+                # Sessions start their own processes, and fail with SandboxBusy while that does not work either
+                break
+
+    def _refill(self):
+        """Start processes until size spares are ready (on a background thread)."""
+        try:
+            while True:
+                with self._lock:
+                    if self._closed or len(self._spares) >= self.size:
+                        return
+                try:
+                    process = SandboxProcess(self.settings, self.user)
+                except SandboxBusy:
+                    # Tried again when the next session takes a spare
+                    return
+                with self._lock:
+                    if not self._closed:
+                        self._spares.append(process)
+                        continue
+                process.stop()
+                return
+        finally:
+            with self._lock:
+                self._filling = False
+
+    def _start_refill(self):
+        with self._lock:
+            if self._filling or self._closed:
+                return
+            self._filling = True
+        threading.Thread(target=self._refill, name='sandbox-refill', daemon=True).start()
+
+    def _checkout(self, session):
+        """Return (process, new_session) for a session, marked in use; raises SandboxBusy."""
+        now = time.monotonic()
+        stale = []
+        with self._lock:
+            for name, process in list(self._sessions.items()):
+                if not process.users and now - process.used > self.idle_seconds:
+                    stale.append(self._sessions.pop(name))
+            process = self._sessions.get(session)
+            if process is None:
+                idle = [name for name, process in self._sessions.items() if not process.users]
+                while len(self._sessions) >= self.max_sessions and idle:
+                    stale.append(self._sessions.pop(idle.pop(0)))
+                full = len(self._sessions) >= self.max_sessions
+                spare = self._spares.pop() if self._spares and not full else None
+            else:
+                self._sessions.move_to_end(session)
+                process.users += 1
+                process.used = now
+        for old in stale:
+            old.stop()
+        if process is not None:
+            return process, False
+        if full:
+            raise SandboxBusy('Too many sandbox sessions')
+
+        self._start_refill()
+        process = spare or SandboxProcess(self.settings, self.user)
+        with self._lock:
+            # Two first runs of one session: the second uses the process of the first
+            existing = self._sessions.get(session)
+            if existing is None:
+                self._sessions[session] = process
+            else:
+                process, spare = existing, process
+            process.users += 1
+            process.used = now
+        if existing is not None:
+            spare.stop()
+        return process, existing is None
+
+    def _discard(self, session, process):
+        """Stop a stuck or dead process and forget its session."""
+        with self._lock:
+            if self._sessions.get(session) is process:
+                del self._sessions[session]
+                self.restarts += 1
+        process.stop()
+
+    def _send(self, session, process, code, new_session):
+        """Run code in the session's process and return its reply, replacing a stuck or dead process."""
+        # Runs of one session (several tabs) take turns
+        if not process.lock.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            raise SandboxBusy('The session is busy')
+        try:
+            with self._lock:
+                self.runs += 1
+            try:
+                process.conn.send_bytes(json.dumps({'code': code}).encode('utf-8'))
+                if process.conn.poll(self.timeout):
+                    reply = json.loads(process.conn.recv_bytes(self.max_reply))
+                    reply['new_session'] = new_session
+                    return reply
+                message, name = f'Execution took longer than {self.timeout}s', 'TimeoutError'
+            except (EOFError, OSError):
+                message, name = 'The Python process stopped, probably out of memory', 'SandboxError'
+            except Exception:
+                # A cell that broke its own process (builtins replaced, the pipe written to) loses the process
+                message, name = 'The Python process sent a reply that could not be read', 'SandboxError'
+            self._discard(session, process)
+            return {
+                'stdout': '', 'stderr': '', 'result': None, 'truncated': False,
+                'error': {'name': name, 'message': message + '; the session was reset', 'traceback': ''},
+                'new_session': True, 'elapsed': None,
+            }
+        finally:
+            process.lock.release()
+
+    def run(self, session, code):
+        """Run code in the session's namespace. Returns the reply dict; raises SandboxBusy."""
+        if not self._running.acquire(timeout=self.timeout):
+            with self._lock:
+                self.rejected += 1
+            raise SandboxBusy('All sandbox processes are busy')
+        try:
+            process, new_session = self._checkout(session)
+            try:
+                return self._send(session, process, code, new_session)
+            finally:
+                with self._lock:
+                    process.users -= 1
+        finally:
+            self._running.release()
+
+    def has_session(self, session):
+        """Whether a session has a process (and a namespace) in the pool."""
+        with self._lock:
+            return session in self._sessions
+
+    def reset(self, session):
+        """Forget a session's namespace by stopping its process."""
+        with self._lock:
+            process = self._sessions.pop(session, None)
+        if process is not None:
+            process.stop()
+
+    def stats(self):
+        """Return process, session and restart counters."""
+        with self._lock:
+            processes = list(self._sessions.values()) + self._spares
+            return {
+                'processes': len(processes),
+                'busy': sum(1 for process in self._sessions.values() if process.users),
+                'sessions': len(self._sessions),
+                'runs': self.runs,
+                'restarts': self.restarts,
+                'rejected': self.rejected,
+                'network_isolated': all(process.network_isolated for process in processes),
+            }
+
+    def shutdown(self):
+        """Stop every sandbox process."""
+        with self._lock:
+            self._closed = True
+            processes = list(self._sessions.values()) + self._spares
+            self._sessions.clear()
+            self._spares = []
+        for process in processes:
+            process.stop()
+
+def sandbox_denied_paths(app):
+    """Directories of the app that cells must not read: its source, data and caches."""
+    paths = [app.root_path, app.instance_path]
+    for key in ('NOTEBOOKS_DIR', 'RENDER_CACHE_DIR', 'NOTEBOOK_OUTPUTS_DIR', 'PRERENDERED_DIR',
+                'EXECUTION_CACHE_DIR', 'PAGE_FILES_DIR'):
+        if app.config.get(key):
+            paths.append(app.config[key])
+    for key in ('CATALOG_PATH', 'SEARCH_INDEX_PATH'):
+        if app.config.get(key):
+            paths.append(os.path.dirname(app.config[key]))
+    return [os.path.realpath(path) for path in paths]
+
+def init_sandbox(app):
+    """Read the sandbox settings; the processes start on first use or during the warmup."""
+    global sandbox_pool, sandbox_settings
+    sandbox_pool = None
+    if not app.config.get('SANDBOX_ENABLED'):
+        sandbox_settings = None
+        return
+    sandbox_settings = {
+        'size': app.config.get('SANDBOX_PROCESSES', 2),
+        'cpu_seconds': app.config.get('SANDBOX_CPU_SECONDS', 5),
+        'memory_mb': app.config.get('SANDBOX_MEMORY_MB', 256),
+        'timeout': app.config.get('SANDBOX_TIMEOUT', 10),
+        'idle_seconds': app.config.get('SANDBOX_SESSION_IDLE', 600),
+        'max_sessions': app.config.get('SANDBOX_MAX_SESSIONS', 16),
+        'max_output': app.config.get('SANDBOX_MAX_OUTPUT', 65536),
+        'file_mb': app.config.get('SANDBOX_FILE_MB', 0),
+        'user': app.config.get('SANDBOX_USER') or None,
+        'denied_paths': sandbox_denied_paths(app),
+    }
+
+def get_sandbox_pool():
+    """Return the sandbox pool, starting it on first use, or None when the sandbox is disabled."""
+    global sandbox_pool
+    if sandbox_settings is None:
+        return None
+    with sandbox_lock:
+        # A pool inherited through fork (gunicorn --preload) belongs to the parent; its pipes cannot be shared
+        if sandbox_pool is None or sandbox_pool.pid != os.getpid():
+            sandbox_pool = SandboxPool(**sandbox_settings)
+            atexit.register(sandbox_pool.shutdown)
+    return sandbox_pool
+
+def collect_metrics():
+    """Report the sandbox pool to the metrics endpoint."""
+    if sandbox_pool is None:
+        return
+    stats = sandbox_pool.stats()
+    yield ('python_notes_sandbox_busy', 'gauge', 'Sandbox processes running a cell.', {}, stats['busy'])
+    yield ('python_notes_sandbox_sessions', 'gauge', 'Sessions with a namespace in the sandbox.', {}, stats['sessions'])
+    yield ('python_notes_sandbox_runs_total', 'counter', 'Cells run in the sandbox.', {}, stats['runs'])
+    yield ('python_notes_sandbox_restarts_total', 'counter',
+           'Sandbox processes replaced after a timeout or crash.', {}, stats['restarts'])
+    yield ('python_notes_sandbox_rejections_total', 'counter',
+           'Runs turned away because every sandbox process was busy.', {}, stats['rejected'])
+
+register_collector(collect_metrics)
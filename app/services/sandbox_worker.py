@@ -0,0 +1,268 @@
+# app/services/sandbox_worker.py
+"""
+Sandbox process for /api/run, holding the namespace of a single session.
+
+Started by app.services.sandbox as a script in a fresh, isolated interpreter
+(python -I -B) with a minimal environment, so it holds none of the app's
+modules, settings or secrets, nor anything of another session. Messages on
+the pipe are JSON, never pickles, so a cell cannot make the app run code.
+Only the standard library is imported here.
+"""
+
+import io
+import os
+import ast
+import sys
+import json
+import time
+import signal
+import builtins
+import linecache
+import traceback
+from multiprocessing.connection import Connection
+
+CELL_FILENAME = '<cell>'
+CLONE_NEWNET = 0x40000000
+
+# Audit events refused outright: the network (including _socket), new processes,
+# signals to other processes, links that could point out of the working directory,
+# walking the heap, raising resource limits, and ctypes, which could undo all of this
+BLOCKED_EVENTS = (
+    'socket.', 'subprocess.', 'os.system', 'os.exec', 'os.posix_spawn', 'os.spawn',
+    'os.fork', 'os.forkpty', 'os.kill', 'os.killpg', 'pty.spawn', 'ctypes.',
+    'os.symlink', 'os.link', 'gc.get_objects', 'gc.get_referrers', 'gc.get_referents',
+    'sys._current_frames', 'resource.prlimit',
+)
+# Modules that start processes, create files in /dev/shm (shared memory, named semaphores)
+# or reach into memory without an audit event of their own
+BLOCKED_IMPORTS = (
+    '_posixsubprocess', '_posixshmem', '_multiprocessing', '_testcapi', '_testinternalcapi',
+    '_xxsubinterpreters', '_ctypes',
+)
+
+# Events that change the file system, with the number of path arguments they take
+WRITE_EVENTS = {
+    'os.remove': 1, 'os.rmdir': 1, 'os.mkdir': 1, 'os.chmod': 1, 'os.chown': 1,
+    'os.truncate': 1, 'os.utime': 1, 'os.mkfifo': 1, 'os.mknod': 1, 'os.rename': 2,
+}
+READ_EVENTS = ('os.listdir', 'os.scandir')
+WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_APPEND | os.O_CREAT | os.O_TRUNC
+
+class CpuTimeExceeded(BaseException):
+    """Raised when a cell uses up its CPU time."""
+
+class BoundedOutput(io.StringIO):
+    """A text stream that keeps at most limit characters and drops the rest."""
+
+    def __init__(self, limit):
+        super().__init__()
+        self.limit = limit
+        self.truncated = False
+
+    def write(self, text):
+        room = self.limit - self.tell()
+        if len(text) > room:
+            self.truncated = True
+            text = text[:max(room, 0)]
+        return super().write(text)
+
+def block_network():
+    """Move the process into an empty network namespace. Returns True if that worked.
+
+    Needs CAP_SYS_ADMIN; sockets are refused by the audit hook either way.
+    """
+    try:
+        import ctypes
+        return ctypes.CDLL(None, use_errno=True).unshare(CLONE_NEWNET) == 0
+    except (OSError, AttributeError):
+        return False
+
+def limit_resources(memory_mb, file_mb):
+    """Cap the address space growth, file sizes and child processes of this process."""
+    import resource
+
+    # The limit is on top of what the interpreter already uses
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    with open('/proc/self/statm') as f:
+        used = int(f.read().split()[0]) * page_size
+    resource.setrlimit(resource.RLIMIT_AS, (used + memory_mb * 1024 * 1024,) * 2)
+    # With no file size allowance writes fail with EFBIG instead of killing the process
+    signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (file_mb * 1024 * 1024,) * 2)
+    try:
+        resource.setrlimit(resource.RLIMIT_NPROC, (0, 0))
+    except (ValueError, OSError):
+        pass
+    # RLIMIT_NPROC does not bind root; a forked copy would share the pipe to the app, so it exits at once
+    os.register_at_fork(after_in_child=lambda: os._exit(1))
+
+def install_guard(scratch, denied, allowed):
+    """Refuse, through an audit hook, what a cell must not do.
+
+    Files may only be changed inside scratch, and nothing under the denied
+    directories (the app, other sessions) may be read, except under the
+    allowed ones (scratch, the Python installation); other processes' /proc
+    entries are hidden too. Directories outside scratch cannot be opened
+    with os.open, so dir_fd cannot lead out of it. Everything the hook uses
+    is bound now, and paths must be plain str, bytes or pathlib paths, so
+    no code of the cell runs inside the hook. This is a second line of
+    defence behind the process boundary, the resource limits and SANDBOX_USER.
+    """
+    import pathlib
+    import resource
+
+    # Imported by the multiprocessing modules; dropped so that a cell has to import them again, which is refused
+    for name in ('subprocess', '_posixsubprocess', '_multiprocessing'):
+        sys.modules.pop(name, None)
+    # multiprocessing.connection only uses _multiprocessing on Windows
+    vars(sys.modules['multiprocessing.connection']).pop('_multiprocessing', None)
+    # pidfd_open could signal the app without os.kill
+    for module in (os, sys.modules['posix']):
+        if hasattr(module, 'pidfd_open'):
+            delattr(module, 'pidfd_open')
+
+    own_proc = f'/proc/{os.getpid()}'
+    path_types = (str, bytes, pathlib.PurePosixPath, pathlib.PosixPath)
+    _, cpu_hard = resource.getrlimit(resource.RLIMIT_CPU)
+
+    def inside(path, root):
+        return path == root or path.startswith(root + os.sep)
+
+    def hook(event, args, blocked=BLOCKED_EVENTS, blocked_imports=BLOCKED_IMPORTS, write_events=WRITE_EVENTS,
+             read_events=READ_EVENTS, write_flags=WRITE_FLAGS, scratch=scratch, denied=tuple(denied),
+             allowed=tuple(allowed) + (scratch,), own_proc=own_proc, path_types=path_types, inside=inside,
+             realpath=os.path.realpath, isdir=os.path.isdir, fsdecode=os.fsdecode, function=type(inside),
+             rlimit_cpu=resource.RLIMIT_CPU, cpu_hard=cpu_hard, error=PermissionError, type=type, str=str, int=int,
+             tuple=tuple, len=len, any=any):
+
+        def check(path, writing, directory=False):
+            if type(path) is int:
+                return
+            if type(path) not in path_types:
+                raise error('Paths must be str, bytes or pathlib paths in the sandbox')
+            path = fsdecode(str(path) if type(path) not in (str, bytes) else path)
+            if not path.startswith('/') and '..' in path.split('/'):
+                raise error(f'{path} leaves the working directory')
+            path = realpath(path)
+            if writing or directory and isdir(path):
+                if not inside(path, scratch):
+                    action = 'changed' if writing else 'opened'
+                    raise error(f'Files can only be {action} in the working directory, not {path}')
+                return
+            if inside(path, '/proc') and path[6:7].isdigit() and not inside(path, own_proc):
+                raise error(f'Reading {path} is not allowed in the sandbox')
+            if any(inside(path, root) for root in denied) and not any(inside(path, root) for root in allowed):
+                raise error(f'Reading {path} is not allowed in the sandbox')
+
+        if event.startswith(blocked):
+            raise error(f'{event} is not allowed in the sandbox')
+        if event == 'open':
+            path, mode, flags = args
+            writing = bool(flags & write_flags) or (type(mode) is str and any(c in mode for c in 'wax+'))
+            # os.open (without a mode) is the one way to get a directory descriptor for dir_fd
+            check(path, writing, directory=mode is None)
+        elif event in write_events:
+            for path in args[:write_events[event]]:
+                check(path, True)
+        elif event in read_events:
+            check('.' if not args or args[0] is None else args[0], False)
+        elif event == 'import' and (type(args[0]) is not str or args[0] in blocked_imports):
+            raise error(f'Importing {args[0]} is not allowed in the sandbox')
+        elif event == 'resource.setrlimit':
+            limits = args[1]
+            # execute() moves the soft CPU limit; nothing else may change
+            if args[0] != rlimit_cpu or type(limits) is not tuple or len(limits) != 2 \
+                    or type(limits[1]) is not int or limits[1] != cpu_hard:
+                raise error('Changing resource limits is not allowed in the sandbox')
+        elif event == 'object.__setattr__' and type(args[0]) is function:
+            raise error('Changing the code of functions is not allowed in the sandbox')
+
+    sys.addaudithook(hook)
+
+def raise_cpu_time_exceeded(signum, frame):
+    raise CpuTimeExceeded()
+
+def set_cpu_limit(seconds):
+    """Allow this process seconds more CPU time (None lifts the limit)."""
+    import resource
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if seconds is None:
+        soft = hard
+    else:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        soft = int(usage.ru_utime + usage.ru_stime) + seconds
+        if hard != resource.RLIM_INFINITY:
+            soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+def format_error(error, code, max_output):
+    """Format an exception raised by a cell, showing only the cell's own frames."""
+    linecache.cache[CELL_FILENAME] = (len(code), None, code.splitlines(True), CELL_FILENAME)
+    frames = [frame for frame in traceback.extract_tb(error.__traceback__) if frame.filename == CELL_FILENAME]
+    lines = ['Traceback (most recent call last):\n'] + traceback.format_list(frames) if frames else []
+    lines += traceback.format_exception_only(type(error), error)
+    return {'name': type(error).__name__, 'message': str(error)[:max_output], 'traceback': ''.join(lines)[-max_output:]}
+
+def execute(code, namespace, cpu_seconds, max_output):
+    """Run a cell in namespace like a notebook: output is captured, the last expression is the result."""
+    stdout, stderr = BoundedOutput(max_output), BoundedOutput(max_output)
+    result = error = None
+    started = time.perf_counter()
+    saved = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = stdout, stderr
+    set_cpu_limit(cpu_seconds)
+    try:
+        tree = ast.parse(code, CELL_FILENAME, 'exec')
+        last = None
+        if tree.body and isinstance(tree.body[-1], ast.Expr):
+            last = ast.Expression(tree.body.pop().value)
+        exec(compile(tree, CELL_FILENAME, 'exec'), namespace)
+        if last is not None:
+            value = eval(compile(last, CELL_FILENAME, 'eval'), namespace)
+            if value is not None:
+                namespace['_'] = value
+                result = repr(value)[:max_output]
+    except CpuTimeExceeded:
+        error = {'name': 'TimeoutError', 'message': f'CPU time limit of {cpu_seconds}s exceeded', 'traceback': ''}
+    except MemoryError:
+        error = {'name': 'MemoryError', 'message': 'Memory limit exceeded', 'traceback': ''}
+    except BaseException as e:
+        error = format_error(e, code, max_output)
+    finally:
+        set_cpu_limit(None)
+        sys.stdout, sys.stderr = saved
+
+    return {
+        'stdout': stdout.getvalue(),
+        'stderr': stderr.getvalue(),
+        'result': result,
+        'error': error,
+        'truncated': stdout.truncated or stderr.truncated,
+        'elapsed': time.perf_counter() - started,
+    }
+
+def main():
+    """Set up the limits and the guard, then run the cells sent on the pipe in one namespace."""
+    conn = Connection(int(sys.argv[1]))
+    settings = json.loads(sys.argv[2])
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGXCPU, raise_cpu_time_exceeded)
+
+    isolated = block_network()
+    limit_resources(settings['memory_mb'], settings['file_mb'])
+    allowed = {sys.prefix, sys.exec_prefix, sys.base_prefix, sys.base_exec_prefix}
+    install_guard(os.getcwd(), settings['denied_paths'], sorted(allowed))
+    conn.send_bytes(json.dumps({'ready': True, 'network_isolated': isolated}).encode('utf-8'))
+
+    namespace = {'__name__': '__main__', '__builtins__': builtins}
+    while True:
+        try:
+            request = json.loads(conn.recv_bytes())
+        except (EOFError, OSError):
+            return
+        reply = execute(request['code'], namespace, settings['cpu_seconds'], settings['max_output'])
+        conn.send_bytes(json.dumps(reply).encode('utf-8'))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+# app/services/search_index.py
+import os
+import re
+import json
+import math
+import tempfile
+import threading
+from markupsafe import Markup, escape
+from app.services.notebook_catalog import notebook_headings
+
+# Bump when the stored layout or tokenization changes to rebuild persisted indexes
+INDEX_VERSION = 1
+
+TOKEN_RE = re.compile(r'\w+')
+
+# A match in a heading counts for more than one in body text or code
+FIELD_WEIGHTS = {'heading': 3.0, 'markdown': 1.0, 'code': 1.0}
+
+# Extra score for each place where the query terms appear as a phrase
+PHRASE_BOOST = 2.0
+
+SNIPPET_CHARS = 160
+SNIPPETS_PER_RESULT = 2
+
+# Global search index object
+search_index = None
+
+def init_search_index(app):
+    """Initialize the search index, loading the persisted copy if there is one."""
+    global search_index
+    search_index = SearchIndex(app.config.get('SEARCH_INDEX_PATH'))
+
+def get_search_index():
+    """Return the application's search index."""
+    return search_index
+
+def tokenize(text):
+    """Yield ``(token, start, end)`` for each word in text, lowercased."""
+    for match in TOKEN_RE.finditer(text):
+        yield match.group().lower(), match.start(), match.end()
+
+def notebook_fields(notebook):
+    """Split a notebook into searchable ``[cell_index, kind, text]`` fields."""
+    fields = [[h['cell'], 'heading', h['text']] for h in notebook_headings(notebook)]
+    for index, cell in enumerate(notebook.cells):
+        if cell.cell_type in ('markdown', 'code') and cell.source.strip():
+            fields.append([index, cell.cell_type, cell.source])
+    return fields
+
+def highlight(text, terms, width=SNIPPET_CHARS):
+    """Cut a window of text around the first matching term, with matches in <mark>."""
+    spans = [(start, end) for token, start, end in tokenize(text) if token in terms]
+    if not spans:
+        start = 0
+    else:
+        # Show a little context before the first match, starting on a word boundary
+        start = max(0, spans[0][0] - width // 4)
+        if start:
+            space = text.find(' ', start)
+            start = space + 1 if 0 <= space < spans[0][0] else start
+    end = min(len(text), start + width)
+
+    pieces = [Markup('&hellip;')] if start else []
+    position = start
+    for span_start, span_end in spans:
+        if span_start < position:
+            continue
+        if span_end > end:
+            break
+        pieces.append(escape(text[position:span_start]))
+        pieces.append(Markup('<mark>%s</mark>') % text[span_start:span_end])
+        position = span_end
+    pieces.append(escape(text[position:end]))
+    if end < len(text):
+        pieces.append(Markup('&hellip;'))
+    return Markup('').join(pieces)
+
+class SearchIndex:
+    """Inverted index over the headings, markdown and code of every notebook.
+
+    Postings map each token to the notebooks it occurs in, with a flat list of
+    ``field, position`` pairs per notebook, so phrases can be matched without
+    reading the notebooks again. The field texts are kept for snippets. Like
+    the catalog, notebooks are only parsed again when their size or mtime
+    changes, and the index is persisted as JSON between restarts.
+    """
+
+    def __init__(self, index_path=None):
+        self.index_path = index_path
+        self.docs = {}
+        self.postings = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def update(self, entries):
+        """Bring the index in line with catalog entries. Returns the changed notebook ids."""
+        with self._lock:
+            stale = [entry for entry in entries if not self._is_current(entry)]
+            removed = set(self.docs) - {entry['id'] for entry in entries}
+
+        # Parse outside the lock so queries are not held up
+        import nbformat
+        parsed = {}
+        for entry in stale:
+            try:
+                with open(entry['path'], 'r', encoding='utf-8') as f:
+                    notebook = nbformat.read(f, as_version=4)
+            except (OSError, ValueError):
+                continue
+            parsed[entry['id']] = {
+                'path': entry['path'],
+                'mtime_ns': entry['mtime_ns'],
+                'size': entry['size'],
+                'title': entry['title'],
+                'fields': notebook_fields(notebook),
+            }
+
+        if not parsed and not removed:
+            return []
+
+        with self._lock:
+            for notebook_id in removed:
+                self._remove_doc(notebook_id)
+            for notebook_id, doc in parsed.items():
+                self._remove_doc(notebook_id)
+                self._add_doc(notebook_id, doc)
+            self._save()
+
+        return sorted(parsed) + sorted(removed)
+
+    def search(self, query, limit=20):
+        """Rank notebooks containing every query term.
+
+        Returns dicts with the notebook id, title, score and highlighted
+        snippets of the best matching cells.
+        """
+        words = [token for token, _, _ in tokenize(query)]
+        terms = list(dict.fromkeys(words))
+        if not terms:
+            return []
+
+        with self._lock:
+            term_postings = [self.postings.get(term) for term in terms]
+            if not all(term_postings):
+                return []
+
+            # Start from the rarest term; every term must be present
+            candidates = set(min(term_postings, key=len))
+            for postings in term_postings:
+                candidates.intersection_update(postings)
+
+            total = len(self.docs)
+            idf = [math.log(1 + total / len(postings)) for postings in term_postings]
+
+            results = []
+            for notebook_id in candidates:
+                doc = self.docs[notebook_id]
+                score = 0.0
+                for weight, postings in zip(idf, term_postings):
+                    occurrences = postings[notebook_id]
+                    tf = sum(FIELD_WEIGHTS[doc['fields'][field][1]] for field in occurrences[::2])
+                    score += weight * (1 + math.log(tf))
+
+                phrases = self._phrase_fields(notebook_id, words)
+                score += PHRASE_BOOST * sum(idf) * sum(phrases.values())
+                results.append((score, doc['title'], notebook_id, phrases))
+
+            results.sort(key=lambda r: (-r[0], r[1]))
+            return [self._result(notebook_id, score, phrases, terms, term_postings)
+                    for score, _, notebook_id, phrases in results[:limit]]
+
+    def stats(self):
+        """Return the number of indexed notebooks and distinct tokens."""
+        with self._lock:
+            return {'notebooks': len(self.docs), 'tokens': len(self.postings)}
+
+    def _is_current(self, entry):
+        doc = self.docs.get(entry['id'])
+        return (doc is not None and doc['path'] == entry['path']
+                and doc['mtime_ns'] == entry['mtime_ns'] and doc['size'] == entry['size'])
+
+    def _phrase_fields(self, notebook_id, words):
+        """Count phrase matches of the query words per field of a notebook."""
+        if len(words) < 2:
+            return {}
+        positions = []
+        for word in words:
+            occurrences = self.postings[word][notebook_id]
+            positions.append(set(zip(occurrences[::2], occurrences[1::2])))
+
+        counts = {}
+        for field, position in positions[0]:
+            if all((field, position + offset) in positions[offset] for offset in range(1, len(words))):
+                counts[field] = counts.get(field, 0) + 1
+        return counts
+
+    def _result(self, notebook_id, score, phrases, terms, term_postings):
+        doc = self.docs[notebook_id]
+        field_terms = {}
+        for term, postings in zip(terms, term_postings):
+            for field in postings[notebook_id][::2]:
+                field_terms.setdefault(field, set()).add(term)
+
+        # Prefer phrase matches, then fields with more distinct terms, headings first
+        ranked = sorted(
+            field_terms,
+            key=lambda f: (-phrases.get(f, 0), -len(field_terms[f]),
+                           -FIELD_WEIGHTS[doc['fields'][f][1]], f)
+        )
+        snippets = []
+        for field in ranked[:SNIPPETS_PER_RESULT]:
+            cell, kind, text = doc['fields'][field]
+            snippets.append({'cell': cell, 'kind': kind, 'html': highlight(text, set(terms))})
+        return {
+            'id': notebook_id,
+            'title': doc['title'],
+            'score': round(score, 3),
+            'snippets': snippets,
+        }
+
+    def _add_doc(self, notebook_id, doc):
+        self.docs[notebook_id] = doc
+        for field, (_, _, text) in enumerate(doc['fields']):
+            for position, (token, _, _) in enumerate(tokenize(text)):
+                self.postings.setdefault(token, {}).setdefault(notebook_id, []).extend((field, position))
+
+    def _remove_doc(self, notebook_id):
+        doc = self.docs.pop(notebook_id, None)
+        if doc is None:
+            return
+        tokens = {token for _, _, text in doc['fields'] for token, _, _ in tokenize(text)}
+        for token in tokens:
+            postings = self.postings.get(token)
+            if postings is None:
+                continue
+            postings.pop(notebook_id, None)
+            if not postings:
+                del self.postings[token]
+
+    def _load(self):
+        if not self.index_path or not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') != INDEX_VERSION:
+            return
+        self.docs = data.get('docs', {})
+        self.postings = data.get('postings', {})
+
+    def _save(self):
+        if not self.index_path:
+            return
+        index_dir = os.path.dirname(self.index_path)
+        os.makedirs(index_dir, exist_ok=True)
+
+        # Write to a temp file and rename so other workers never read a partial index
+        fd, tmp_path = tempfile.mkstemp(dir=index_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'version': INDEX_VERSION, 'docs': self.docs, 'postings': self.postings},
+                          f, separators=(',', ':'))
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,103 @@
+# app/services/single_flight.py
+import threading
+
+class SingleFlightTimeout(TimeoutError):
+    """Raised when waiting for another thread's result takes too long."""
+
+class _Call:
+    """A call in progress and the result its waiters will share."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into a single execution.
+
+    The first caller for a key runs the function; callers that arrive while it
+    is running wait for it and get the same result, or the same exception.
+    Nothing is cached: once the call finishes the next caller runs it again,
+    so this only removes duplicate work that overlaps in time.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def do(self, key, func, timeout=None):
+        """Return func(), sharing the execution with concurrent callers for key.
+
+        Waiting callers give up after timeout seconds with SingleFlightTimeout;
+        the running call is not interrupted.
+        """
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            if not call.done.wait(timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise SingleFlightTimeout(f'Timed out after {timeout}s waiting for {key!r}')
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def claim(self, key):
+        """Lead the call for key from outside do(), for work that ends later (a streamed response).
+
+        Returns a function to call once the work is done, which lets the
+        callers waiting in do() return None; or None if a call for key is
+        already running, in which case do() waits for it.
+        """
+        with self._lock:
+            if key in self._calls:
+                return None
+            self.calls += 1
+            self.executions += 1
+            call = self._calls[key] = _Call()
+
+        def finish():
+            with self._lock:
+                if self._calls.get(key) is not call:
+                    return
+                del self._calls[key]
+            call.done.set()
+        return finish
+
+    def stats(self):
+        """Return call counters; coalesced counts the executions that were saved."""
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'timeouts': self.timeouts,
+                'errors': self.errors,
+                'in_flight': len(self._calls),
+            }
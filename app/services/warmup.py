@@ -0,0 +1,68 @@
+# app/services/warmup.py
+import time
+import threading
+
+from app.services.notebook_catalog import get_notebook_catalog
+from app.services.notebook_service import warm_up_notebook_service
+from app.services.sandbox import get_sandbox_pool
+
+WARMUP_MODES = ('background', 'boot', 'off')
+
+# Global warmup thread, while it runs in the background
+warmup_thread = None
+
+def init_warmup(app, prerender):
+    """Load the render machinery according to WARMUP.
+
+    'background' does it on a thread so the app starts serving at once,
+    'boot' does it before returning, so that forked workers (gunicorn
+    --preload) inherit warm exporters and pages, and 'off' leaves it to the
+    first render. prerender(notebook_id) is called inside a request context
+    for each of WARM_NOTEBOOKS.
+    """
+    global warmup_thread
+
+    mode = app.config.get('WARMUP', 'background')
+    if mode not in WARMUP_MODES:
+        raise ValueError(f'WARMUP must be one of {", ".join(WARMUP_MODES)}, not {mode!r}')
+
+    if mode == 'boot':
+        # Sandbox processes are per worker, so forked workers start their own on first use
+        warm_up(app, prerender, start_sandbox=False)
+    elif mode == 'background':
+        warmup_thread = threading.Thread(target=warm_up, args=(app, prerender), name='warmup', daemon=True)
+        warmup_thread.start()
+    return warmup_thread
+
+def get_warmup_thread():
+    """Return the background warmup thread, or None."""
+    return warmup_thread
+
+def warm_notebook_ids(app):
+    """Resolve WARM_NOTEBOOKS ('all' or comma-separated ids) to notebook ids."""
+    setting = (app.config.get('WARM_NOTEBOOKS') or '').strip()
+    if setting == 'all':
+        entries = get_notebook_catalog().list_notebooks(app.config['NOTEBOOKS_DIR'])
+        return [entry['id'] for entry in entries]
+    return [notebook_id.strip() for notebook_id in setting.split(',') if notebook_id.strip()]
+
+def warm_up(app, prerender, start_sandbox=True):
+    """Build the exporters and start the sandbox, then pre-render the warm notebooks. Returns the ids rendered."""
+    started = time.perf_counter()
+    rendered = []
+    with app.app_context():
+        warm_up_notebook_service(app)
+        if start_sandbox:
+            get_sandbox_pool()
+        for notebook_id in warm_notebook_ids(app):
+            try:
+                with app.test_request_context(f'/notes/{notebook_id}'):
+                    if prerender(notebook_id):
+                        rendered.append(notebook_id)
+            except Exception:
+                # A broken notebook is left to its first visitor
+                app.logger.exception(f'Warming notebook {notebook_id} failed')
+
+    app.logger.info(f'Warmup finished in {time.perf_counter() - started:.2f}s, '
+                    f'{len(rendered)} notebooks pre-rendered')
+    return rendered
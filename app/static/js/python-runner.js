@@ -0,0 +1,94 @@
+// Runs notebook code in the shared Python worker (see python-worker.js)
+//
+// The worker is only started on the first run. Include this script with
+// data-worker (the worker URL) and data-pyodide (the Pyodide base URL).
+// With data-run-endpoint, code is sent to the server instead (/api/run),
+// keeping one namespace per browser tab.
+
+const PythonRunner = (function () {
+    const script = document.currentScript;
+    const workerURL = script.dataset.worker;
+    const indexURL = script.dataset.pyodide;
+    const runEndpoint = script.dataset.runEndpoint;
+    const SESSION_KEY = 'python-notes-session';
+
+    const runs = new Map();
+    let port = null;
+    let nextId = 1;
+
+    function handleMessage(event) {
+        const message = event.data;
+        const run = runs.get(message.id);
+        if (!run) {
+            return;
+        }
+        if (message.type === 'stdout' || message.type === 'stderr') {
+            run.onOutput(message.text, message.type);
+        } else if (message.type === 'status') {
+            run.onStatus(message.status);
+        } else {
+            runs.delete(message.id);
+            if (message.type === 'error') {
+                run.reject(new Error(message.message));
+            } else {
+                run.resolve(message.result);
+            }
+        }
+    }
+
+    function connect() {
+        if (port) {
+            return port;
+        }
+        // The same URL (and name) makes every page connect to the same shared worker
+        const url = `${workerURL}?indexURL=${encodeURIComponent(indexURL)}`;
+        if (window.SharedWorker) {
+            port = new SharedWorker(url, { name: 'python-notes' }).port;
+            port.onmessage = handleMessage;
+            port.start();
+        } else {
+            port = new Worker(url);
+            port.onmessage = handleMessage;
+        }
+        return port;
+    }
+
+    // Run code on the server; output arrives all at once when the cell finishes
+    async function runOnServer(code, onOutput) {
+        const response = await fetch(runEndpoint, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ code, session: sessionStorage.getItem(SESSION_KEY) })
+        });
+        const reply = await response.json();
+        if (!response.ok) {
+            throw new Error(reply.error);
+        }
+        sessionStorage.setItem(SESSION_KEY, reply.session);
+        if (reply.stdout) {
+            onOutput(reply.stdout, 'stdout');
+        }
+        if (reply.stderr) {
+            onOutput(reply.stderr, 'stderr');
+        }
+        if (reply.error) {
+            throw new Error(reply.error.traceback || `${reply.error.name}: ${reply.error.message}`);
+        }
+        return reply.result;
+    }
+
+    // Run code; onOutput(text, stream) is called as output arrives.
+    // Resolves with the repr of the last expression, or null.
+    function run(code, { onOutput = () => {}, onStatus = () => {} } = {}) {
+        if (runEndpoint) {
+            return runOnServer(code, onOutput);
+        }
+        const id = nextId++;
+        return new Promise((resolve, reject) => {
+            runs.set(id, { resolve, reject, onOutput, onStatus });
+            connect().postMessage({ type: 'run', id, code });
+        });
+    }
+
+    return { run };
+})();
@@ -0,0 +1,79 @@
+// Python worker for notebook pages
+//
+// Runs as a SharedWorker where the browser supports it, so every open notebook
+// page shares one Pyodide runtime, and as a dedicated Worker otherwise.
+// Pyodide is only loaded when the first cell is run. Code runs off the main
+// thread and its output is posted back line by line while it runs.
+
+const indexURL = new URLSearchParams(self.location.search).get('indexURL');
+
+let runtime = null;      // Promise of the loaded Pyodide instance
+let current = null;      // { port, id } of the run producing output right now
+let queue = Promise.resolve();
+
+function loadRuntime(port, id) {
+    if (!runtime) {
+        port.postMessage({ id, type: 'status', status: 'loading' });
+        importScripts(indexURL + 'pyodide.js');
+        runtime = loadPyodide({
+            indexURL,
+            stdout: (text) => current && current.port.postMessage({ id: current.id, type: 'stdout', text: text + '\n' }),
+            stderr: (text) => current && current.port.postMessage({ id: current.id, type: 'stderr', text: text + '\n' }),
+        }).catch((error) => {
+            // Let the next run try again, e.g. once the network is back
+            runtime = null;
+            throw error;
+        });
+    }
+    return runtime;
+}
+
+async function run(port, message) {
+    const { id, code } = message;
+    let namespace = null;
+    try {
+        const pyodide = await loadRuntime(port, id);
+        await pyodide.loadPackagesFromImports(code);
+
+        // Every run starts from a fresh namespace, which is much cheaper than wiping globals
+        namespace = pyodide.globals.get('dict')();
+        pyodide.runPython('import math', { globals: namespace });
+
+        current = { port, id };
+        const result = await pyodide.runPythonAsync(code, { globals: namespace });
+        let text = null;
+        if (result !== undefined && result !== null) {
+            text = String(result);
+            if (result.destroy) {
+                result.destroy();
+            }
+        }
+        port.postMessage({ id, type: 'done', result: text });
+    } catch (error) {
+        port.postMessage({ id, type: 'error', message: error.message });
+    } finally {
+        current = null;
+        if (namespace) {
+            namespace.destroy();
+        }
+    }
+}
+
+function listen(port) {
+    port.onmessage = (event) => {
+        if (event.data.type === 'run') {
+            // One interpreter, so runs from all pages are executed in order
+            queue = queue.then(() => run(port, event.data));
+        }
+    };
+}
+
+if (typeof SharedWorkerGlobalScope !== 'undefined' && self instanceof SharedWorkerGlobalScope) {
+    self.onconnect = (event) => {
+        const port = event.ports[0];
+        listen(port);
+        port.start();
+    };
+} else {
+    listen(self);
+}
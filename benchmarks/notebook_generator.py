@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+"""
+Synthetic Notebook Generator
+Writes notebooks of a controllable size for benchmarking the web app:
+    python benchmarks/notebook_generator.py out/ --count 20 --cells 200 --output-bytes 2000 --images 5
+"""
+
+import os
+import random
+import struct
+import zlib
+import base64
+import argparse
+import nbformat
+
+WORDS = (
+    'python list comprehension loop function variable string dictionary tuple set '
+    'class object method return value index slice range print import module error '
+    'exception file iterate generator lambda argument parameter condition boolean'
+).split()
+
+def png_bytes(width, height, seed=0):
+    """Encode a valid RGB PNG of random pixels (it compresses about as badly as a photo)."""
+    rng = random.Random(seed)
+    rows = b''.join(b'\x00' + rng.randbytes(width * 3) for _ in range(height))
+
+    def chunk(kind, data):
+        body = kind + data
+        return struct.pack('>I', len(data)) + body + struct.pack('>I', zlib.crc32(body) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(rows, 6)) + chunk(b'IEND', b''))
+
+def sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize() + '.'
+
+def generate_notebook(cells=20, output_bytes=200, images=0, image_size=64, seed=0, title='Synthetic Notebook'):
+    """Build a notebook alternating markdown and code cells.
+
+    Each code cell prints output_bytes of text, and the first images code
+    cells also carry an embedded PNG of image_size pixels square.
+    """
+    rng = random.Random(seed)
+    notebook = nbformat.v4.new_notebook()
+    notebook.metadata['kernelspec'] = {'display_name': 'Python 3', 'language': 'python', 'name': 'python3'}
+    notebook.metadata['language_info'] = {'name': 'python', 'pygments_lexer': 'ipython3', 'version': '3.11'}
+    notebook.cells.append(nbformat.v4.new_markdown_cell(f'# {title}'))
+
+    images_left = images
+    for index in range(1, cells):
+        if index % 2:
+            heading = f'## Section {index // 2 + 1}\n\n' if index % 10 == 1 else ''
+            notebook.cells.append(nbformat.v4.new_markdown_cell(heading + sentence(rng, 30)))
+            continue
+
+        name = rng.choice(WORDS)
+        source = f'{name} = [x * {index} for x in range({index})]\nprint({name})'
+        text = (sentence(rng) + '\n') * (output_bytes // 80 + 1)
+        outputs = [nbformat.v4.new_output('stream', name='stdout', text=text[:output_bytes])]
+        if images_left:
+            data = base64.b64encode(png_bytes(image_size, image_size, seed=seed * 1000 + index)).decode('ascii')
+            outputs.append(nbformat.v4.new_output('display_data', data={'image/png': data, 'text/plain': '<Figure>'}))
+            images_left -= 1
+        notebook.cells.append(nbformat.v4.new_code_cell(source, execution_count=index // 2, outputs=outputs))
+
+    return notebook
+
+def write_notebooks(output_dir, count=1, prefix='synthetic', **kwargs):
+    """Write count generated notebooks to output_dir and return their paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for i in range(count):
+        path = os.path.join(output_dir, f'{prefix}{i:04d}.ipynb')
+        notebook = generate_notebook(seed=i, title=f'{prefix.title()} {i}', **kwargs)
+        with open(path, 'w', encoding='utf-8') as f:
+            nbformat.write(notebook, f)
+        paths.append(path)
+    return paths
+
+def main():
+    """Parse command line arguments and write notebooks."""
+    parser = argparse.ArgumentParser(description='Generate synthetic notebooks for benchmarks.')
+    parser.add_argument('output_dir', help='Directory to write notebooks to')
+    parser.add_argument('-n', '--count', type=int, default=1, help='Number of notebooks')
+    parser.add_argument('--cells', type=int, default=20, help='Cells per notebook')
+    parser.add_argument('--output-bytes', type=int, default=200, help='Text output per code cell')
+    parser.add_argument('--images', type=int, default=0, help='Embedded PNG images per notebook')
+    parser.add_argument('--image-size', type=int, default=64, help='Image width and height in pixels')
+
+    args = parser.parse_args()
+    paths = write_notebooks(args.output_dir, args.count, cells=args.cells, output_bytes=args.output_bytes,
+                            images=args.images, image_size=args.image_size)
+    print(f'Wrote {len(paths)} notebooks to {args.output_dir}')
+
+if __name__ == '__main__':
+    main()
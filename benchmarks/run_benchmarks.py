@@ -0,0 +1,417 @@
+#!/usr/bin/env python
+"""
+Benchmark Suite for Python Notes Website
+Measures the render, metadata and listing paths on synthetic notebooks and
+writes the results as JSON:
+    python benchmarks/run_benchmarks.py -o results.json
+
+Store a baseline once, then compare later runs against it; the exit status is
+1 if any benchmark regressed by more than the threshold:
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --threshold 0.25
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import subprocess
+import tempfile
+import argparse
+import statistics
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+import nbformat
+
+# Make the app package importable when run as a script
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from app import create_app
+from app.services import notebook_service
+from app.services import notebook_catalog
+from app.services import sandbox
+from app.services.metadata_reader import read_notebook_head
+from benchmarks.notebook_generator import write_notebooks
+
+# Notebook shapes rendered by the render, memory and throughput benchmarks
+NOTEBOOK_SIZES = {
+    'small': {'cells': 20, 'output_bytes': 200},
+    'medium': {'cells': 100, 'output_bytes': 1000, 'images': 4, 'image_size': 128},
+    'large': {'cells': 400, 'output_bytes': 4000, 'images': 16, 'image_size': 256},
+}
+QUICK_SIZES = ('small', 'medium')
+
+# Directory sizes for the listing benchmark
+LISTING_COUNTS = (10, 50, 200)
+QUICK_LISTING_COUNTS = (10, 50)
+
+# Thread counts for the throughput benchmark
+CONCURRENCY = (1, 4, 8)
+REQUESTS_PER_THREAD = 20
+
+# Cell run by the sandbox benchmark: a little computation and some output
+SANDBOX_CELL = 'total = sum(i * i for i in range(10000))\nprint(total)\ntotal'
+
+# Timing changes smaller than this are noise, whatever their relative size
+MIN_TIME_DELTA = 0.0005
+
+# Packages that creating the app must not import; they are loaded by the warmup or first render
+DEFERRED_PACKAGES = ('nbconvert', 'nbformat', 'nbclient', 'jupyter_client', 'pygments', 'mistune', 'PIL')
+
+# Run in a fresh interpreter under -X importtime; prints the seconds create_app took
+STARTUP_SCRIPT = (
+    'import time; started = time.perf_counter(); from app import create_app; '
+    'create_app({config!r}); print(time.perf_counter() - started)'
+)
+
+def timing(samples):
+    """Summarize durations in seconds as a lower-is-better result."""
+    samples = sorted(samples)
+    return {
+        'value': statistics.median(samples),
+        'min': samples[0],
+        'max': samples[-1],
+        'samples': len(samples),
+        'unit': 's',
+        'better': 'lower',
+    }
+
+def measure(func, repeat):
+    """Time repeat calls of func."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return timing(samples)
+
+def measure_startup(config_name='testing'):
+    """Create the app in a new interpreter started with -X importtime.
+
+    Returns ``(create_seconds, import_seconds, modules)``: the wall time of
+    importing the package and calling create_app, the total time spent in
+    imports, and the cumulative import time of every module loaded.
+    """
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT.format(config=config_name)],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    )
+    import_us = 0
+    modules = {}
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.partition('import time:')[2].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        import_us += int(fields[0])
+        modules[fields[2].strip()] = int(fields[1]) / 1e6
+    return float(result.stdout.split()[-1]), import_us / 1e6, modules
+
+def make_app(notebooks_dir):
+    """Create an app with caching configured like the test suite (memory only)."""
+    app = create_app('testing')
+    app.config['NOTEBOOKS_DIR'] = notebooks_dir
+    return app
+
+def write_size_notebooks(work_dir, sizes):
+    """Write one notebook per size and return {size: path}."""
+    notebooks_dir = os.path.join(work_dir, 'render')
+    return {size: write_notebooks(notebooks_dir, 1, prefix=size, **NOTEBOOK_SIZES[size])[0]
+            for size in sizes}
+
+def bench_render(work_dir, quick):
+    """Cold and warm get_notebook_html, warm page views and get_notebook_metadata per size."""
+    sizes = QUICK_SIZES if quick else tuple(NOTEBOOK_SIZES)
+    paths = write_size_notebooks(work_dir, sizes)
+    app = make_app(os.path.dirname(next(iter(paths.values()))))
+    client = app.test_client()
+    repeat = 3 if quick else 10
+    results = {}
+
+    with app.app_context():
+        for size, path in paths.items():
+            def cold():
+                notebook_service.render_cache.clear()
+                notebook_service.get_notebook_html(path)
+
+            results[f'render.cold.{size}'] = measure(cold, max(2, repeat // 3))
+            results[f'render.warm.{size}'] = measure(lambda: notebook_service.get_notebook_html(path), repeat)
+            results[f'metadata.{size}'] = measure(lambda: notebook_service.get_notebook_metadata(path), repeat)
+
+            url = f'/notes/{os.path.splitext(os.path.basename(path))[0]}'
+            client.get(url)
+            results[f'page.warm.{size}'] = measure(lambda: client.get(url), repeat)
+
+    return results
+
+def bench_metadata(work_dir, quick):
+    """Fast metadata reads against full validated reads, for every notebook size.
+
+    The fast reader only decodes both ends of the file, so its cost should
+    stay flat while the validated read grows with the notebook.
+    """
+    paths = write_size_notebooks(work_dir, NOTEBOOK_SIZES)
+    repeat = 5 if quick else 20
+    results = {}
+
+    for size, path in paths.items():
+        def validated():
+            with open(path, 'r', encoding='utf-8') as f:
+                nbformat.read(f, as_version=4)
+
+        results[f'metadata.fast.{size}'] = measure(lambda: read_notebook_head(path), repeat)
+        results[f'metadata.validated.{size}'] = measure(validated, max(2, repeat // 4))
+        results[f'metadata.file_size.{size}'] = {'value': os.path.getsize(path), 'unit': 'bytes', 'better': 'lower'}
+
+    return results
+
+def bench_listing(work_dir, quick):
+    """Home page latency against the number of notebooks, with a cold and a warm catalog."""
+    counts = QUICK_LISTING_COUNTS if quick else LISTING_COUNTS
+    repeat = 3 if quick else 10
+    results = {}
+
+    for count in counts:
+        notebooks_dir = os.path.join(work_dir, f'listing{count}')
+        write_notebooks(notebooks_dir, count, cells=20)
+        app = make_app(notebooks_dir)
+        client = app.test_client()
+
+        def cold():
+            notebook_catalog.notebook_catalog = notebook_catalog.NotebookCatalog()
+            client.get('/')
+
+        results[f'listing.cold.{count}'] = measure(cold, max(2, repeat // 3))
+        results[f'listing.warm.{count}'] = measure(lambda: client.get('/'), repeat)
+
+    return results
+
+def bench_memory(work_dir, quick):
+    """Peak Python memory allocated by one cold render of the largest notebook."""
+    size = QUICK_SIZES[-1] if quick else 'large'
+    path = write_size_notebooks(work_dir, (size,))[size]
+    app = make_app(os.path.dirname(path))
+
+    with app.app_context():
+        notebook_service.render_cache.clear()
+        tracemalloc.start()
+        try:
+            notebook_service.get_notebook_html(path)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {f'memory.render_peak.{size}': {'value': peak, 'unit': 'bytes', 'better': 'lower'}}
+
+def bench_throughput(work_dir, quick):
+    """Warm page views per second with several threads sharing one app."""
+    path = write_size_notebooks(work_dir, ('medium',))['medium']
+    app = make_app(os.path.dirname(path))
+    url = f'/notes/{os.path.splitext(os.path.basename(path))[0]}'
+    per_thread = REQUESTS_PER_THREAD // 4 if quick else REQUESTS_PER_THREAD
+    app.test_client().get(url)
+    results = {}
+
+    def worker():
+        client = app.test_client()
+        for _ in range(per_thread):
+            response = client.get(url)
+            assert response.status_code == 200
+
+    for threads in CONCURRENCY:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            for future in [executor.submit(worker) for _ in range(threads)]:
+                future.result()
+        elapsed = time.perf_counter() - started
+        results[f'throughput.page.{threads}'] = {
+            'value': threads * per_thread / elapsed,
+            'unit': 'req/s',
+            'better': 'higher',
+        }
+
+    return results
+
+def bench_sandbox(work_dir, quick):
+    """Sandbox start-up, latency of one /api/run call, and runs per second with several clients at once."""
+    app = make_app(work_dir)
+    app.config['SANDBOX_ENABLED'] = True
+    app.config['SANDBOX_PROCESSES'] = max(CONCURRENCY) // 2
+    app.config['SANDBOX_RATE_LIMIT'] = ''
+    sandbox.init_sandbox(app)
+    per_thread = REQUESTS_PER_THREAD // 4 if quick else REQUESTS_PER_THREAD
+    results = {}
+
+    def run_cell(client, session):
+        response = client.post('/api/run', json={'code': SANDBOX_CELL, 'session': session})
+        assert response.status_code == 200 and response.json['error'] is None
+        return response.json['session']
+
+    try:
+        # Starting the processes is paid once, at warmup, never by a request
+        started = time.perf_counter()
+        sandbox.get_sandbox_pool()
+        results['sandbox.start'] = timing([time.perf_counter() - started])
+
+        client = app.test_client()
+        session = run_cell(client, None)
+        results['sandbox.run'] = measure(lambda: run_cell(client, session), 5 if quick else 20)
+
+        def worker():
+            # Each client is its own session, as each student would be
+            client = app.test_client()
+            session = None
+            for _ in range(per_thread):
+                session = run_cell(client, session)
+
+        for threads in CONCURRENCY:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as executor:
+                for future in [executor.submit(worker) for _ in range(threads)]:
+                    future.result()
+            elapsed = time.perf_counter() - started
+            results[f'throughput.sandbox.{threads}'] = {
+                'value': threads * per_thread / elapsed,
+                'unit': 'req/s',
+                'better': 'higher',
+            }
+    finally:
+        if sandbox.sandbox_pool is not None:
+            sandbox.sandbox_pool.shutdown()
+
+    return results
+
+def bench_startup(work_dir, quick):
+    """Time to import the app and create it, without any warmup, in fresh interpreters."""
+    runs = [measure_startup() for _ in range(3 if quick else 7)]
+    return {
+        'startup.create_app': timing([run[0] for run in runs]),
+        'startup.imports': timing([run[1] for run in runs]),
+    }
+
+BENCHMARKS = {
+    'startup': bench_startup,
+    'render': bench_render,
+    'metadata': bench_metadata,
+    'listing': bench_listing,
+    'memory': bench_memory,
+    'throughput': bench_throughput,
+    'sandbox': bench_sandbox,
+}
+
+def run_benchmarks(groups=None, quick=False):
+    """Run the selected benchmark groups and return the results document."""
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix='python_notes_bench_')
+    try:
+        for name in groups or BENCHMARKS:
+            print(f'Running {name} benchmarks...')
+            results.update(BENCHMARKS[name](os.path.join(work_dir, name), quick))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'quick': quick,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'results': results,
+    }
+
+def compare_results(current, baseline, threshold=0.2):
+    """Compare two results documents.
+
+    Returns rows of ``(name, baseline, current, change, status)``, where
+    change is the relative change signed so that positive is always worse,
+    and status is one of ok, regression, improvement or new.
+    """
+    rows = []
+    for name, result in sorted(current['results'].items()):
+        base = baseline.get('results', {}).get(name)
+        if base is None or not base['value']:
+            rows.append((name, None, result['value'], None, 'new'))
+            continue
+        change = (result['value'] - base['value']) / base['value']
+        if result.get('better') == 'higher':
+            change = -change
+        if result.get('unit') == 's' and abs(result['value'] - base['value']) < MIN_TIME_DELTA:
+            status = 'ok'
+        elif change > threshold:
+            status = 'regression'
+        elif change < -threshold:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append((name, base['value'], result['value'], change, status))
+    return rows
+
+def format_value(value, unit):
+    if value is None:
+        return '-'
+    if unit == 's':
+        return f'{value * 1000:.2f} ms'
+    if unit == 'bytes':
+        return f'{value / 1024 / 1024:.1f} MB'
+    return f'{value:.1f} {unit}'
+
+def print_results(results, rows=None):
+    """Print results, with the comparison against a baseline if given."""
+    if rows is None:
+        for name, result in sorted(results['results'].items()):
+            print(f'{name:32} {format_value(result["value"], result["unit"]):>14}')
+        return
+
+    print(f'{"benchmark":32} {"baseline":>14} {"current":>14} {"change":>8}  status')
+    for name, base, value, change, status in rows:
+        unit = results['results'][name]['unit']
+        change_text = f'{change:+.0%}' if change is not None else '-'
+        print(f'{name:32} {format_value(base, unit):>14} {format_value(value, unit):>14} {change_text:>8}  {status}')
+
+def main():
+    """Parse command line arguments, run the benchmarks and compare against a baseline."""
+    parser = argparse.ArgumentParser(description='Benchmark the notebook render and listing paths.')
+    parser.add_argument('-o', '--output', help='Write results as JSON to this file')
+    parser.add_argument('--baseline', help='Compare against a results file saved earlier')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Relative slowdown counted as a regression (default: 0.2)')
+    parser.add_argument('--save-baseline', metavar='PATH', help='Store the results as the new baseline')
+    parser.add_argument('--only', help=f'Comma-separated groups to run ({", ".join(BENCHMARKS)})')
+    parser.add_argument('--quick', action='store_true', help='Fewer repeats and smaller inputs')
+
+    args = parser.parse_args()
+    groups = args.only.split(',') if args.only else None
+    unknown = set(groups or ()) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f'Unknown benchmark groups: {", ".join(sorted(unknown))}')
+
+    results = run_benchmarks(groups, quick=args.quick)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+            print(f'Results written to {path}')
+
+    if not args.baseline:
+        print_results(results)
+        return 0
+
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    rows = compare_results(results, baseline, args.threshold)
+    print_results(results, rows)
+
+    regressions = [row[0] for row in rows if row[4] == 'regression']
+    if regressions:
+        print(f'{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -88,7 +88,12 @@ def deploy():
         else:
             print("Warning: .env.example not found. You need to create .env manually.")
     
-    # 8. Reload PythonAnywhere web app
+    # 8. Compress static files once, instead of per response or at app startup
+    print("\n>> Precompressing static files")
+    if not run_command('venv/bin/python tools/precompress_static.py'):
+        print("Warning: Static files will be served uncompressed.")
+    
+    # 9. Reload PythonAnywhere web app
     print("\n>> Reloading PythonAnywhere web app")
     if not run_command('touch /var/www/$(whoami)_pythonanywhere_com_wsgi.py'):
         print("Note: Failed to touch WSGI file. You may need to reload the web app manually.")
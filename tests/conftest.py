@@ -48,7 +48,7 @@ def test_notebook_dir():
             },
             {
                 "cell_type": "code",
-                "execution_count": null,
+                "execution_count": None,
                 "metadata": {},
                 "outputs": [],
                 "source": [
@@ -58,7 +58,7 @@ def test_notebook_dir():
             },
             {
                 "cell_type": "code",
-                "execution_count": null,
+                "execution_count": None,
                 "metadata": {},
                 "outputs": [],
                 "source": [
@@ -0,0 +1,176 @@
+# tests/test_admission.py
+import os
+import shutil
+import threading
+import pytest
+
+from app import create_app
+from app.config import TestingConfig
+from app.routes import main
+from app.services import admission
+from app.services.admission import RenderQueue, RenderRejected
+
+def hold_slot(queue):
+    """Take a slot of queue on another thread; call the returned function to give it back."""
+    held, done = threading.Event(), threading.Event()
+
+    def run():
+        with queue.slot():
+            held.set()
+            done.wait()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    held.wait()
+
+    def release():
+        done.set()
+        thread.join()
+    return release
+
+def test_queue_rejects_when_full():
+    queue = RenderQueue(concurrency=1, max_waiting=0)
+    release = hold_slot(queue)
+    try:
+        with pytest.raises(RenderRejected) as excinfo:
+            queue.acquire()
+        assert excinfo.value.reason == 'full'
+    finally:
+        release()
+    assert queue.stats()['rejected'] == {'full': 1, 'timeout': 0}
+
+def test_queue_rejects_after_timeout():
+    queue = RenderQueue(concurrency=1, max_waiting=1, timeout=0.05)
+    release = hold_slot(queue)
+    try:
+        with pytest.raises(RenderRejected) as excinfo:
+            queue.acquire()
+        assert excinfo.value.reason == 'timeout'
+        assert queue.stats()['waiting'] == 0
+    finally:
+        release()
+
+def test_queue_slots_are_reentrant():
+    """A thread holding a slot (a streamed page) renders its cells without taking another."""
+    queue = RenderQueue(concurrency=1, max_waiting=0)
+    with queue.slot():
+        with queue.slot():
+            assert queue.stats()['running'] == 1
+    assert queue.stats() == {'running': 0, 'waiting': 0, 'admitted': 1, 'rejected': {'full': 0, 'timeout': 0}}
+
+def test_cold_render_shed_with_retry_after(app, client):
+    """With the queue full, a page that is not cached gets a fast 503."""
+    queue = admission.render_queue = RenderQueue(concurrency=1, max_waiting=0)
+    release = hold_slot(queue)
+    try:
+        response = client.get('/notes/test_notebook')
+    finally:
+        release()
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
+    assert 'no-store' in response.headers['Cache-Control']
+
+    assert client.get('/notes/test_notebook').status_code == 200
+    assert 'python_notes_render_rejections_total{reason="full"} 1' in client.get('/metrics').get_data(as_text=True)
+
+def test_cached_pages_served_while_queue_full(app, client):
+    assert client.get('/notes/test_notebook').status_code == 200
+
+    queue = admission.render_queue = RenderQueue(concurrency=1, max_waiting=0)
+    release = hold_slot(queue)
+    try:
+        assert client.get('/notes/test_notebook').status_code == 200
+        assert client.get('/about').status_code == 200
+    finally:
+        release()
+
+def test_stale_page_served_while_queue_full(app, client, test_notebook_dir, tmp_path):
+    """After the notebook changes, the previous page is served until it can be rendered."""
+    shutil.copy(os.path.join(test_notebook_dir, 'test_notebook.ipynb'), tmp_path / 'unit.ipynb')
+    app.config['NOTEBOOKS_DIR'] = str(tmp_path)
+    first = client.get('/notes/unit')
+    assert first.status_code == 200
+
+    path = tmp_path / 'unit.ipynb'
+    path.write_text(path.read_text().replace('Hello, world!', 'Hello again!'))
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+    queue = admission.render_queue = RenderQueue(concurrency=1, max_waiting=0)
+    release = hold_slot(queue)
+    try:
+        stale = client.get('/notes/unit')
+    finally:
+        release()
+    assert stale.status_code == 200
+    assert stale.headers['ETag'] == first.headers['ETag']
+    assert b'Hello, world!' in stale.get_data()
+
+    fresh = client.get('/notes/unit')
+    assert b'Hello again!' in fresh.get_data()
+    assert fresh.headers['ETag'] != first.headers['ETag']
+
+def test_render_rate_limit(monkeypatch, test_notebook_dir, tmp_path):
+    """Renders count against the client's limit; cached pages are served even once it is used up."""
+    # Notebooks with the same source share one render, so each gets its own
+    with open(os.path.join(test_notebook_dir, 'test_notebook.ipynb'), encoding='utf-8') as f:
+        source = f.read()
+    for name in ('cached', 'cold', 'other'):
+        (tmp_path / f'{name}.ipynb').write_text(source.replace('Hello, world!', f'Hello, {name}!'), encoding='utf-8')
+    monkeypatch.setattr(TestingConfig, 'RATELIMIT_ENABLED', True)
+    monkeypatch.setattr(TestingConfig, 'RENDER_RATE_LIMIT', '1 per minute')
+    app = create_app('testing')
+    app.config['NOTEBOOKS_DIR'] = str(tmp_path)
+    client = app.test_client()
+
+    with app.test_request_context('/notes/cached'):
+        assert main.prerender_notebook_page('cached')
+    for _ in range(3):
+        assert client.get('/notes/cached').status_code == 200
+
+    assert client.get('/notes/cold').status_code == 200
+    limited = client.get('/notes/other')
+    assert limited.status_code == 429
+    assert int(limited.headers['Retry-After']) > 0
+    assert 'no-store' in limited.headers['Cache-Control']
+
+    assert client.get('/notes/cold').status_code == 200
+    assert client.get('/notes/cached').status_code == 200
+    assert client.get('/about').status_code == 200
+
+def test_concurrent_cold_streams_share_one_render(app, client, monkeypatch):
+    """A second request for a notebook being streamed waits for that stream instead of converting it again."""
+    from app.services import compression, notebook_service
+
+    app.config['STREAM_NOTEBOOK_MIN_SIZE'] = 0
+    compression.page_variants = compression.VariantCache()
+    admission.render_queue = RenderQueue(concurrency=1, max_waiting=0)
+    converted = []
+    render_cell_html = notebook_service.render_cell_html
+    monkeypatch.setattr(notebook_service, 'render_cell_html',
+                        lambda *args, **kwargs: converted.append(1) or render_cell_html(*args, **kwargs))
+
+    def fail(*args, **kwargs):
+        raise AssertionError('the notebook should only be converted by the stream')
+    monkeypatch.setattr(notebook_service, 'render_notebook_html', fail)
+
+    # The first request holds the render slot for as long as its stream is open
+    leader = client.get('/notes/test_notebook', buffered=False)
+    assert leader.status_code == 200 and 'Content-Length' not in leader.headers
+
+    follower = {}
+    thread = threading.Thread(target=lambda: follower.update(response=app.test_client().get('/notes/test_notebook')))
+    thread.start()
+    flights = notebook_service.get_render_flight_stats()['coalesced']
+    while notebook_service.get_render_flight_stats()['coalesced'] == flights and thread.is_alive():
+        thread.join(0.01)
+    assert thread.is_alive()
+
+    body = leader.get_data()
+    leader.close()
+    streamed = len(converted)
+    thread.join()
+    assert follower['response'].status_code == 200
+    assert follower['response'].get_data() == body
+    # The follower converted nothing, neither cells nor the whole notebook
+    assert streamed > 0 and len(converted) == streamed
@@ -0,0 +1,44 @@
+# tests/test_benchmarks.py
+import nbformat
+from benchmarks.notebook_generator import generate_notebook, write_notebooks, png_bytes
+from benchmarks.run_benchmarks import compare_results, bench_listing
+
+def test_generated_notebooks_are_valid(tmp_path):
+    """Generated notebooks validate and have the requested shape."""
+    notebook = generate_notebook(cells=11, output_bytes=500, images=2, image_size=16)
+    nbformat.validate(notebook)
+    assert len(notebook.cells) == 11
+    code_cells = [cell for cell in notebook.cells if cell.cell_type == 'code']
+    assert all(len(cell.outputs[0].text) == 500 for cell in code_cells)
+    assert sum('image/png' in output.get('data', {}) for cell in code_cells for output in cell.outputs) == 2
+
+    paths = write_notebooks(str(tmp_path), 3, cells=5)
+    assert len(paths) == 3
+    assert png_bytes(4, 4).startswith(b'\x89PNG')
+
+def test_compare_results_flags_regressions():
+    """Slowdowns and throughput drops beyond the threshold are regressions."""
+    baseline = {'results': {
+        'render': {'value': 0.100, 'unit': 's', 'better': 'lower'},
+        'tiny': {'value': 0.0001, 'unit': 's', 'better': 'lower'},
+        'throughput': {'value': 100.0, 'unit': 'req/s', 'better': 'higher'},
+    }}
+    current = {'results': {
+        'render': {'value': 0.150, 'unit': 's', 'better': 'lower'},
+        'tiny': {'value': 0.0003, 'unit': 's', 'better': 'lower'},
+        'throughput': {'value': 150.0, 'unit': 'req/s', 'better': 'higher'},
+        'listing': {'value': 0.01, 'unit': 's', 'better': 'lower'},
+    }}
+    statuses = {row[0]: row[4] for row in compare_results(current, baseline, threshold=0.2)}
+    assert statuses == {
+        'render': 'regression',
+        'tiny': 'ok',
+        'throughput': 'improvement',
+        'listing': 'new',
+    }
+
+def test_listing_benchmark_runs(tmp_path):
+    """A benchmark group returns named, unit-tagged results."""
+    results = bench_listing(str(tmp_path), quick=True)
+    assert set(results) == {'listing.cold.10', 'listing.warm.10', 'listing.cold.50', 'listing.warm.50'}
+    assert all(result['unit'] == 's' and result['value'] > 0 for result in results.values())
@@ -0,0 +1,158 @@
+# tests/test_cache_backends.py
+import time
+import threading
+import pytest
+
+from app.services.cache_backends import (
+    MemoryBackend, FileBackend, SqliteBackend, RedisBackend, create_cache_backend
+)
+from app.services.render_cache import RenderCache
+
+class FakeRedis:
+    """Stand-in for a Redis client supporting the commands the backend uses."""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        with self.lock:
+            if name in self.expires and self.expires[name] <= time.monotonic():
+                self.data.pop(name, None)
+            return self.data.get(name)
+
+    def set(self, name, value, nx=False, px=None):
+        if isinstance(value, str):
+            value = value.encode('utf-8')
+        with self.lock:
+            if name in self.expires and self.expires[name] <= time.monotonic():
+                self.data.pop(name, None)
+            if nx and name in self.data:
+                return None
+            self.data[name] = value
+            if px is not None:
+                self.expires[name] = time.monotonic() + px / 1000
+            return True
+
+    def delete(self, name):
+        with self.lock:
+            self.data.pop(name, None)
+            self.expires.pop(name, None)
+
+@pytest.fixture(params=['memory', 'file', 'sqlite', 'redis'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return MemoryBackend()
+    if request.param == 'file':
+        return FileBackend(str(tmp_path / 'files'))
+    if request.param == 'sqlite':
+        return SqliteBackend(str(tmp_path / 'cache.db'))
+    return RedisBackend(FakeRedis())
+
+def test_backend_get_set_delete(backend):
+    """Every backend stores and removes byte values."""
+    assert backend.get('abc') is None
+    backend.set('abc', b'value')
+    assert backend.get('abc') == b'value'
+    backend.delete('abc')
+    assert backend.get('abc') is None
+
+def test_backend_locks(backend):
+    """A lock is held by one owner until released or expired."""
+    token = backend.acquire_lock('abc', ttl=60)
+    assert token
+    assert backend.acquire_lock('abc', ttl=60) is None
+
+    # Releasing with the wrong token does nothing
+    backend.release_lock('abc', 'not-the-owner')
+    assert backend.acquire_lock('abc', ttl=60) is None
+
+    backend.release_lock('abc', token)
+    assert backend.acquire_lock('abc', ttl=0) is not None
+
+    # A zero TTL lock counts as abandoned straight away
+    time.sleep(0.01)
+    assert backend.acquire_lock('abc', ttl=60) is not None
+
+def test_single_flight_across_workers(backend):
+    """Caches sharing a backend render each key once; the others wait for the result."""
+    renders = []
+
+    def create():
+        renders.append(1)
+        time.sleep(0.2)
+        return '<p>rendered</p>', {'outputs': {'a.png': b'png'}}
+
+    # One cache per simulated worker process, all on the same backend
+    caches = [RenderCache(backend=backend, lock_timeout=5) for _ in range(4)]
+    results = [None] * len(caches)
+
+    def worker(i):
+        results[i] = caches[i].get_or_create('key', create, poll_interval=0.01)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(caches))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(renders) == 1
+    assert all(result == ('<p>rendered</p>', {'outputs': {'a.png': b'png'}}) for result in results)
+    assert sum(cache.stats()['lock_waits'] for cache in caches) == 3
+
+def test_waiting_worker_takes_over_failed_render(tmp_path):
+    """If the rendering worker fails, a waiting worker renders instead."""
+    backend = FileBackend(str(tmp_path))
+    token = backend.acquire_lock('key', ttl=60)
+    cache = RenderCache(backend=backend, lock_timeout=5)
+
+    threading.Timer(0.1, backend.release_lock, args=('key', token)).start()
+    html_content, _ = cache.get_or_create('key', lambda: ('<p>mine</p>', {}), poll_interval=0.01)
+    assert html_content == '<p>mine</p>'
+
+def test_create_cache_backend(tmp_path):
+    """Backends are selected by URL scheme."""
+    assert create_cache_backend('') is None
+    assert isinstance(create_cache_backend('memory://'), MemoryBackend)
+    assert isinstance(create_cache_backend(f'file://{tmp_path}/files'), FileBackend)
+    assert isinstance(create_cache_backend(f'sqlite://{tmp_path}/cache.db'), SqliteBackend)
+    with pytest.raises(ValueError):
+        create_cache_backend('ftp://example.com')
+
+@pytest.mark.parametrize('kind', ['file', 'sqlite'])
+def test_backend_evicts_least_recently_used(kind, tmp_path):
+    """Writes beyond max_entries or max_bytes drop the entries read longest ago."""
+    if kind == 'file':
+        backend = FileBackend(str(tmp_path / 'files'), max_entries=2)
+    else:
+        backend = SqliteBackend(str(tmp_path / 'cache.db'), max_entries=2)
+        backend.TOUCH_INTERVAL = 0
+
+    backend.set('a', b'1')
+    time.sleep(0.01)
+    backend.set('b', b'2')
+    time.sleep(0.01)
+    assert backend.get('a') == b'1'
+    time.sleep(0.01)
+    backend.set('c', b'3')
+    assert backend.get('b') is None
+    assert backend.get('a') == b'1' and backend.get('c') == b'3'
+
+    backend.max_entries, backend.max_bytes = None, 100
+    time.sleep(0.01)
+    backend.set('d', b'x' * 100)
+    assert backend.get('a') is None and backend.get('c') is None
+    assert backend.get('d') == b'x' * 100
+
+def test_sqlite_backend_upgrades_old_database(tmp_path):
+    """A database from before size limits gains the columns it needs."""
+    import sqlite3
+    path = str(tmp_path / 'old.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE entries (key TEXT PRIMARY KEY, value BLOB NOT NULL)')
+        conn.execute("INSERT INTO entries VALUES ('old', x'0102')")
+    backend = SqliteBackend(path, max_entries=1)
+    assert backend.get('old') == b'\x01\x02'
+    backend.set('new', b'3')
+    assert backend.get('old') is None and backend.get('new') == b'3'
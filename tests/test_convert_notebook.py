@@ -0,0 +1,75 @@
+# tests/test_convert_notebook.py
+import os
+import json
+
+from app.services import notebook_service
+from app.services.prerendered import PrerenderedBundle
+from tools.convert_notebook import build_notebooks, convert_notebooks, find_notebooks
+
+def test_build_writes_manifest(test_notebook_dir, tmp_path):
+    """A build renders every notebook to a fingerprinted page listed in the manifest."""
+    output_dir = str(tmp_path / 'bundle')
+    assert build_notebooks(test_notebook_dir, output_dir, workers=1)
+
+    with open(os.path.join(output_dir, 'manifest.json'), encoding='utf-8') as f:
+        manifest = json.load(f)
+    entry = manifest['notebooks']['test_notebook']
+    assert entry['title'] == 'Test Notebook'
+    assert entry['html'].startswith('test_notebook.')
+    assert os.path.exists(os.path.join(output_dir, entry['html']))
+
+def test_app_serves_prerendered_bundle(app, test_notebook_dir, tmp_path, monkeypatch):
+    """With a matching bundle, get_notebook_html never runs nbconvert."""
+    output_dir = str(tmp_path / 'bundle')
+    build_notebooks(test_notebook_dir, output_dir, workers=1)
+
+    def fail(notebook_path):
+        raise AssertionError('notebook should not be rendered')
+
+    monkeypatch.setattr(notebook_service, 'prerendered_bundle', PrerenderedBundle(output_dir))
+    monkeypatch.setattr(notebook_service, 'render_notebook_html', fail)
+    notebook_service.render_cache.clear()
+
+    html_content, _ = notebook_service.get_notebook_html(os.path.join(test_notebook_dir, 'test_notebook.ipynb'))
+    assert 'Hello, world!' in html_content
+
+def test_convert_skips_unchanged_notebooks(test_notebook_dir, tmp_path, capsys):
+    """A second run only reconverts notebooks whose source changed."""
+    output_dir = str(tmp_path / 'html')
+    notebooks = find_notebooks([test_notebook_dir])
+    assert notebooks == [os.path.join(test_notebook_dir, 'test_notebook.ipynb')]
+
+    assert convert_notebooks(notebooks, output_dir, workers=1)
+    assert os.path.exists(os.path.join(output_dir, 'test_notebook.html'))
+    capsys.readouterr()
+
+    assert convert_notebooks(notebooks, output_dir, workers=1)
+    assert '0 converted, 1 unchanged' in capsys.readouterr().out
+
+    assert convert_notebooks(notebooks, output_dir, workers=1, force=True)
+    assert '1 converted, 0 unchanged' in capsys.readouterr().out
+
+def test_build_resources_do_not_collide(test_notebook_dir, tmp_path, monkeypatch):
+    """Outputs that nbconvert names alike in two notebooks are kept apart in the bundle."""
+    from tools import convert_notebook
+
+    def export(notebook_path, html_exporter, engine=None):
+        data = os.path.basename(notebook_path).encode()
+        return '<img src="output_1_0.png">', {'outputs': {'output_1_0.png': data}}
+
+    monkeypatch.setattr(convert_notebook, 'export_notebook', export)
+    output_dir = tmp_path / 'bundle'
+    os.makedirs(output_dir / 'resources')
+    source = os.path.join(test_notebook_dir, 'test_notebook.ipynb')
+    for name in ('first', 'second'):
+        with open(source, 'rb') as f, open(tmp_path / f'{name}.ipynb', 'wb') as out:
+            out.write(f.read())
+
+    bundle = {}
+    for name in ('first', 'second'):
+        notebook_id, entry, _ = convert_notebook._build_one(str(tmp_path / f'{name}.ipynb'), str(output_dir))
+        bundle[notebook_id] = entry
+    (first,), (second,) = bundle['first']['resources'], bundle['second']['resources']
+    assert first != second
+    assert (output_dir / 'resources' / first).read_bytes() == b'first.ipynb'
+    assert f'src="{first}"' in (output_dir / bundle['first']['html']).read_text()
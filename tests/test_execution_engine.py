@@ -0,0 +1,47 @@
+# tests/test_execution_engine.py
+import os
+import pytest
+import nbformat
+
+pytest.importorskip('ipykernel')
+
+from app.services.execution_engine import ExecutionEngine
+
+@pytest.fixture(scope='module')
+def engine():
+    """A single warm kernel shared by the tests in this module."""
+    engine = ExecutionEngine(pool_size=1, cell_timeout=10)
+    yield engine
+    engine.shutdown()
+
+def make_notebook(*sources):
+    return nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell(s) for s in sources])
+
+def test_execute_fills_outputs_and_caches(engine, tmp_path):
+    """Executed notebooks get outputs, and the same source is only executed once."""
+    notebook = make_notebook("print('hi')", "1 + 1")
+    before = engine.stats()
+
+    executed = engine.execute(notebook, 'digest-a', cwd=str(tmp_path))
+    assert executed.cells[0].outputs[0]['text'] == 'hi\n'
+    assert executed.cells[1].outputs[0]['data']['text/plain'] == '2'
+    assert notebook.cells[0].outputs == []
+
+    engine.execute(notebook, 'digest-a', cwd=str(tmp_path))
+    stats = engine.stats()
+    assert stats['executions'] == before['executions'] + 1
+    assert stats['cache_hits'] == before['cache_hits'] + 1
+
+def test_kernel_is_reset_between_notebooks(engine, tmp_path):
+    """State from one notebook does not leak into the next."""
+    engine.execute(make_notebook('leaked = 1'), 'digest-b', cwd=str(tmp_path))
+    executed = engine.execute(make_notebook("'leaked' in globals()", 'import os; os.getcwd()'),
+                              'digest-c', cwd=str(tmp_path))
+    assert executed.cells[0].outputs[0]['data']['text/plain'] == 'False'
+    assert os.path.basename(str(tmp_path)) in executed.cells[1].outputs[0]['data']['text/plain']
+
+def test_cell_errors_become_outputs(engine, tmp_path):
+    """A failing cell is recorded as an error output and the kernel stays usable."""
+    executed = engine.execute(make_notebook('1 / 0', "'ok'"), 'digest-d', cwd=str(tmp_path))
+    assert executed.cells[0].outputs[0]['ename'] == 'ZeroDivisionError'
+    assert executed.cells[1].outputs[0]['data']['text/plain'] == "'ok'"
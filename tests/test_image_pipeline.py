@@ -0,0 +1,80 @@
+# tests/test_image_pipeline.py
+import base64
+import pytest
+
+from app.services.image_pipeline import ImagePipeline, image_size, parse_attributes
+from app.services.output_store import OutputStore
+from benchmarks.notebook_generator import png_bytes
+
+URL = '/notes/outputs/'
+
+@pytest.fixture
+def store(tmp_path):
+    return OutputStore(str(tmp_path / 'outputs'))
+
+def data_uri(data):
+    return 'data:image/png;base64,' + base64.b64encode(data).decode('ascii')
+
+def test_image_size_from_headers():
+    assert image_size(png_bytes(30, 20)) == (30, 20)
+    assert image_size(b'GIF89a\x10\x00\x08\x00') == (16, 8)
+    assert image_size(b'not an image') is None
+
+def test_inline_images_become_lazy_files(store):
+    """Base64 images are moved into the outputs and get their size and lazy loading."""
+    data = png_bytes(40, 30)
+    pipeline = ImagePipeline(store, URL, formats=())
+    html_content, outputs = pipeline.process(f'<p><img src="{data_uri(data)}" alt="a &amp; b"\n></p>', {})
+
+    name = store.content_name('image.png', data)
+    assert outputs == {name: data}
+    assert 'base64' not in html_content
+    start = html_content.index('<img')
+    attributes = parse_attributes(html_content[start:html_content.index('>', start) + 1])
+    assert attributes['src'] == URL + name
+    assert attributes['alt'] == 'a &amp; b'
+    assert (attributes['width'], attributes['height']) == ('40', '30')
+    assert (attributes['loading'], attributes['decoding']) == ('lazy', 'async')
+
+def test_notebook_width_kept(store):
+    """A display width from the notebook (retina figures) scales the height to match."""
+    data = png_bytes(200, 100)
+    pipeline = ImagePipeline(store, URL, formats=())
+    html_content, _ = pipeline.process(f'<img src="{data_uri(data)}" width=100>', {})
+    assert 'width="100"' in html_content and 'height="50"' in html_content
+
+def test_relative_images_resolved_inside_notebook_dir(store, tmp_path):
+    """Markdown images next to the notebook are served as outputs; paths outside it are not."""
+    notebooks_dir = tmp_path / 'notebooks'
+    (notebooks_dir / 'img').mkdir(parents=True)
+    (notebooks_dir / 'img' / 'plot.png').write_bytes(png_bytes(10, 10))
+    (tmp_path / 'secret.png').write_bytes(png_bytes(10, 10, seed=1))
+
+    pipeline = ImagePipeline(store, URL, formats=())
+    html_content, outputs = pipeline.process(
+        '<img src="img/plot.png"><img src="../secret.png"><img src="https://example.com/a.png">',
+        {},
+        str(notebooks_dir)
+    )
+    assert len(outputs) == 1
+    assert f'src="{URL}{next(iter(outputs))}"' in html_content
+    assert 'src="../secret.png"' in html_content
+    assert 'src="https://example.com/a.png" loading="lazy"' in html_content
+
+def test_variants_encoded_once(store):
+    """With Pillow, narrower WebP copies are offered and reused once they are stored."""
+    pytest.importorskip('PIL')
+    data = png_bytes(600, 300)
+    pipeline = ImagePipeline(store, URL, widths=(480,), formats=('webp',))
+
+    html_content, outputs = pipeline.process(f'<img src="{data_uri(data)}">', {})
+    stem = store.content_name('image.png', data)[:-len('.png')]
+    assert html_content.startswith('<picture><source type="image/webp"')
+    assert f'{URL}{stem}-480w-q80.webp 480w' in html_content
+    assert 'sizes="(max-width: 600px) 100vw, 600px"' in html_content
+    assert pipeline.encoded == 2
+
+    store.publish(outputs)
+    again, _ = pipeline.process(f'<img src="{data_uri(data)}">', {})
+    assert again == html_content
+    assert pipeline.encoded == 2 and pipeline.reused == 2
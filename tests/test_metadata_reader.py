@@ -0,0 +1,58 @@
+# tests/test_metadata_reader.py
+import os
+import glob
+import json
+import pytest
+import nbformat
+
+from app.services import metadata_reader
+from app.services.metadata_reader import read_notebook_head
+from app.services.notebook_service import get_notebook_metadata
+from benchmarks.notebook_generator import generate_notebook
+
+NOTEBOOKS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'notebooks')
+
+def write(path, notebook):
+    with open(path, 'w', encoding='utf-8') as f:
+        nbformat.write(notebook, f)
+    return str(path)
+
+@pytest.mark.parametrize('path', sorted(glob.glob(os.path.join(NOTEBOOKS_DIR, '*.ipynb'))))
+def test_matches_full_read(path):
+    """The fast reader agrees with nbformat on the bundled notebooks."""
+    with open(path, 'r', encoding='utf-8') as f:
+        full = nbformat.read(f, as_version=4)
+
+    head = read_notebook_head(path)
+    assert head.metadata == full.metadata
+    assert head.cells[0].source == full.cells[0].source
+    assert head.cells[0].cell_type == full.cells[0].cell_type
+
+def test_values_longer_than_a_chunk(tmp_path, monkeypatch):
+    """Cells and metadata that span several chunks are still read directly."""
+    monkeypatch.setattr(metadata_reader, 'CHUNK_SIZE', 64)
+    notebook = generate_notebook(cells=30, output_bytes=2000, title='Ünïcode ' * 20)
+    notebook.metadata['widgets'] = {'state': {'metadata': {'x': 'é' * 500}}}
+    path = write(tmp_path / 'long.ipynb', notebook)
+
+    head = read_notebook_head(path)
+    assert head.cells[0].source == notebook.cells[0].source
+    assert head.metadata == notebook.metadata
+
+def test_empty_notebook(tmp_path):
+    """A notebook without cells has no first cell and falls back to the file name."""
+    path = write(tmp_path / 'empty.ipynb', nbformat.v4.new_notebook())
+    assert read_notebook_head(path).cells == []
+    assert get_notebook_metadata(path)['title'] == 'empty'
+
+def test_unsorted_notebook_falls_back(tmp_path):
+    """Files not laid out like nbformat writes them use the validated reader."""
+    notebook = generate_notebook(cells=3, title='Reordered')
+    path = tmp_path / 'reordered.ipynb'
+    data = json.loads(nbformat.writes(notebook))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({key: data[key] for key in ('metadata', 'nbformat', 'nbformat_minor', 'cells')}, f)
+
+    with pytest.raises(ValueError):
+        read_notebook_head(str(path))
+    assert get_notebook_metadata(str(path))['title'] == 'Reordered'
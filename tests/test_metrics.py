@@ -0,0 +1,60 @@
+# tests/test_metrics.py
+import shutil
+from app.services.metrics import MetricsRegistry
+from app.config import ProductionConfig
+
+def test_registry_renders_prometheus_text():
+    """Counters and histograms use the Prometheus text exposition format."""
+    registry = MetricsRegistry()
+    requests = registry.counter('demo_requests_total', 'Requests.')
+    latency = registry.histogram('demo_seconds', 'Latency.', buckets=(0.1, 1.0))
+    requests.inc(endpoint='main.index', status=200)
+    requests.inc(2, endpoint='main.index', status=200)
+    latency.observe(0.5, stage='convert')
+    registry.add_collector(lambda: [('demo_entries', 'gauge', 'Entries.', {'cache': 'a"b'}, 3)])
+
+    text = registry.render()
+    assert '# TYPE demo_requests_total counter' in text
+    assert 'demo_requests_total{endpoint="main.index",status="200"} 3' in text
+    assert 'demo_seconds_bucket{stage="convert",le="0.1"} 0' in text
+    assert 'demo_seconds_bucket{stage="convert",le="1.0"} 1' in text
+    assert 'demo_seconds_bucket{stage="convert",le="+Inf"} 1' in text
+    assert 'demo_seconds_sum{stage="convert"} 0.5' in text
+    assert 'demo_seconds_count{stage="convert"} 1' in text
+    assert 'demo_entries{cache="a\\"b"} 3' in text
+
+def test_page_view_is_instrumented(client):
+    """Page views are timed in Server-Timing and counted on /metrics."""
+    response = client.get('/notes/test_notebook')
+    assert response.status_code == 200
+    assert 'total;dur=' in response.headers['Server-Timing']
+
+    metrics = client.get('/metrics')
+    assert metrics.status_code == 200
+    assert metrics.headers['Content-Type'].startswith('text/plain; version=0.0.4')
+    text = metrics.get_data(as_text=True)
+    assert 'python_notes_requests_total{endpoint="main.view_notebook",status="200"}' in text
+    assert 'python_notes_render_cache_lookups_total{result="misses"}' in text
+    assert 'python_notes_stage_seconds_bucket{stage="template"' in text
+
+def test_cold_render_stages_in_server_timing(app, client, tmp_path):
+    """A conversion shows up as read, convert and template stages."""
+    shutil.copy(app.config['NOTEBOOKS_DIR'] + '/test_notebook.ipynb', tmp_path / 'timing.ipynb')
+    app.config['NOTEBOOKS_DIR'] = str(tmp_path)
+
+    response = client.get('/notes/timing')
+    stages = {entry.split(';')[0] for entry in response.headers['Server-Timing'].split(', ')}
+    assert {'read', 'convert', 'template', 'total'} <= stages
+
+def test_server_timing_disabled_in_production():
+    """Production responses do not reveal the timing breakdown."""
+    assert ProductionConfig.SERVER_TIMING is False
+
+def test_metrics_protected(app, client):
+    """Production leaves /metrics off by default, and a token keeps it from the public."""
+    assert ProductionConfig.METRICS_ENABLED is False
+
+    app.config['METRICS_TOKEN'] = 'scrape-secret'
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer scrape-secret'}).status_code == 200
@@ -0,0 +1,64 @@
+# tests/test_notebook_catalog.py
+import os
+import shutil
+import pytest
+
+from app.services.notebook_catalog import NotebookCatalog
+
+@pytest.fixture
+def notebooks_dir(test_notebook_dir, tmp_path):
+    """A private notebooks directory that tests may modify."""
+    path = tmp_path / 'notebooks'
+    shutil.copytree(test_notebook_dir, path)
+    return str(path)
+
+def test_catalog_describes_notebooks(notebooks_dir):
+    """Entries carry the title, cell counts and headings."""
+    catalog = NotebookCatalog()
+    entry = catalog.list_notebooks(notebooks_dir)[0]
+
+    assert entry['id'] == 'test_notebook'
+    assert entry['title'] == 'Test Notebook'
+    assert entry['cells'] == {'markdown': 1, 'code': 2, 'raw': 0}
+    assert entry['headings'][0]['text'] == 'Test Notebook'
+
+def test_catalog_refresh_is_incremental(notebooks_dir, tmp_path):
+    """Only added, changed or removed notebooks are reported by a refresh."""
+    catalog_path = str(tmp_path / 'catalog.json')
+    catalog = NotebookCatalog(catalog_path)
+    assert catalog.refresh(notebooks_dir) == ['test_notebook']
+    assert catalog.refresh(notebooks_dir) == []
+
+    # A fresh instance picks up the persisted catalog without re-parsing
+    assert NotebookCatalog(catalog_path).refresh(notebooks_dir) == []
+
+    shutil.copy(os.path.join(notebooks_dir, 'test_notebook.ipynb'),
+                os.path.join(notebooks_dir, 'second.ipynb'))
+    os.remove(os.path.join(notebooks_dir, 'test_notebook.ipynb'))
+    assert sorted(catalog.refresh(notebooks_dir)) == ['second', 'test_notebook']
+    assert list(catalog.entries) == ['second']
+
+def test_home_page_lists_catalog(client):
+    """The home page lists notebooks from the catalog."""
+    response = client.get('/')
+    assert response.status_code == 200
+    assert b'Test Notebook' in response.data
+
+def test_describe_skips_nbformat(notebooks_dir, monkeypatch):
+    """Entries come from the raw JSON; nbformat is only used for files laid out differently."""
+    import nbformat
+    from app.services.notebook_catalog import describe_notebook
+
+    # The fixture's keys are not in nbformat's order, so its head cannot be read directly
+    path = os.path.join(notebooks_dir, 'test_notebook.ipynb')
+    expected = describe_notebook(path)
+    written = os.path.join(notebooks_dir, 'written.ipynb')
+    with open(path, encoding='utf-8') as f:
+        nbformat.write(nbformat.read(f, as_version=4), written)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('nbformat.read should not be needed')
+    monkeypatch.setattr(nbformat, 'read', fail)
+    entry = describe_notebook(written)
+    for key in ('title', 'cells', 'headings'):
+        assert entry[key] == expected[key]
@@ -0,0 +1,135 @@
+# tests/test_notebook_service.py
+import os
+import json
+import shutil
+import pytest
+import nbformat
+
+from app.services import notebook_service
+from app.services.render_cache import RenderCache
+
+@pytest.fixture
+def notebook_path(test_notebook_dir, tmp_path):
+    """A private copy of the test notebook that tests may modify."""
+    path = tmp_path / 'test_notebook.ipynb'
+    shutil.copy(os.path.join(test_notebook_dir, 'test_notebook.ipynb'), path)
+    return str(path)
+
+def test_render_cache_hit_and_miss(app, notebook_path):
+    """A second render of an unchanged notebook is served from the cache."""
+    notebook_service.render_cache.clear()
+    before = notebook_service.get_render_cache_stats()
+
+    first, _ = notebook_service.get_notebook_html(notebook_path)
+    second, _ = notebook_service.get_notebook_html(notebook_path)
+
+    stats = notebook_service.get_render_cache_stats()
+    assert first == second
+    assert stats['misses'] == before['misses'] + 1
+    assert stats['hits'] == before['hits'] + 1
+
+def test_render_cache_invalidated_on_change(app, notebook_path):
+    """Editing the notebook source produces a fresh render."""
+    first, _ = notebook_service.get_notebook_html(notebook_path)
+
+    with open(notebook_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    with open(notebook_path, 'w', encoding='utf-8') as f:
+        f.write(content.replace('Hello, world!', 'Hello, cache!'))
+
+    second, _ = notebook_service.get_notebook_html(notebook_path)
+    assert 'Hello, cache!' in second
+    assert first != second
+
+def test_render_cache_disk_tier(notebook_path, tmp_path):
+    """Entries written by one cache instance are readable by a fresh one."""
+    cache_dir = str(tmp_path / 'render')
+    key = RenderCache(cache_dir=cache_dir).make_key(notebook_path, 'fp')
+    RenderCache(cache_dir=cache_dir).set(key, '<p>hi</p>', {'outputs': {'a.png': b'\x89PNG'}})
+
+    fresh = RenderCache(cache_dir=cache_dir)
+    html_content, resources = fresh.get(key)
+    assert html_content == '<p>hi</p>'
+    assert resources['outputs'] == {'a.png': b'\x89PNG'}
+    assert fresh.stats()['shared_hits'] == 1
+
+def test_rendering_uses_configured_exporter(app, notebook_path):
+    """Rendered output honours the pool's prompt-exclusion settings."""
+    pool = notebook_service.get_exporter_pool()
+    assert pool.available() == pool.size
+
+    html_content, _ = notebook_service.render_notebook_html(notebook_path)
+    assert 'class="input_area"' in html_content
+    assert 'class="prompt input_prompt"' not in html_content
+    assert pool.available() == pool.size
+
+def test_outputs_are_content_addressed(app, client):
+    """Extracted outputs get digest names, are written once and served immutable."""
+    store = notebook_service.output_store
+    html_content, resources = notebook_service.address_outputs(
+        '<img src="output_1_0.png">', {'outputs': {'output_1_0.png': b'fake png bytes'}}
+    )
+    (name, data), = resources['outputs'].items()
+    assert name == store.content_name('output_1_0.png', b'fake png bytes')
+    assert f'src="{notebook_service.OUTPUTS_URL}{name}"' in html_content
+
+    path = os.path.join(store.directory, name)
+    if os.path.exists(path):
+        os.remove(path)
+    writes = store.writes
+    store.publish(resources['outputs'])
+    store.publish(resources['outputs'])
+    assert store.writes == writes + 1
+
+    response = client.get(f'{notebook_service.OUTPUTS_URL}{name}')
+    assert response.data == b'fake png bytes'
+    assert 'immutable' in response.headers['Cache-Control']
+
+def read_manifest(html_content):
+    start = html_content.index('<script type="application/json" id="cell-manifest">')
+    body = html_content[html_content.index('>', start) + 1:html_content.index('</script>', start)]
+    return json.loads(body)
+
+def test_cells_marked_and_listed_in_manifest(app, notebook_path):
+    """Cells carry their index in the file, and code cells are listed with their source."""
+    html_content, _ = notebook_service.render_notebook_html(notebook_path)
+
+    # The title cell is dropped from the page but keeps its index
+    assert 'id="cell-0"' not in html_content
+    assert 'data-cell-index="1" data-cell-type="code" data-language="python" id="cell-1"' in html_content
+    assert 'id="cell-2"' in html_content
+
+    manifest = read_manifest(html_content)
+    assert [entry['index'] for entry in manifest] == [1, 2]
+    assert manifest[0] == {
+        'index': 1,
+        'language': 'python',
+        'source': "# This is a test code cell\nprint('Hello, world!')",
+    }
+    assert html_content.index('id="cell-2"') < html_content.index('id="cell-manifest"')
+
+def test_cell_language_from_magics():
+    """Cell magics name the language; line magics and shell escapes need IPython."""
+    assert notebook_service.cell_language('print(1)', 'python') == 'python'
+    assert notebook_service.cell_language('%%bash\nls', 'python') == 'bash'
+    assert notebook_service.cell_language('x = 1\n%timeit x + 1', 'python') == 'ipython'
+    assert notebook_service.cell_language('!pip install numpy', 'python') == 'ipython'
+    assert notebook_service.cell_language('x = "100%"', 'python') == 'python'
+
+def test_cell_manifest_cannot_close_script():
+    """Sources containing a closing script tag stay inside the JSON."""
+    notebook = nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell('s = "</script><b>"')])
+    notebook_service.mark_cells(notebook)
+
+    html_content = notebook_service.cell_manifest_html(notebook)
+    assert html_content.count('</script>') == 1
+    assert read_manifest(html_content)[0]['source'] == 's = "</script><b>"'
+
+def test_split_sections_round_trip(app, notebook_path):
+    """Splitting a render and joining the pieces gives the render back."""
+    html_content, _ = notebook_service.render_notebook_html(notebook_path)
+
+    head, sections, tail = notebook_service.split_sections(html_content)
+    assert len(sections) == 1
+    assert tail.startswith('<script type="application/json" id="cell-manifest">')
+    assert head + ''.join(sections) + tail == html_content
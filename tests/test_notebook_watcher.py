@@ -0,0 +1,100 @@
+# tests/test_notebook_watcher.py
+import os
+import shutil
+import time
+from app.routes import main
+from app.services.admission import RenderRejected
+from app.services.notebook_watcher import NotebookWatcher
+
+def test_scan_prerenders_changed_notebooks(app, client, monkeypatch, test_notebook_dir, tmp_path):
+    """Added and modified notebooks are rendered before anyone asks for them."""
+    notebooks_dir = str(tmp_path)
+    shutil.copy(os.path.join(test_notebook_dir, 'test_notebook.ipynb'), notebooks_dir)
+    app.config['NOTEBOOKS_DIR'] = notebooks_dir
+
+    watcher = NotebookWatcher(app, main.prerender_notebook_page)
+    assert watcher.scan() == ['test_notebook']
+    assert watcher.rendered == 1
+
+    # The page is now served without converting anything
+    def fail(notebook_path):
+        raise AssertionError('notebook should have been pre-rendered')
+    monkeypatch.setattr(main, 'get_notebook_html', fail)
+    response = client.get('/notes/test_notebook')
+    assert response.status_code == 200
+    assert b'Hello, world!' in response.data
+    monkeypatch.undo()
+
+    # Nothing changed, nothing rendered
+    assert watcher.scan() == []
+
+    path = os.path.join(notebooks_dir, 'test_notebook.ipynb')
+    with open(path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(source.replace('Hello, world!', 'Hello, watcher!'))
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+    # A request refreshing the catalog first must not hide the change from the watcher
+    client.get('/')
+    assert watcher.scan() == ['test_notebook']
+    assert watcher.rendered == 2
+
+    os.remove(path)
+    assert watcher.scan() == ['test_notebook']
+
+def test_watcher_thread_picks_up_new_notebooks(app, test_notebook_dir, tmp_path):
+    """The background thread notices a notebook added after it started."""
+    app.config['NOTEBOOKS_DIR'] = str(tmp_path)
+    rendered = []
+
+    watcher = NotebookWatcher(app, rendered.append, poll_interval=0.05, debounce=0.01)
+    watcher.start()
+    try:
+        shutil.copy(os.path.join(test_notebook_dir, 'test_notebook.ipynb'), str(tmp_path))
+        deadline = time.time() + 5
+        while not rendered and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        watcher.stop()
+
+    assert rendered == ['test_notebook']
+
+def test_rejected_prerender_retried(app, test_notebook_dir, tmp_path):
+    """A notebook turned away by a full render queue is tried again on the next scan."""
+    shutil.copy(os.path.join(test_notebook_dir, 'test_notebook.ipynb'), str(tmp_path))
+    app.config['NOTEBOOKS_DIR'] = str(tmp_path)
+    attempts = []
+
+    def prerender(notebook_id):
+        attempts.append(notebook_id)
+        if len(attempts) == 1:
+            raise RenderRejected('full')
+
+    watcher = NotebookWatcher(app, prerender)
+    assert watcher.scan() == ['test_notebook']
+    assert watcher.errors == 0 and watcher.rendered == 0
+    assert watcher.scan() == ['test_notebook']
+    assert watcher.rendered == 1
+    assert watcher.scan() == []
+
+def test_broken_notebook_tried_once_per_version(app, test_notebook_dir, tmp_path):
+    """A notebook that fails to render is not converted again until it changes."""
+    path = os.path.join(str(tmp_path), 'bad.ipynb')
+    shutil.copy(os.path.join(test_notebook_dir, 'test_notebook.ipynb'), path)
+    app.config['NOTEBOOKS_DIR'] = str(tmp_path)
+
+    def prerender(notebook_id):
+        raise ValueError('broken notebook')
+
+    watcher = NotebookWatcher(app, prerender)
+    assert watcher.scan() == ['bad']
+    assert watcher.scan() == []
+    assert watcher.scan() == []
+    assert watcher.errors == 1
+
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert watcher.scan() == ['bad']
+    assert watcher.errors == 2
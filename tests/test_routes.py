@@ -0,0 +1,282 @@
+# tests/test_routes.py
+import os
+from app.routes import main
+
+def test_view_notebook_sets_validators(client):
+    """Notebook pages carry a strong ETag and Last-Modified."""
+    response = client.get('/notes/test_notebook')
+    assert response.status_code == 200
+    assert b'Hello, world!' in response.data
+    assert response.headers['ETag'].startswith('"')
+    assert 'Last-Modified' in response.headers
+    assert 'no-cache' in response.headers['Cache-Control']
+
+def test_view_notebook_not_modified(client, monkeypatch):
+    """A matching If-None-Match is answered with 304 without rendering."""
+    etag = client.get('/notes/test_notebook').headers['ETag']
+
+    def fail(notebook_path):
+        raise AssertionError('notebook should not be rendered')
+    monkeypatch.setattr(main, 'get_notebook_html', fail)
+
+    response = client.get('/notes/test_notebook', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+
+def test_view_notebook_if_modified_since(client):
+    """If-Modified-Since at or after the source mtime is answered with 304."""
+    last_modified = client.get('/notes/test_notebook').headers['Last-Modified']
+    response = client.get('/notes/test_notebook', headers={'If-Modified-Since': last_modified})
+    assert response.status_code == 304
+
+    response = client.get('/notes/test_notebook', headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+
+def test_view_notebook_gzip_variant(client, monkeypatch):
+    """Compressed pages get their own ETag and are compressed only once."""
+    import gzip
+    from app.services import compression
+
+    response = client.get('/notes/test_notebook', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.headers['ETag'].endswith('-gzip"')
+    assert b'Hello, world!' in gzip.decompress(response.data)
+
+    def fail(data, encoding):
+        raise AssertionError('page should not be compressed again')
+    monkeypatch.setattr(compression, 'compress', fail)
+
+    again = client.get('/notes/test_notebook', headers={'Accept-Encoding': 'gzip'})
+    assert again.data == response.data
+
+def test_static_served_by_whitenoise(client):
+    """Static assets come from WhiteNoise with cache headers."""
+    response = client.get('/static/css/style.css')
+    assert response.status_code == 200
+    assert 'max-age' in response.headers['Cache-Control']
+
+def test_view_notebook_streams_cells(app, client):
+    """Above the size threshold a cold page is streamed, then served whole."""
+    from app.services import compression
+
+    app.config['STREAM_NOTEBOOK_MIN_SIZE'] = 0
+    compression.page_variants = compression.VariantCache()
+
+    # Streamed responses have no Content-Length
+    response = client.get('/notes/test_notebook')
+    assert 'Content-Length' not in response.headers
+    body = response.get_data()
+    assert b'notebook-container' in body
+    assert b'Hello, world!' in body and b'The sum is' in body
+    assert b'id="cell-manifest"' in body and b'data-cell-index="2"' in body
+    assert body.rstrip().endswith(b'</html>')
+
+    again = client.get('/notes/test_notebook')
+    assert int(again.headers['Content-Length']) == len(body)
+    assert again.get_data() == body
+
+def test_rendered_notebook_not_streamed(app, client, monkeypatch):
+    """A streamed render is kept in the render cache, and a cached render is served whole."""
+    from app.services import compression, notebook_service
+
+    app.config['STREAM_NOTEBOOK_MIN_SIZE'] = 0
+    compression.page_variants = compression.VariantCache()
+    streamed = client.get('/notes/test_notebook')
+    assert 'Content-Length' not in streamed.headers
+    body = streamed.get_data()
+
+    # With the page itself gone, the notebook HTML is still there to build it from
+    compression.page_variants = compression.VariantCache()
+    def fail(*args, **kwargs):
+        raise AssertionError('notebook should not be converted again')
+    monkeypatch.setattr(notebook_service, 'render_cell_html', fail)
+    monkeypatch.setattr(notebook_service, 'render_notebook_html', fail)
+
+    response = client.get('/notes/test_notebook')
+    assert 'Content-Length' in response.headers
+    assert response.get_data() == body
+
+def test_view_notebook_served_from_page_file(app, client, tmp_path):
+    """Materialized pages are sent from disk, one file per version and encoding."""
+    import gzip
+    from app.services import compression
+
+    compression.page_variants = compression.PageFileCache(str(tmp_path))
+
+    first = client.get('/notes/test_notebook')
+    assert first.status_code == 200
+    assert b'Hello, world!' in first.get_data()
+    assert sorted(os.listdir(tmp_path)) == [first.headers['ETag'].strip('"') + '.html']
+
+    again = client.get('/notes/test_notebook')
+    assert again.get_data() == first.get_data()
+    assert int(again.headers['Content-Length']) == len(first.get_data())
+    assert again.headers['Cache-Control'] == 'no-cache'
+
+    compressed = client.get('/notes/test_notebook', headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(compressed.get_data()) == first.get_data()
+    assert len(os.listdir(tmp_path)) == 2
+
+    # The body is handed to the server as a file, not read into a string
+    with app.test_request_context('/notes/test_notebook'):
+        response = main.cached_page_response(first.headers['ETag'].strip('"'), None)
+        assert response.direct_passthrough
+        response.close()
+
+def test_view_notebook_sendfile_headers(app, client, tmp_path):
+    """With SENDFILE_HEADER set, the front proxy is told which file to send."""
+    from app.services import compression
+
+    compression.page_variants = compression.PageFileCache(str(tmp_path))
+    app.config['SENDFILE_HEADER'] = 'X-Accel-Redirect'
+
+    response = client.get('/notes/test_notebook')
+    version = response.headers['ETag'].strip('"')
+    assert response.headers['X-Accel-Redirect'] == f'/_pages/{version}.html'
+    assert response.get_data() == b''
+
+    app.config['SENDFILE_HEADER'] = 'X-Sendfile'
+    response = client.get('/notes/test_notebook')
+    assert response.headers['X-Sendfile'] == os.path.join(str(tmp_path), f'{version}.html')
+
+def test_page_file_cache_prunes_oldest(tmp_path):
+    from app.services.compression import PageFileCache
+
+    cache = PageFileCache(str(tmp_path), max_entries=2)
+    for n in range(3):
+        cache.put(f'v{n}', b'page %d' % n)
+        os.utime(tmp_path / f'v{n}.html', (n, n))
+    cache.put('v3', b'page 3')
+    assert not cache.has('v0') and not cache.has('v1')
+    assert cache.get('v3') == b'page 3'
+
+def test_pyodide_loaded_by_worker_on_demand(client):
+    """Notebook pages no longer load Pyodide themselves; the runner points the worker at it."""
+    html = client.get('/notes/test_notebook').get_data(as_text=True)
+    assert 'js/python-runner.js' in html
+    assert 'data-worker="/static/js/python-worker.js"' in html
+    assert 'data-pyodide="https://cdn.jsdelivr.net/pyodide/v0.24.1/full/"' in html
+    assert 'pyodide.js"></script>' not in html
+
+def test_pyodide_served_locally_when_installed(app, client, tmp_path):
+    """A runtime fetched into static/pyodide/ is preferred and cached forever."""
+    import re
+    runtime_dir = tmp_path / 'pyodide' / 'v0.24.1'
+    runtime_dir.mkdir(parents=True)
+    (runtime_dir / 'pyodide.js').write_text('// runtime')
+    app.static_folder = str(tmp_path)
+
+    html = client.get('/notes/test_notebook').get_data(as_text=True)
+    assert 'data-pyodide="/static/pyodide/v0.24.1/"' in html
+    assert re.search(app.config['STATIC_IMMUTABLE_PATTERN'], '/static/pyodide/v0.24.1/pyodide.asm.wasm')
+    assert not re.search(app.config['STATIC_IMMUTABLE_PATTERN'], '/static/js/python-worker.js')
+
+def write_sectioned_notebook(directory):
+    import nbformat
+    notebook = nbformat.v4.new_notebook(cells=[
+        nbformat.v4.new_markdown_cell('# Long Unit'),
+        nbformat.v4.new_markdown_cell('Introduction.'),
+        nbformat.v4.new_markdown_cell('## Loops\n\nRepeating things.'),
+        nbformat.v4.new_code_cell("print('in loops')"),
+        nbformat.v4.new_markdown_cell('### Nested loops stay in their section'),
+        nbformat.v4.new_markdown_cell('## Functions'),
+        nbformat.v4.new_code_cell("print('in functions')"),
+    ])
+    with open(os.path.join(directory, 'long_unit.ipynb'), 'w', encoding='utf-8') as f:
+        nbformat.write(notebook, f)
+
+def test_long_notebook_split_into_sections(app, client, tmp_path):
+    """Above the split size the page carries the first section and placeholders for the rest."""
+    write_sectioned_notebook(str(tmp_path))
+    app.config['NOTEBOOKS_DIR'] = str(tmp_path)
+    app.config['SECTION_SPLIT_MIN_SIZE'] = 0
+
+    html = client.get('/notes/long_unit').get_data(as_text=True)
+    cells, manifest = html.split('id="cell-manifest"')
+    assert 'Introduction.' in cells
+    assert 'in loops' not in cells and 'in functions' not in cells
+    assert 'data-src="/notes/long_unit/section/1"' in cells
+    assert 'data-src="/notes/long_unit/section/2"' in cells
+    assert 'data-src="/notes/long_unit/section/3"' not in cells
+    # The manifest still lists every code cell
+    assert 'in loops' in manifest and 'in functions' in manifest
+
+    first = client.get('/notes/long_unit/section/1')
+    assert first.status_code == 200
+    assert 'in loops' in first.get_data(as_text=True)
+    assert 'Nested loops' in first.get_data(as_text=True)
+    assert 'in functions' not in first.get_data(as_text=True)
+    assert client.get('/notes/long_unit/section/3').status_code == 404
+
+    # The whole notebook is still one click away
+    full = client.get('/notes/long_unit?full=1').get_data(as_text=True)
+    assert 'in loops' in full and 'in functions' in full
+
+def test_streaming_can_be_disabled(app, client, monkeypatch):
+    """An empty STREAM_NOTEBOOK_MIN_SIZE turns streaming off."""
+    from app.config import optional_int
+
+    monkeypatch.setenv('STREAM_NOTEBOOK_MIN_SIZE', '')
+    assert optional_int('STREAM_NOTEBOOK_MIN_SIZE', 32 * 1024) is None
+    monkeypatch.delenv('STREAM_NOTEBOOK_MIN_SIZE')
+    assert optional_int('STREAM_NOTEBOOK_MIN_SIZE', 32 * 1024) == 32 * 1024
+
+    app.config['STREAM_NOTEBOOK_MIN_SIZE'] = None
+    response = client.get('/notes/test_notebook')
+    assert 'Content-Length' in response.headers
+    assert b'Hello, world!' in response.get_data()
+
+def test_section_split_can_be_disabled(app, client, tmp_path, monkeypatch):
+    """An empty SECTION_SPLIT_MIN_SIZE serves long notebooks whole."""
+    from app.config import optional_int
+
+    monkeypatch.setenv('SECTION_SPLIT_MIN_SIZE', ' ')
+    assert optional_int('SECTION_SPLIT_MIN_SIZE', 256 * 1024) is None
+
+    write_sectioned_notebook(str(tmp_path))
+    app.config['NOTEBOOKS_DIR'] = str(tmp_path)
+    app.config['SECTION_SPLIT_MIN_SIZE'] = None
+    html = client.get('/notes/long_unit').get_data(as_text=True)
+    assert 'in loops' in html and 'in functions' in html
+    assert 'data-src="/notes/long_unit/section/1"' not in html
+
+def test_notebook_section_validators(app, client, tmp_path, monkeypatch):
+    """Sections have their own ETags and are served from their own cache entries."""
+    write_sectioned_notebook(str(tmp_path))
+    app.config['NOTEBOOKS_DIR'] = str(tmp_path)
+
+    first = client.get('/notes/long_unit/section/1')
+    second = client.get('/notes/long_unit/section/2')
+    assert first.headers['ETag'] != second.headers['ETag']
+
+    def fail(notebook_path):
+        raise AssertionError('section should be served from the cache')
+    monkeypatch.setattr(main, 'get_notebook_html', fail)
+
+    response = client.get('/notes/long_unit/section/2', headers={'If-None-Match': second.headers['ETag']})
+    assert response.status_code == 304
+    assert client.get('/notes/long_unit/section/2').data == second.data
+
+def test_precompress_files_skips_handled_files(tmp_path, monkeypatch):
+    """Only changed files are compressed again, including those that did not compress well."""
+    from app.services import compression
+    (tmp_path / 'style.css').write_text('body { color: red; }\n' * 200)
+    (tmp_path / 'noise.js').write_bytes(os.urandom(4096))
+    (tmp_path / 'numpy.whl').write_bytes(b'PK' * 1000)
+
+    assert compression.precompress_files(str(tmp_path)) == 2
+    assert (tmp_path / 'style.css.gz').exists()
+    assert not (tmp_path / 'noise.js.gz').exists()
+    assert not list(tmp_path.glob('.tmp-*'))
+
+    compressed = []
+    monkeypatch.setattr(compression.AtomicCompressor, 'compress', lambda self, path: compressed.append(path))
+    assert compression.precompress_files(str(tmp_path)) == 0
+
+    (tmp_path / 'style.css').write_text('body { color: blue; }\n' * 200)
+    assert compression.precompress_files(str(tmp_path)) == 1
+    assert compressed == [str(tmp_path / 'style.css')]
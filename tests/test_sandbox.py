@@ -0,0 +1,158 @@
+# tests/test_sandbox.py
+import time
+import pytest
+
+from app import create_app
+from app.config import TestingConfig
+from app.services import sandbox
+from app.services.sandbox import SandboxPool
+
+@pytest.fixture(scope='module')
+def pool():
+    pool = SandboxPool(size=1, cpu_seconds=1, memory_mb=128, timeout=2, idle_seconds=60)
+    yield pool
+    pool.shutdown()
+
+@pytest.fixture
+def sandbox_app(app):
+    app.config['SANDBOX_ENABLED'] = True
+    app.config['SANDBOX_PROCESSES'] = 1
+    sandbox.init_sandbox(app)
+    yield app
+    if sandbox.sandbox_pool is not None:
+        sandbox.sandbox_pool.shutdown()
+    sandbox.sandbox_pool = sandbox.sandbox_settings = None
+
+def test_sessions_keep_their_namespace(pool):
+    """Output is captured, the last expression is the result, and each session has its own names."""
+    reply = pool.run('session-a', 'x = 21\nprint("doubling")\nx * 2')
+    assert reply['stdout'] == 'doubling\n'
+    assert reply['result'] == '42'
+    assert reply['error'] is None and reply['new_session']
+
+    assert pool.run('session-a', 'x + 1')['result'] == '22'
+    error = pool.run('session-b', 'x')['error']
+    assert error['name'] == 'NameError'
+    assert 'File "<cell>", line 1' in error['traceback']
+
+def test_cpu_memory_and_network_limits(pool):
+    assert pool.run('limits', 'while True: pass')['error']['message'] == 'CPU time limit of 1s exceeded'
+    assert pool.run('limits', 'data = bytearray(512 * 1024 * 1024)')['error']['name'] == 'MemoryError'
+    reply = pool.run('limits', 'import socket\nsocket.create_connection(("example.com", 80))')
+    assert reply['error']['name'] == 'PermissionError'
+    assert pool.run('limits', 'print("x" * 100000)')['truncated']
+
+def test_sessions_share_no_memory(pool):
+    """Sessions run in separate processes: another session's objects cannot be reached."""
+    pool.run('owner', 'secret = "s3cr3t-value"')
+    reply = pool.run('snoop', 'import gc\n[o for o in gc.get_objects() if o == "s3cr3t-value"]')
+    assert reply['error']['name'] == 'PermissionError'
+    assert pool.run('snoop', 'import sys\n"app" in sys.modules or "flask" in sys.modules')['result'] == 'False'
+
+def test_sandbox_guard(pool):
+    """Raw sockets, child processes, and files outside the working directory are refused."""
+    refused = [
+        'import _socket\n_socket.socket()',
+        'import subprocess\nsubprocess.run(["id"])',
+        'import os\nos.system("id")',
+        'open("/tmp/python-notes-escape.txt", "w")',
+        f'open({sandbox.PROJECT_ROOT + "/app/config.py"!r}).read()',
+        f'import os\nos.listdir({sandbox.SCRATCH_ROOT!r})',
+        'import os\nopen(f"/proc/{os.getppid()}/environ").read()',
+        # Shared memory and named semaphores are files in /dev/shm, created without an open event
+        'import os, _posixshmem\n_posixshmem.shm_open("/python-notes-escape", os.O_CREAT | os.O_RDWR)',
+        'from multiprocessing import shared_memory\nshared_memory.SharedMemory(create=True, size=16)',
+        'import multiprocessing\nmultiprocessing.Lock()',
+    ]
+    for code in refused:
+        assert pool.run('guard', code)['error']['name'] == 'PermissionError', code
+
+    assert pool.run('guard', 'import multiprocessing.connection as c\nhasattr(c, "_multiprocessing")')['result'] == 'False'
+    assert pool.run('guard', 'import os\nsorted(os.environ)')['result'] == "['HOME', 'LANG', 'MPLCONFIGDIR', 'PATH', 'TMPDIR']"
+    assert pool.run('guard', 'open("notes.txt", "w").close()\nimport os\nos.listdir()')['result'] == "['notes.txt']"
+
+def test_wall_clock_timeout_replaces_process(pool):
+    """A cell that blocks past the timeout gets its process replaced and its session reset."""
+    pool.run('sleepy', 'kept = True')
+    reply = pool.run('sleepy', 'import time\ntime.sleep(30)')
+    assert reply['error']['name'] == 'TimeoutError'
+    assert pool.stats()['restarts'] == 1
+
+    reply = pool.run('sleepy', 'kept')
+    assert reply['new_session'] and reply['error']['name'] == 'NameError'
+
+def test_broken_process_replaced(pool):
+    """A cell that breaks its own process, or writes to the pipe, gets a fresh process rather than a 500."""
+    reply = pool.run('broken', 'import builtins\nbuiltins.len = None')
+    assert reply['error']['name'] == 'SandboxError' and reply['new_session']
+    assert pool.run('broken', 'len("abc")')['result'] == '3'
+
+    reply = pool.run('broken', 'import os, sys, struct\nos.write(int(sys.argv[1]), struct.pack("!i", 5) + b"hello")')
+    assert reply['error']['message'].startswith('The Python process sent a reply that could not be read')
+    assert pool.run('broken', '1')['result'] == '1'
+
+def test_process_that_dies_at_startup(monkeypatch, tmp_path):
+    """Processes that fail to start turn runs away as busy; the pool itself still starts."""
+    worker = tmp_path / 'worker.py'
+    worker.write_text('import sys\nsys.exit(1)\n')
+    monkeypatch.setattr(sandbox, 'WORKER_PATH', str(worker))
+    pool = SandboxPool(size=1, timeout=2)
+    try:
+        assert pool.stats()['processes'] == 0
+        with pytest.raises(sandbox.SandboxBusy):
+            pool.run('session', '1')
+    finally:
+        pool.shutdown()
+
+def test_idle_sessions_evicted():
+    pool = SandboxPool(size=1, timeout=2, idle_seconds=0.2)
+    try:
+        pool.run('idle', 'x = 1')
+        time.sleep(0.3)
+        assert pool.run('idle', 'x')['error']['name'] == 'NameError'
+    finally:
+        pool.shutdown()
+
+def test_run_api_disabled(client):
+    assert client.post('/api/run', json={'code': '1'}).status_code == 404
+
+def test_run_api(sandbox_app, client):
+    first = client.post('/api/run', json={'code': 'n = 5\nn'})
+    assert first.status_code == 200
+    assert first.json['result'] == '5'
+    assert first.headers['Cache-Control'] == 'no-store'
+
+    session = first.json['session']
+    assert client.post('/api/run', json={'code': 'n + 1', 'session': session}).json['result'] == '6'
+
+    client.post('/api/run/reset', json={'session': session})
+    assert client.post('/api/run', json={'code': 'n', 'session': session}).json['error']['name'] == 'NameError'
+
+    assert client.post('/api/run', data='code=1').status_code == 415
+    assert client.post('/api/run', json={'code': '1', 'session': '../x'}).status_code == 400
+    assert client.post('/api/run', json={'code': 'x' * 30000}).status_code == 413
+
+def test_run_and_reset_rate_limited(monkeypatch):
+    """Each session has its own budget for runs and resets; starting sessions counts against the address."""
+    monkeypatch.setattr(TestingConfig, 'RATELIMIT_ENABLED', True)
+    monkeypatch.setattr(TestingConfig, 'SANDBOX_ENABLED', True)
+    monkeypatch.setattr(TestingConfig, 'SANDBOX_PROCESSES', 1)
+    monkeypatch.setattr(TestingConfig, 'SANDBOX_RATE_LIMIT', '2 per minute')
+    client = create_app('testing').test_client()
+    try:
+        first = client.post('/api/run', json={'code': '1'}).json['session']
+        for _ in range(2):
+            assert client.post('/api/run', json={'code': '1', 'session': first}).status_code == 200
+        assert client.post('/api/run', json={'code': '1', 'session': first}).status_code == 429
+
+        # Another student behind the same address still has a budget of their own
+        second = client.post('/api/run', json={'code': '1'}).json['session']
+        assert client.post('/api/run', json={'code': '1', 'session': second}).status_code == 200
+        assert client.post('/api/run/reset', json={'session': second}).status_code == 200
+        # The address has started two sessions; a third, or an unknown id, is refused
+        assert client.post('/api/run', json={'code': '1'}).status_code == 429
+        assert client.post('/api/run/reset', json={'session': second}).status_code == 429
+    finally:
+        if sandbox.sandbox_pool is not None:
+            sandbox.sandbox_pool.shutdown()
+        sandbox.sandbox_pool = sandbox.sandbox_settings = None
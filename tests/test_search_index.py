@@ -0,0 +1,79 @@
+# tests/test_search_index.py
+import os
+import nbformat
+from app.services.notebook_catalog import NotebookCatalog
+from app.services.search_index import SearchIndex, highlight
+
+def write_notebook(path, cells):
+    notebook = nbformat.v4.new_notebook(cells=cells)
+    with open(path, 'w', encoding='utf-8') as f:
+        nbformat.write(notebook, f)
+
+def build_dir(tmp_path):
+    write_notebook(tmp_path / 'loops.ipynb', [
+        nbformat.v4.new_markdown_cell('# Loops\n\nA list comprehension builds a list in one line.'),
+        nbformat.v4.new_code_cell('squares = [x * x for x in range(10)]'),
+    ])
+    write_notebook(tmp_path / 'lists.ipynb', [
+        nbformat.v4.new_markdown_cell('# Lists\n\nA list holds values. Comprehension is covered later.'),
+        nbformat.v4.new_code_cell('values = [1, 2, 3]'),
+    ])
+    write_notebook(tmp_path / 'strings.ipynb', [
+        nbformat.v4.new_markdown_cell('# Strings\n\nText <b>values</b>.'),
+    ])
+    return str(tmp_path)
+
+def test_search_ranks_phrases_first(tmp_path):
+    """Every term must match, and phrase matches rank above scattered terms."""
+    notebooks_dir = build_dir(tmp_path)
+    index = SearchIndex()
+    index.update(NotebookCatalog().list_notebooks(notebooks_dir))
+
+    results = index.search('List Comprehension')
+    assert [r['id'] for r in results] == ['loops', 'lists']
+    assert results[0]['snippets'][0]['cell'] == 0
+    assert '<mark>list</mark> <mark>comprehension</mark>' in results[0]['snippets'][0]['html']
+
+    assert index.search('comprehension strings') == []
+    assert index.search('  ') == []
+    assert [r['id'] for r in index.search('range')] == ['loops']
+
+def test_search_index_updates_incrementally(tmp_path):
+    """Only changed notebooks are parsed again; removed ones drop out."""
+    notebooks_dir = build_dir(tmp_path)
+    catalog = NotebookCatalog()
+    index = SearchIndex(str(tmp_path / 'index' / 'search.json'))
+
+    assert index.update(catalog.list_notebooks(notebooks_dir)) == ['lists', 'loops', 'strings']
+    assert index.update(catalog.list_notebooks(notebooks_dir)) == []
+
+    write_notebook(tmp_path / 'strings.ipynb', [nbformat.v4.new_markdown_cell('# Strings\n\nSlicing text.')])
+    st = os.stat(tmp_path / 'strings.ipynb')
+    os.utime(tmp_path / 'strings.ipynb', ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    os.remove(tmp_path / 'lists.ipynb')
+
+    assert index.update(catalog.list_notebooks(notebooks_dir)) == ['strings', 'lists']
+    assert [r['id'] for r in index.search('slicing')] == ['strings']
+    assert [r['id'] for r in index.search('values')] == []
+
+    # The persisted copy is loaded as is, without parsing any notebook
+    reloaded = SearchIndex(index.index_path)
+    assert reloaded.stats() == index.stats()
+    assert reloaded.update(catalog.list_notebooks(notebooks_dir)) == []
+
+def test_highlight_escapes_text():
+    """Snippets escape notebook text and only mark whole matching words."""
+    html = highlight('Text <b>values</b> and value', {'values'})
+    assert html == 'Text &lt;b&gt;<mark>values</mark>&lt;/b&gt; and value'
+
+def test_search_route(client):
+    """The search page lists matching notebooks with highlighted snippets."""
+    response = client.get('/search?q=hello')
+    assert response.status_code == 200
+    assert b'Test Notebook' in response.data
+    assert b'<mark>Hello</mark>' in response.data
+    # Snippets link to their cell, which the page scrolls to
+    assert b'href="/notes/test_notebook#cell-1"' in response.data
+
+    response = client.get('/search?q=nowhere')
+    assert b'No lessons match' in response.data
@@ -0,0 +1,119 @@
+# tests/test_single_flight.py
+import threading
+import time
+import pytest
+
+from app.services import notebook_service
+from app.services.single_flight import SingleFlight, SingleFlightTimeout
+
+def run_concurrently(count, target):
+    """Start count threads on target at once and wait for all of them."""
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_calls_share_one_execution():
+    """Overlapping calls for a key run once and all get the result."""
+    flights = SingleFlight()
+    runs = []
+
+    def render():
+        runs.append(1)
+        time.sleep(0.2)
+        return 'html'
+
+    results = run_concurrently(8, lambda: flights.do('key', render))
+    assert results == ['html'] * 8
+    assert len(runs) == 1
+    stats = flights.stats()
+    assert stats['executions'] == 1
+    assert stats['coalesced'] == 7
+    assert stats['in_flight'] == 0
+
+    # Nothing is cached once the call is over
+    assert flights.do('key', render) == 'html'
+    assert len(runs) == 2
+
+def test_errors_propagate_to_waiters():
+    """Every caller waiting on a failed execution sees its exception."""
+    flights = SingleFlight()
+
+    def render():
+        time.sleep(0.2)
+        raise ValueError('broken notebook')
+
+    results = run_concurrently(4, lambda: flights.do('key', render))
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flights.stats()['errors'] == 1
+
+def test_waiters_time_out():
+    """A waiter gives up after the timeout without stopping the running call."""
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def render():
+        started.set()
+        release.wait(5)
+        return 'html'
+
+    leader = threading.Thread(target=flights.do, args=('key', render))
+    leader.start()
+    started.wait(5)
+    with pytest.raises(SingleFlightTimeout):
+        flights.do('key', render, timeout=0.05)
+    release.set()
+    leader.join()
+    assert flights.stats()['timeouts'] == 1
+
+def test_concurrent_page_views_render_once(app, client, monkeypatch):
+    """Simultaneous cold requests for a notebook trigger a single conversion."""
+    notebook_service.render_cache.clear()
+    render = notebook_service.render_notebook_html
+    renders = []
+
+    def slow_render(notebook_path):
+        renders.append(notebook_path)
+        time.sleep(0.2)
+        return render(notebook_path)
+    monkeypatch.setattr(notebook_service, 'render_notebook_html', slow_render)
+
+    # Change the content version so no earlier test's render can be reused
+    monkeypatch.setattr(notebook_service, 'RENDER_VERSION', -14)
+
+    before = notebook_service.get_render_flight_stats()
+    results = run_concurrently(6, lambda: app.test_client().get('/notes/test_notebook'))
+    assert all(response.status_code == 200 for response in results)
+    assert len(renders) == 1
+    after = notebook_service.get_render_flight_stats()
+    assert after['coalesced'] - before['coalesced'] >= 5
+
+def test_claimed_key_waits_for_finish():
+    """While a key is claimed, do() waits for finish() rather than running its function."""
+    flights = SingleFlight()
+    finish = flights.claim('page')
+    assert finish is not None and flights.claim('page') is None
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(flights.do('page', lambda: 'built')))
+    thread.start()
+    time.sleep(0.05)
+    assert not results
+    finish()
+    finish()
+    thread.join()
+    assert results == [None]
+    assert flights.do('page', lambda: 'built') == 'built'
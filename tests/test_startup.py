@@ -0,0 +1,49 @@
+# tests/test_startup.py
+import pytest
+
+from app.routes import main
+from app.services import notebook_service
+from app.services.warmup import init_warmup, warm_up
+from benchmarks.run_benchmarks import measure_startup, DEFERRED_PACKAGES
+
+# Seconds of imports allowed when creating the app; it takes about 0.3 s without nbconvert and over 0.6 s with it
+STARTUP_IMPORT_BUDGET = 1.0
+
+def test_create_app_defers_heavy_imports():
+    """Creating the app imports none of the rendering machinery."""
+    create_seconds, import_seconds, modules = measure_startup('testing')
+
+    loaded = sorted(name for name in modules if name.split('.')[0] in DEFERRED_PACKAGES)
+    assert loaded == [], f'imported at startup: {", ".join(loaded)}'
+    assert import_seconds < STARTUP_IMPORT_BUDGET, f'{import_seconds:.2f}s of imports ({create_seconds:.2f}s in total)'
+
+def test_exporters_built_on_first_render(app, client):
+    """Without a warmup the exporter pool is created by the first render."""
+    assert notebook_service.exporter_pool is None
+
+    assert client.get('/notes/test_notebook').status_code == 200
+    assert notebook_service.exporter_pool is not None
+
+def test_warm_up_prerenders_warm_notebooks(app, client, monkeypatch):
+    """The warmup builds the exporters and renders WARM_NOTEBOOKS before any request."""
+    app.config['WARM_NOTEBOOKS'] = 'test_notebook, missing'
+
+    assert warm_up(app, main.prerender_notebook_page) == ['test_notebook']
+    assert notebook_service.exporter_pool is not None
+
+    def fail(notebook_path):
+        raise AssertionError('notebook should have been pre-rendered')
+    monkeypatch.setattr(main, 'get_notebook_html', fail)
+    assert client.get('/notes/test_notebook').status_code == 200
+
+def test_warmup_modes(app):
+    """Background warmups run on a thread; unknown modes are rejected."""
+    app.config['WARMUP'] = 'background'
+    thread = init_warmup(app, main.prerender_notebook_page)
+    thread.join(timeout=30)
+    assert not thread.is_alive()
+    assert notebook_service.exporter_pool is not None
+
+    app.config['WARMUP'] = 'eager'
+    with pytest.raises(ValueError):
+        init_warmup(app, main.prerender_notebook_page)
@@ -2,16 +2,49 @@
 """
 Notebook Conversion Tool
 This script helps convert Jupyter notebooks to HTML for testing outside the web app.
+
+Accepts notebook files, directories and glob patterns, converts them in
+parallel and skips notebooks that are unchanged since the last run:
+    python tools/convert_notebook.py notebooks/ "extra/*.ipynb" -o out -j 4
+
+With --build it pre-renders a whole notebooks directory into a bundle the web
+app can serve without running nbconvert:
+    python tools/convert_notebook.py --build notebooks -o build/notebooks
 """
 
 import os
 import sys
+import json
+import glob
+import hashlib
+import time
+import tempfile
 import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing.util import Finalize
 import nbformat
-from nbconvert import HTMLExporter
-from traitlets.config import Config
 
-def convert_notebook(notebook_path, output_dir=None, execute=False):
+# Make the app package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.notebook_service import build_html_exporter, export_notebook, get_render_fingerprint
+from app.config import Config as AppConfig
+from app.services.compression import precompress_files
+from app.services.execution_engine import ExecutionEngine
+from app.services.exporter_pool import warm_exporter
+from app.services.notebook_catalog import describe_notebook
+from app.services.output_store import OutputStore
+from app.services.prerendered import MANIFEST_NAME, RESOURCES_DIR
+
+# Per-output-directory record of what was converted, used to skip unchanged notebooks
+RECORD_NAME = '.convert_record.json'
+
+# Exporter and (with --execute) warm kernel used by each worker process
+_worker_exporter = None
+_worker_engine = None
+
+
+def convert_notebook(notebook_path, output_dir=None, execute=False, html_exporter=None, engine=None):
     """Convert a notebook to HTML."""
     try:
         # Check if file exists
@@ -23,13 +56,24 @@ def convert_notebook(notebook_path, output_dir=None, execute=False):
         with open(notebook_path, 'r', encoding='utf-8') as f:
             notebook = nbformat.read(f, as_version=4)
         
-        # Configure the HTML exporter
-        c = Config()
-        c.HTMLExporter.exclude_input_prompt = True
-        c.HTMLExporter.exclude_output_prompt = True
-        c.HTMLExporter.template_name = 'classic'
+        # Execute it on a warm kernel, or a one-off kernel when converting a single notebook
+        if execute:
+            own_engine = engine is None
+            if own_engine:
+                engine = ExecutionEngine(pool_size=1, cell_timeout=AppConfig.CELL_TIMEOUT)
+            try:
+                notebook = engine.execute(
+                    notebook,
+                    source_digest(notebook_path),
+                    cwd=os.path.dirname(os.path.abspath(notebook_path))
+                )
+            finally:
+                if own_engine:
+                    engine.shutdown()
         
-        html_exporter = HTMLExporter(config=c)
+        # Use the same exporter settings as the web app
+        if html_exporter is None:
+            html_exporter = build_html_exporter()
         
         # Convert to HTML
         (html_content, resources) = html_exporter.from_notebook_node(notebook)
@@ -43,7 +87,7 @@ def convert_notebook(notebook_path, output_dir=None, execute=False):
             output_dir = os.path.dirname(notebook_path)
         
         if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
+            os.makedirs(output_dir, exist_ok=True)
         
         output_path = os.path.join(output_dir, f"{name_without_ext}.html")
         
@@ -58,19 +102,253 @@ def convert_notebook(notebook_path, output_dir=None, execute=False):
         print(f"Error converting notebook: {str(e)}")
         return False
 
+def find_notebooks(patterns):
+    """Expand files, directories and glob patterns into a sorted list of notebooks."""
+    found = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            found.update(glob.glob(os.path.join(pattern, '*.ipynb')))
+        elif glob.has_magic(pattern):
+            found.update(path for path in glob.glob(pattern, recursive=True) if path.endswith('.ipynb'))
+        else:
+            found.add(pattern)
+    return sorted(found)
+
+def source_digest(notebook_path):
+    """SHA-256 of a notebook file."""
+    with open(notebook_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def _init_worker(execute=False, execution_cache_dir=None):
+    """Create one pre-warmed exporter, and optionally one warm kernel, per worker process."""
+    global _worker_exporter, _worker_engine
+    _worker_exporter = warm_exporter(build_html_exporter())
+    if execute:
+        _worker_engine = ExecutionEngine(
+            pool_size=1,
+            cell_timeout=AppConfig.CELL_TIMEOUT,
+            cache_dir=execution_cache_dir
+        )
+        # atexit does not run in pool workers; multiprocessing finalizers do
+        Finalize(_worker_engine, _worker_engine.shutdown, exitpriority=10)
+
+def _convert_one(notebook_path, output_dir, execute):
+    """Convert one notebook in a worker and time it."""
+    start = time.perf_counter()
+    success = convert_notebook(notebook_path, output_dir, execute, _worker_exporter, _worker_engine)
+    if not success:
+        raise RuntimeError(f"could not convert {notebook_path}")
+    return time.perf_counter() - start
+
+def _build_one(notebook_path, output_dir):
+    """Render a single notebook into the bundle and return its manifest entry."""
+    start = time.perf_counter()
+    digest = source_digest(notebook_path)
+    
+    html_content, resources = export_notebook(notebook_path, _worker_exporter, _worker_engine)
+    # nbconvert names outputs per notebook (output_1_0.png), so they are stored by
+    # content in the shared resources directory and the page points at those names
+    html_content, outputs = OutputStore.content_address(
+        html_content, resources.get('outputs') or {}, lambda name: name
+    )
+    html_bytes = html_content.encode('utf-8')
+    
+    # Fingerprint the file name so it can be cached forever by browsers and proxies
+    notebook_id = os.path.splitext(os.path.basename(notebook_path))[0]
+    html_name = f"{notebook_id}.{hashlib.sha256(html_bytes).hexdigest()[:12]}.html"
+    _write_atomic(os.path.join(output_dir, html_name), html_bytes)
+    
+    resource_names = []
+    for filename, data in outputs.items():
+        _write_atomic(os.path.join(output_dir, RESOURCES_DIR, filename), data)
+        resource_names.append(filename)
+    
+    entry = {
+        'source': os.path.basename(notebook_path),
+        'source_sha256': digest,
+        'title': describe_notebook(notebook_path)['title'],
+        'html': html_name,
+        'resources': sorted(resource_names),
+    }
+    return notebook_id, entry, time.perf_counter() - start
+
+def _write_atomic(path, data):
+    """Write bytes to path via a temp file and rename."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def _read_json(path, default):
+    """Load a JSON file, returning default if it is missing or unreadable."""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def _run_parallel(func, jobs, workers, execute=False):
+    """Run func(*args) for each (path, args) job in a process pool.
+    
+    Yields (path, result, error) as jobs finish.
+    """
+    if not jobs:
+        return
+    initargs = (execute, AppConfig.EXECUTION_CACHE_DIR)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+        futures = {pool.submit(func, *args): path for path, args in jobs}
+        for future in as_completed(futures):
+            try:
+                yield futures[future], future.result(), None
+            except Exception as e:
+                yield futures[future], None, e
+
+def _print_summary(done, skipped, failed, started, render_seconds):
+    print(
+        f"{done} converted, {skipped} unchanged, {failed} failed "
+        f"in {time.perf_counter() - started:.2f}s ({render_seconds:.2f}s rendering)"
+    )
+
+def convert_notebooks(notebook_paths, output_dir=None, execute=False, workers=None, force=False):
+    """Convert notebooks in parallel, skipping those unchanged since the last run."""
+    started = time.perf_counter()
+    fingerprint = get_render_fingerprint(executed=execute)
+    records = {}
+    jobs = []
+    skipped = 0
+    failed = 0
+    
+    for notebook_path in notebook_paths:
+        if not os.path.exists(notebook_path):
+            print(f"Error: File not found: {notebook_path}")
+            failed += 1
+            continue
+        
+        target_dir = output_dir or os.path.dirname(notebook_path)
+        if target_dir not in records:
+            records[target_dir] = _read_json(os.path.join(target_dir, RECORD_NAME), {})
+        
+        key = os.path.abspath(notebook_path)
+        digest = source_digest(notebook_path)
+        previous = records[target_dir].get(key)
+        if (not force and previous
+                and previous['source_sha256'] == digest
+                and previous['fingerprint'] == fingerprint
+                and os.path.exists(previous['output'])):
+            skipped += 1
+            continue
+        
+        name_without_ext = os.path.splitext(os.path.basename(notebook_path))[0]
+        records[target_dir][key] = {
+            'source_sha256': digest,
+            'fingerprint': fingerprint,
+            'output': os.path.join(target_dir, f"{name_without_ext}.html"),
+        }
+        jobs.append((notebook_path, (notebook_path, target_dir, execute)))
+    
+    done = 0
+    render_seconds = 0.0
+    for notebook_path, seconds, error in _run_parallel(_convert_one, jobs, workers, execute):
+        if error is not None:
+            print(f"Error converting {notebook_path}: {str(error)}")
+            target_dir = output_dir or os.path.dirname(notebook_path)
+            records[target_dir].pop(os.path.abspath(notebook_path), None)
+            failed += 1
+            continue
+        print(f"  {seconds:6.2f}s  {notebook_path}")
+        render_seconds += seconds
+        done += 1
+    
+    for target_dir, record in records.items():
+        if os.path.isdir(target_dir):
+            _write_atomic(os.path.join(target_dir, RECORD_NAME),
+                          json.dumps(record, indent=1, sort_keys=True).encode('utf-8'))
+    
+    _print_summary(done, skipped, failed, started, render_seconds)
+    return failed == 0
+
+def build_notebooks(source_dir, output_dir, workers=None, force=False, execute=False):
+    """Pre-render every notebook in source_dir into output_dir and write a manifest.
+    
+    Notebooks whose source hash and exporter fingerprint match the previous
+    manifest are carried over without re-rendering.
+    """
+    started = time.perf_counter()
+    notebook_paths = find_notebooks([source_dir])
+    os.makedirs(os.path.join(output_dir, RESOURCES_DIR), exist_ok=True)
+    
+    fingerprint = get_render_fingerprint(executed=execute)
+    previous = _read_json(os.path.join(output_dir, MANIFEST_NAME), {})
+    if previous.get('fingerprint') != fingerprint:
+        previous = {}
+    
+    notebooks = {}
+    jobs = []
+    for notebook_path in notebook_paths:
+        notebook_id = os.path.splitext(os.path.basename(notebook_path))[0]
+        entry = previous.get('notebooks', {}).get(notebook_id)
+        if (not force and entry
+                and entry['source_sha256'] == source_digest(notebook_path)
+                and os.path.exists(os.path.join(output_dir, entry['html']))):
+            notebooks[notebook_id] = entry
+            continue
+        jobs.append((notebook_path, (notebook_path, output_dir)))
+    skipped = len(notebooks)
+    
+    failed = 0
+    render_seconds = 0.0
+    for notebook_path, result, error in _run_parallel(_build_one, jobs, workers, execute):
+        if error is not None:
+            print(f"Error converting {notebook_path}: {str(error)}")
+            failed += 1
+            continue
+        notebook_id, entry, seconds = result
+        notebooks[notebook_id] = entry
+        print(f"  {seconds:6.2f}s  {notebook_path} -> {entry['html']}")
+        render_seconds += seconds
+    
+    manifest = {'fingerprint': fingerprint, 'notebooks': notebooks}
+    manifest_bytes = json.dumps(manifest, indent=1, sort_keys=True).encode('utf-8')
+    _write_atomic(os.path.join(output_dir, MANIFEST_NAME), manifest_bytes)
+    
+    # Remove pages (and their compressed variants) left over from earlier builds
+    current = {entry['html'] for entry in notebooks.values()}
+    for html_path in glob.glob(os.path.join(output_dir, '*.html*')):
+        if os.path.basename(html_path).split('.html')[0] + '.html' not in current:
+            os.remove(html_path)
+    
+    # Precompress once here so static servers never compress per response
+    precompress_files(output_dir)
+    
+    _print_summary(len(notebooks) - skipped, skipped, failed, started, render_seconds)
+    return failed == 0
+
 def main():
     """Parse command line arguments and convert notebooks."""
     parser = argparse.ArgumentParser(description='Convert Jupyter notebooks to HTML.')
-    parser.add_argument('notebook', help='Path to the notebook file (.ipynb)')
+    parser.add_argument('notebooks', nargs='+',
+                        help='Notebook files, directories or glob patterns (the notebooks directory with --build)')
     parser.add_argument('-o', '--output-dir', help='Output directory (default: same as notebook)')
     parser.add_argument('-e', '--execute', action='store_true', help='Execute notebook before converting')
+    parser.add_argument('-b', '--build', action='store_true', help='Pre-render a whole directory into a servable bundle')
+    parser.add_argument('-j', '--workers', type=int, help='Number of worker processes (default: CPU count)')
+    parser.add_argument('-f', '--force', action='store_true', help='Convert notebooks even if they are unchanged')
     
     args = parser.parse_args()
     
-    success = convert_notebook(args.notebook, args.output_dir, args.execute)
+    if args.build:
+        if len(args.notebooks) != 1 or not os.path.isdir(args.notebooks[0]):
+            parser.error('--build takes a single notebooks directory')
+        output_dir = args.output_dir or os.path.join('build', 'notebooks')
+        success = build_notebooks(args.notebooks[0], output_dir, args.workers, args.force, args.execute)
+    else:
+        notebook_paths = find_notebooks(args.notebooks)
+        if not notebook_paths:
+            parser.error('no notebooks matched')
+        success = convert_notebooks(notebook_paths, args.output_dir, args.execute, args.workers, args.force)
     
     if not success:
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
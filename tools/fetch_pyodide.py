@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Pyodide Download Tool
+Downloads the Pyodide runtime into app/static/pyodide/v<version>/ so notebook
+pages load it from this server (cached forever) instead of the CDN, which
+also keeps code cells working on classroom networks without internet access:
+    python tools/fetch_pyodide.py
+
+The core distribution covers the standard library; --full also includes
+every package Pyodide ships (numpy, pandas, matplotlib, ...), about 200 MB.
+"""
+
+import os
+import sys
+import shutil
+import tarfile
+import tempfile
+import argparse
+import urllib.request
+
+# Make the app package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import Config as AppConfig
+from app.services.compression import precompress_files
+
+RELEASE_URL = 'https://github.com/pyodide/pyodide/releases/download/{version}/{name}-{version}.tar.bz2'
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app', 'static')
+
+
+def fetch_pyodide(version, full=False, static_dir=STATIC_DIR):
+    """Download and unpack a Pyodide release. Returns the target directory."""
+    target_dir = os.path.join(static_dir, 'pyodide', f'v{version}')
+    url = RELEASE_URL.format(version=version, name='pyodide' if full else 'pyodide-core')
+
+    print(f'Downloading {url}')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        archive_path = os.path.join(tmp_dir, 'pyodide.tar.bz2')
+        with urllib.request.urlopen(url) as response, open(archive_path, 'wb') as f:
+            shutil.copyfileobj(response, f)
+
+        # Unpack next to the target and swap it in, so pages never see a partial runtime
+        unpack_dir = os.path.join(tmp_dir, 'unpacked')
+        with tarfile.open(archive_path, 'r:bz2') as archive:
+            if hasattr(tarfile, 'data_filter'):
+                archive.extractall(unpack_dir, filter='data')
+            else:
+                archive.extractall(unpack_dir)
+
+        # Releases unpack into a single pyodide/ directory
+        source_dir = os.path.join(unpack_dir, 'pyodide')
+        if not os.path.exists(os.path.join(source_dir, 'pyodide.js')):
+            raise RuntimeError(f'No pyodide.js in {url}')
+
+        os.makedirs(os.path.dirname(target_dir), exist_ok=True)
+        if os.path.exists(target_dir):
+            shutil.rmtree(target_dir)
+        shutil.move(source_dir, target_dir)
+
+    # The runtime is static from here on, so compress it once instead of per response
+    precompress_files(target_dir)
+    return target_dir
+
+
+def main():
+    """Parse command line arguments and download Pyodide."""
+    parser = argparse.ArgumentParser(description='Download the Pyodide runtime to serve it locally.')
+    parser.add_argument('--version', default=AppConfig.PYODIDE_VERSION,
+                        help=f'Pyodide version (default: {AppConfig.PYODIDE_VERSION}, as configured)')
+    parser.add_argument('--full', action='store_true', help='Include all packages, not just the core runtime')
+
+    args = parser.parse_args()
+    target_dir = fetch_pyodide(args.version, args.full)
+    print(f'Pyodide {args.version} installed in {target_dir}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+"""
+Static Precompression Tool
+Writes .gz (and, with the brotli package, .br) copies of the static files so
+WhiteNoise serves them without compressing per response. Run it after each
+deploy or Pyodide download; only files changed since the last run are read:
+    python tools/precompress_static.py
+    python tools/precompress_static.py app/static build/notebooks
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# Make the app package importable when run as a script
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.compression import precompress_files
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app', 'static')
+
+
+def main():
+    """Parse command line arguments and precompress each directory."""
+    parser = argparse.ArgumentParser(description='Precompress static files for WhiteNoise.')
+    parser.add_argument('directories', nargs='*', default=[STATIC_DIR],
+                        help='Directories to precompress (default: app/static)')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Report every file')
+
+    args = parser.parse_args()
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            print(f"Error: Not a directory: {directory}")
+            sys.exit(1)
+        started = time.perf_counter()
+        compressed = precompress_files(directory, log=print if args.verbose else None)
+        print(f"{directory}: {compressed} files compressed in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()